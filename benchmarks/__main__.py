@@ -0,0 +1,96 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark listeners with a local load generator.
+
+```bash
+python -m benchmarks udp kafka --rate 20000 --size 512 --duration 10
+python -m benchmarks udp --option queue_size=10000 --option batch_size=500 --json
+```
+"""
+
+import argparse
+import json
+import logging
+import sys
+from typing import Any, Dict, List
+
+from prettytable import PrettyTable
+
+from benchmarks.scenarios import SCENARIOS, run
+
+
+def parse_options(options: List[str]) -> Dict[str, Any]:
+    parsed: Dict[str, Any] = {}
+    for option in options:
+        key, _, value = option.partition("=")
+        try:
+            parsed[key] = json.loads(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark geniusrise listeners.")
+    parser.add_argument("listeners", nargs="*", help=f"Listeners to benchmark, default all of: {', '.join(SCENARIOS)}.")
+    parser.add_argument("--rate", type=int, default=0, help="Messages per second, 0 for as fast as possible.")
+    parser.add_argument("--size", type=int, default=256, help="Payload size in bytes.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Number of seconds to send for.")
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="Keyword argument for listen(), e.g. queue_size=10000. Values are parsed as JSON if possible.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON lines.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.listeners if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown listeners: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.ERROR)
+    for name in ["geniusrise", "cherrypy.error", "cherrypy.access"]:
+        logging.getLogger(name).setLevel(logging.ERROR)
+    options = parse_options(args.option)
+
+    table = PrettyTable(["listener", "sent", "received", "errors", "msgs/s", "p50 ms", "p99 ms", "cpu %", "rss MB"])
+    for name in args.listeners or list(SCENARIOS):
+        result = run(name, rate=args.rate, size=args.size, duration=args.duration, options=options)
+        if args.json:
+            print(json.dumps(result.to_dict()), flush=True)
+        else:
+            table.add_row(
+                [
+                    result.listener,
+                    result.sent,
+                    result.received,
+                    result.send_errors,
+                    result.msgs_per_s,
+                    result.p50_ms,
+                    result.p99_ms,
+                    result.cpu_percent,
+                    result.rss_mb,
+                ]
+            )
+    if not args.json:
+        print(table)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
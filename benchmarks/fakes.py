@@ -0,0 +1,296 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process stand-ins for the broker clients used by the listeners.
+
+Every fake reads the messages the load generator puts on a `Feed`, and raises KeyboardInterrupt out of the
+listener's loop once the feed is closed, the same way an operator stops a listener.
+"""
+
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class Feed:
+    def __init__(self):
+        self._queue: "queue.Queue[bytes]" = queue.Queue()
+        self.closed = threading.Event()
+        self.offset = 0
+
+    def put(self, payload: bytes) -> None:
+        self._queue.put(payload)
+
+    def close(self) -> None:
+        self.closed.set()
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        """
+        Get the next payload, waiting at most `timeout` seconds.
+
+        Raises:
+            KeyboardInterrupt: If the feed is closed.
+        """
+        if self.closed.is_set():
+            raise KeyboardInterrupt
+        try:
+            payload = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.offset += 1
+        return payload
+
+    def get_many(self, n: int, timeout: float) -> List[bytes]:
+        """
+        Get up to `n` payloads, waiting at most `timeout` seconds for the first one.
+        """
+        first = self.get(timeout)
+        if first is None:
+            return []
+        payloads = [first]
+        while len(payloads) < n:
+            try:
+                payloads.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            self.offset += 1
+        return payloads
+
+
+# Kafka
+
+
+class FakeKafkaMessage:
+    def __init__(self, value: bytes, topic: str, partition: int, offset: int):
+        self._value = value
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+
+    def value(self) -> bytes:
+        return self._value
+
+    def key(self) -> Optional[bytes]:
+        return None
+
+    def error(self) -> None:
+        return None
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return self._partition
+
+    def offset(self) -> int:
+        return self._offset
+
+    def timestamp(self):
+        return (1, int(time.time() * 1000))
+
+    def headers(self) -> None:
+        return None
+
+
+class FakeKafkaConsumer:
+    def __init__(self, feed: Feed, config: Dict[str, Any]):
+        self.feed = feed
+        self.config = config
+        self.topics: List[str] = []
+
+    def subscribe(self, topics: List[str], **kwargs) -> None:
+        self.topics = topics
+
+    def _message(self, value: bytes) -> FakeKafkaMessage:
+        return FakeKafkaMessage(value, self.topics[0] if self.topics else "", 0, self.feed.offset - 1)
+
+    def poll(self, timeout: float = -1) -> Optional[FakeKafkaMessage]:
+        value = self.feed.get(timeout if timeout >= 0 else 1.0)
+        return None if value is None else self._message(value)
+
+    def consume(self, num_messages: int = 1, timeout: float = -1) -> List[FakeKafkaMessage]:
+        values = self.feed.get_many(num_messages, timeout if timeout >= 0 else 1.0)
+        first = self.feed.offset - len(values)
+        return [FakeKafkaMessage(v, self.topics[0] if self.topics else "", 0, first + i) for i, v in enumerate(values)]
+
+    def commit(self, *args, **kwargs) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# Redis
+
+
+class FakeRedisPubSub:
+    def __init__(self, feed: Feed):
+        self.feed = feed
+
+    def subscribe(self, *channels) -> None:
+        pass
+
+    def listen(self):
+        while True:
+            payload = self.feed.get(1.0)
+            if payload is not None:
+                # The listener connects with decode_responses=True
+                yield {"type": "message", "data": payload.decode()}
+
+
+class FakeRedis:
+    def __init__(self, feed: Feed, **kwargs):
+        self.feed = feed
+
+    def pubsub(self) -> FakeRedisPubSub:
+        return FakeRedisPubSub(self.feed)
+
+    def xread(self, streams: Dict[str, Any], count: Optional[int] = None, block: Optional[int] = None):
+        payloads = self.feed.get_many(count or 1, (block or 0) / 1000)
+        first = self.feed.offset - len(payloads)
+        stream = next(iter(streams))
+        return [[stream, [(f"{first + i}-0", {"payload": p.decode()}) for i, p in enumerate(payloads)]]]
+
+
+# MQTT
+
+
+class FakeMQTTClient:
+    def __init__(self, feed: Feed, *args, **kwargs):
+        self.feed = feed
+        self.on_connect = None
+        self.on_message = None
+
+    def username_pw_set(self, username: str, password: str) -> None:
+        pass
+
+    def connect(self, host: str, port: int = 1883, keepalive: int = 60) -> None:
+        pass
+
+    def subscribe(self, topic: str) -> None:
+        self.topic = topic
+
+    def loop_forever(self) -> None:
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+        while True:
+            payload = self.feed.get(1.0)
+            if payload is not None and self.on_message:
+                self.on_message(self, None, SimpleNamespace(payload=payload, topic="benchmark"))
+
+
+# RabbitMQ
+
+
+class FakePikaChannel:
+    def __init__(self, feed: Feed):
+        self.feed = feed
+        self.callback = None
+
+    def queue_declare(self, queue: str, **kwargs) -> None:
+        pass
+
+    def basic_consume(self, queue: str, on_message_callback, **kwargs) -> None:
+        self.callback = on_message_callback
+
+    def start_consuming(self) -> None:
+        method = SimpleNamespace(routing_key="benchmark")
+        properties = SimpleNamespace(headers=None)
+        while True:
+            payload = self.feed.get(1.0)
+            if payload is not None and self.callback:
+                self.callback(self, method, properties, payload)
+
+
+class FakePikaConnection:
+    def __init__(self, feed: Feed, *args, **kwargs):
+        self.feed = feed
+
+    def channel(self) -> FakePikaChannel:
+        return FakePikaChannel(self.feed)
+
+
+# AWS
+
+
+class FakeSQS:
+    def __init__(self, feed: Feed, *args, **kwargs):
+        self.feed = feed
+
+    # boto3 takes CamelCase keyword arguments
+    def receive_message(self, **kwargs) -> Dict[str, Any]:
+        payloads = self.feed.get_many(kwargs.get("MaxNumberOfMessages", 1), kwargs.get("WaitTimeSeconds", 0))
+        if not payloads:
+            return {}
+        first = self.feed.offset - len(payloads)
+        return {
+            "Messages": [
+                {"MessageId": str(first + i), "ReceiptHandle": str(first + i), "Body": p.decode()}
+                for i, p in enumerate(payloads)
+            ]
+        }
+
+    def delete_message(self, **kwargs) -> None:
+        pass
+
+    def delete_message_batch(self, **kwargs) -> Dict[str, Any]:
+        return {"Successful": [{"Id": entry["Id"]} for entry in kwargs["Entries"]], "Failed": []}
+
+
+class FakeKinesis:
+    def __init__(self, feed: Feed, *args, **kwargs):
+        self.feed = feed
+
+    def get_shard_iterator(self, **kwargs) -> Dict[str, Any]:
+        return {"ShardIterator": "0"}
+
+    def get_records(self, **kwargs) -> Dict[str, Any]:
+        payloads = self.feed.get_many(kwargs.get("Limit", 100), 1.0)
+        first = self.feed.offset - len(payloads)
+        return {
+            "Records": [{"Data": p, "SequenceNumber": str(first + i)} for i, p in enumerate(payloads)],
+            "NextShardIterator": str(self.feed.offset),
+        }
+
+
+# ActiveMQ
+
+
+class FakeStompConnection:
+    def __init__(self, feed: Feed, *args, **kwargs):
+        self.feed = feed
+        self.listener = None
+
+    def set_listener(self, name: str, listener) -> None:
+        self.listener = listener
+
+    def connect(self, *args, **kwargs) -> None:
+        pass
+
+    def subscribe(self, destination: str, id: int, ack: str = "auto") -> None:
+        threading.Thread(target=self._deliver, args=(destination,), name="stomp-receiver", daemon=True).start()
+
+    def _deliver(self, destination: str) -> None:
+        headers = {"destination": destination}
+        try:
+            while True:
+                payload = self.feed.get(1.0)
+                if payload is not None and self.listener:
+                    self.listener.on_message(headers, payload.decode())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,145 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure how fast the packet format parsers parse well-formed datagrams and reject malformed ones.
+
+```bash
+python -m benchmarks.formats
+python -m benchmarks.formats statsd syslog --count 200000 --json
+```
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+from prettytable import PrettyTable
+
+from geniusrise_listeners.formats import FORMATS, get_format
+
+# Datagrams as they come off the wire, the parsers are timed over all of them in turn
+SAMPLES: Dict[str, List[bytes]] = {
+    "statsd": [
+        b"api.requests:1|c",
+        b"api.latency:12.5|ms|@0.1",
+        b"queue.depth:42|g|#region:eu,service:api",
+        b"api.requests:1|c\napi.errors:1|c\napi.latency:8|ms",
+    ],
+    "syslog": [
+        b"<34>1 2003-10-11T22:14:15.003Z mymachine.example.com su - ID47 - 'su root' failed for lonvick on /dev/pts/8",
+        b"<165>1 2003-08-24T05:14:15.000003-07:00 192.0.2.1 myproc 8710 - - %% It's time to make the do-nuts.",
+        b'<165>1 2003-10-11T22:14:15.003Z mymachine.example.com evntslog - ID47 [exampleSDID@32473 iut="3" '
+        b'eventSource="Application" eventID="1011"] \xef\xbb\xbfAn application event log entry...',
+    ],
+    "influx": [
+        b"cpu,host=server01,region=us-west usage_idle=98.2,usage_user=1.1 1434055562000000000",
+        b"mem,host=server01 used=4215812096i,free=3990630400i,available_percent=48.6",
+        b'events,host=server01 message="disk full",code=507i,critical=t 1434055562000000000',
+        b"cpu,host=a usage=1\ncpu,host=b usage=2\ncpu,host=c usage=3",
+    ],
+}
+
+# Noise a parser should turn away as early as possible
+MALFORMED: List[bytes] = [
+    b"",
+    b"hello world",
+    b'{"json": "payload"}',
+    b"\xff\xfe\x00binary",
+]
+
+
+@dataclass
+class FormatResult:
+    format: str
+    packets: int
+    parsed_per_second: float
+    rejected_per_second: float
+    us_per_packet: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _rate(parser: Any, packets: List[bytes], count: int) -> float:
+    rounds = max(1, count // len(packets))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for packet in packets:
+            parser(packet)
+    return rounds * len(packets) / (time.perf_counter() - start)
+
+
+def measure_format(name: str, count: int = 100000) -> FormatResult:
+    """
+    Time a format's parser over its sample datagrams, and over malformed ones.
+
+    Args:
+        name (str): The format name, e.g. "statsd".
+        count (int): Number of datagrams to parse for each rate. Defaults to 100000.
+
+    Returns:
+        FormatResult: The well-formed and malformed datagrams parsed per second.
+
+    Raises:
+        AssertionError: If the parser rejects a sample or accepts a malformed datagram.
+    """
+    parser = get_format(name)
+    for packet in SAMPLES[name]:
+        assert parser(packet) is not None, f"{name} rejected {packet!r}"
+    for packet in MALFORMED:
+        assert parser(packet) is None, f"{name} accepted {packet!r}"
+
+    parsed = _rate(parser, SAMPLES[name], count)
+    rejected = _rate(parser, MALFORMED, count)
+    return FormatResult(
+        format=name,
+        packets=count,
+        parsed_per_second=round(parsed),
+        rejected_per_second=round(rejected),
+        us_per_packet=round(1e6 / parsed, 2),
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.formats",
+        description="Measure the speed of the UDP packet format parsers.",
+    )
+    parser.add_argument("formats", nargs="*", help=f"Formats to benchmark, default all of: {', '.join(FORMATS)}.")
+    parser.add_argument("--count", type=int, default=100000, help="Number of datagrams to parse per measure.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON lines.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.formats if name not in FORMATS]
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(unknown)}")
+
+    table = PrettyTable(["format", "parsed/s", "rejected/s", "us/packet"])
+    for name in args.formats or list(FORMATS):
+        result = measure_format(name, count=args.count)
+        if args.json:
+            print(json.dumps(result.to_dict()), flush=True)
+        else:
+            table.add_row([name, result.parsed_per_second, result.rejected_per_second, result.us_per_packet])
+    if not args.json:
+        print(table)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
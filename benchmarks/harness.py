@@ -0,0 +1,229 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+log = logging.getLogger(__name__)
+
+
+class RecordingOutput:
+    # Records payloads as they are, so that the raw codec hands them over without wrapping
+    accepts_bytes = True
+
+    def __init__(self):
+        r"""
+        A stand-in for StreamingOutput that records when every record arrives.
+
+        Saving only appends to a list, so that the benchmark measures the listener and not the output.
+        """
+        self.arrivals: List[Tuple[float, Any]] = []
+
+    def save(self, data: Any, filename: Optional[str] = None) -> None:
+        self.arrivals.append((time.perf_counter(), data))
+
+    def save_bulk(self, messages: List[Any]) -> None:
+        now = time.perf_counter()
+        self.arrivals.extend((now, message) for message in messages)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def make_payload(seq: int, size: int) -> bytes:
+    """
+    Make a JSON payload of about `size` bytes carrying a sequence number.
+
+    Args:
+        seq (int): The sequence number.
+        size (int): The payload size in bytes.
+
+    Returns:
+        bytes: The payload.
+    """
+    head = b'{"seq": %d, "pad": "' % seq
+    return head + b"x" * max(0, size - len(head) - 2) + b'"}'
+
+
+def seq_of(record: Any) -> int:
+    """
+    Find the sequence number in a record saved by a listener, whatever the listener wrapped it in.
+
+    Args:
+        record (Any): The saved record.
+
+    Returns:
+        int: The sequence number.
+    """
+    while True:
+        if isinstance(record, (bytes, bytearray, memoryview, str)):
+            record = json.loads(bytes(record) if isinstance(record, memoryview) else record)
+        elif "seq" in record:
+            return record["seq"]
+        elif "data" in record:
+            record = record["data"]
+        elif "Body" in record:
+            record = record["Body"]
+        elif "payload" in record:
+            record = record["payload"]
+        else:
+            raise ValueError(f"No sequence number in record: {record}")
+
+
+@dataclass
+class Result:
+    listener: str
+    sent: int
+    received: int
+    send_errors: int
+    seconds: float
+    msgs_per_s: float
+    p50_ms: float
+    p99_ms: float
+    cpu_percent: float
+    rss_mb: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class LoadGenerator:
+    def __init__(self, send: Callable[[bytes], None], rate: int = 0, size: int = 256):
+        r"""
+        Send payloads at a fixed rate.
+
+        Args:
+            send (Callable[[bytes], None]): Sends one payload to the listener.
+            rate (int): Messages per second, 0 sends as fast as possible. Defaults to 0.
+            size (int): Payload size in bytes. Defaults to 256.
+        """
+        self.send = send
+        self.rate = rate
+        self.size = size
+        self.sent_at: List[float] = []
+        self.errors = 0
+
+    def run(self, duration: float) -> None:
+        """
+        Send payloads for `duration` seconds, numbered from 0.
+
+        Args:
+            duration (float): Number of seconds to send for.
+        """
+        start = time.perf_counter()
+        end = start + duration
+        seq = 0
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                return
+            if self.rate:
+                # Catch up with the schedule, then sleep until the next message is due
+                due = int((now - start) * self.rate) + 1
+                if seq >= due:
+                    time.sleep(max(0.0, min(start + seq / self.rate - now, end - now)))
+                    continue
+            payload = make_payload(seq, self.size)
+            self.sent_at.append(time.perf_counter())
+            try:
+                self.send(payload)
+            except Exception as e:
+                if not self.errors:
+                    log.error(f"Error sending to the listener: {e}")
+                self.errors += 1
+            seq += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(
+    name: str,
+    generator: LoadGenerator,
+    output: RecordingOutput,
+    duration: float,
+    drain_timeout: float = 5.0,
+) -> Result:
+    """
+    Run a load generator against a listener that is already listening, and measure it.
+
+    Throughput is the number of records that arrived at the output divided by the time from the first message sent
+    to the last record saved. CPU and RSS are those of the whole benchmark process, load generator included.
+
+    Args:
+        name (str): The listener name to report.
+        generator (LoadGenerator): The load generator sending to the listener.
+        output (RecordingOutput): The listener's output.
+        duration (float): Number of seconds to send for.
+        drain_timeout (float): Number of seconds to wait for records still in flight after sending. Defaults to 5.
+
+    Returns:
+        Result: The measurements.
+    """
+    process = psutil.Process()
+    cpu_before = process.cpu_times()
+    wall_before = time.perf_counter()
+
+    sender = threading.Thread(target=generator.run, args=(duration,), name="load-generator", daemon=True)
+    sender.start()
+    sender.join()
+
+    # Wait for records in flight until everything arrived, or nothing arrived for a while
+    deadline = time.perf_counter() + drain_timeout
+    seen, last_progress = len(output.arrivals), time.perf_counter()
+    while len(output.arrivals) < len(generator.sent_at) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+        if len(output.arrivals) != seen:
+            seen, last_progress = len(output.arrivals), time.perf_counter()
+        elif time.perf_counter() - last_progress > 1.5:
+            break
+
+    wall = time.perf_counter() - wall_before
+    cpu_after = process.cpu_times()
+    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+
+    arrivals = list(output.arrivals)
+    latencies = []
+    for arrived, record in arrivals:
+        seq = seq_of(record)
+        if seq < len(generator.sent_at):
+            latencies.append((arrived - generator.sent_at[seq]) * 1000)
+
+    elapsed = (arrivals[-1][0] - generator.sent_at[0]) if arrivals and generator.sent_at else wall
+    return Result(
+        listener=name,
+        sent=len(generator.sent_at),
+        received=len(arrivals),
+        send_errors=generator.errors,
+        seconds=round(elapsed, 3),
+        msgs_per_s=round(len(arrivals) / elapsed, 1) if elapsed > 0 else 0.0,
+        p50_ms=round(percentile(latencies, 0.5), 3),
+        p99_ms=round(percentile(latencies, 0.99), 3),
+        cpu_percent=round(100 * cpu / wall, 1),
+        rss_mb=round(process.memory_info().rss / 2**20, 1),
+    )
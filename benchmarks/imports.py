@@ -0,0 +1,147 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure what importing the package and each listener costs a fresh interpreter, on top of geniusrise itself.
+
+```bash
+python -m benchmarks.imports
+python -m benchmarks.imports Udp Kafka --runs 10 --json
+python -m benchmarks.imports --check
+```
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from prettytable import PrettyTable
+
+import geniusrise_listeners
+
+# Client libraries of the transports, none of which a listener should import unless it is its own
+TRANSPORTS = [
+    "aioquic",
+    "cherrypy",
+    "confluent_kafka",
+    "grpc",
+    "paho",
+    "pika",
+    "socketio",
+    "stomp",
+    "websockets",
+    "zmq",
+]
+
+# Seconds a cold import may take on top of `import geniusrise`, checked by `make benchmark-imports`
+BUDGETS = {"geniusrise_listeners": 0.05, "Udp": 0.1}
+
+# Runs in the fresh interpreter: import geniusrise, then time the import under test
+PROBE = """
+import json, sys, time
+import geniusrise
+before = set(sys.modules)
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+
+@dataclass
+class ImportResult:
+    name: str
+    seconds: float
+    modules: int
+    transports: List[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def measure_import(name: str, runs: int = 5) -> ImportResult:
+    """
+    Import the package, or one of its listeners, in fresh interpreters and keep the fastest run.
+
+    Args:
+        name (str): "geniusrise_listeners" for the package alone, or a listener class name, e.g. "Udp".
+        runs (int): Number of interpreters to start. Defaults to 5.
+
+    Returns:
+        ImportResult: The import time, the number of modules it imported and the transports among them.
+    """
+    if name == "geniusrise_listeners":
+        statement = "import geniusrise_listeners"
+    else:
+        statement = f"from geniusrise_listeners import {name}"
+
+    best: Optional[Dict[str, Any]] = None
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        probe = json.loads(output.splitlines()[-1])
+        if best is None or probe["seconds"] < best["seconds"]:
+            best = probe
+
+    assert best is not None
+    transports = sorted({module.split(".")[0] for module in best["modules"]} & set(TRANSPORTS))
+    return ImportResult(
+        name=name, seconds=round(best["seconds"], 4), modules=len(best["modules"]), transports=transports
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.imports",
+        description="Measure the import time of geniusrise listeners.",
+    )
+    parser.add_argument("names", nargs="*", help="Listener class names, default the package and all listeners.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters per import.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON lines.")
+    parser.add_argument("--check", action="store_true", help="Fail if an import takes longer than its budget.")
+    args = parser.parse_args(argv)
+
+    names = args.names or ["geniusrise_listeners", *geniusrise_listeners._LISTENERS]
+    table = PrettyTable(["import", "seconds", "modules", "transports", "budget"])
+    over_budget = []
+    for name in names:
+        try:
+            result = measure_import(name, runs=args.runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{name}: import failed: {e.stderr.strip().splitlines()[-1]}", file=sys.stderr)
+            continue
+        if name in BUDGETS and result.seconds > BUDGETS[name]:
+            over_budget.append(f"{name} took {result.seconds}s, over its budget of {BUDGETS[name]}s")
+        if args.json:
+            print(json.dumps(result.to_dict()), flush=True)
+        else:
+            table.add_row([name, result.seconds, result.modules, ", ".join(result.transports), BUDGETS.get(name, "")])
+    if not args.json:
+        print(table)
+    if args.check and over_budget:
+        print("\n".join(over_budget), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,475 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+One scenario per listener: how to start it, and how the load generator gets messages to it.
+
+Network listeners get real traffic over localhost, broker listeners get their client replaced by a fake from
+`benchmarks.fakes`.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type
+from unittest import mock
+
+from geniusrise import InMemoryState
+
+from benchmarks.fakes import (
+    FakeKafkaConsumer,
+    FakeKinesis,
+    FakeMQTTClient,
+    FakePikaConnection,
+    FakeRedis,
+    FakeSQS,
+    FakeStompConnection,
+    Feed,
+)
+from benchmarks.harness import LoadGenerator, RecordingOutput, Result, measure
+
+log = logging.getLogger(__name__)
+
+
+def free_port(kind: int = socket.SOCK_STREAM) -> int:
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Scenario:
+    name = ""
+    startup_seconds = 0.0
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        r"""
+        Base class of the benchmark scenarios.
+
+        Args:
+            options (Optional[Dict[str, Any]]): Additional keyword arguments for the listener's listen method.
+        """
+        self.options = options or {}
+        self.thread: Optional[threading.Thread] = None
+
+    def create(self, output: RecordingOutput) -> Any:
+        raise NotImplementedError
+
+    def listen(self, spout: Any) -> None:
+        raise NotImplementedError
+
+    def send(self, payload: bytes) -> None:
+        raise NotImplementedError
+
+    def start(self, spout: Any) -> None:
+        self.thread = threading.Thread(target=self._listen, args=(spout,), name=f"{self.name}-listener", daemon=True)
+        self.thread.start()
+        time.sleep(self.startup_seconds)
+
+    def stop(self) -> None:
+        pass
+
+    def _listen(self, spout: Any) -> None:
+        try:
+            self.listen(spout)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            log.error(f"{self.name} listener stopped: {e}")
+
+
+# Network listeners
+
+
+class UdpScenario(Scenario):
+    name = "udp"
+    startup_seconds = 0.2
+
+    def create(self, output):
+        from geniusrise_listeners.udp import Udp
+
+        self.port = free_port(socket.SOCK_DGRAM)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        return Udp(output, InMemoryState())
+
+    def listen(self, spout):
+        spout.listen(host="127.0.0.1", port=self.port, **self.options)
+
+    def send(self, payload):
+        self.socket.sendto(payload, ("127.0.0.1", self.port))
+
+    def stop(self):
+        self.socket.close()
+
+
+class WebhookScenario(Scenario):
+    name = "webhook"
+    startup_seconds = 1.0
+
+    def create(self, output):
+        from geniusrise_listeners.webhook import Webhook
+
+        self.port = free_port()
+        self.connection: Optional[Any] = None
+        self.spout = Webhook(output, InMemoryState())
+        return self.spout
+
+    def listen(self, spout):
+        spout.listen(port=self.port, **self.options)
+
+    def send(self, payload):
+        import http.client
+
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection("127.0.0.1", self.port)
+        self.connection.request("POST", "/", body=payload, headers={"Content-Type": "application/json"})
+        self.connection.getresponse().read()
+
+    def stop(self):
+        import cherrypy
+
+        if self.connection:
+            self.connection.close()
+        if self.spout.server is not None:
+            self.spout.server.stop()
+        else:
+            cherrypy.engine.exit()
+
+
+class WebsocketScenario(Scenario):
+    name = "websocket"
+    startup_seconds = 0.5
+
+    def create(self, output):
+        from geniusrise_listeners.websocket import Websocket
+
+        self.port = free_port()
+        return Websocket(output, InMemoryState())
+
+    def listen(self, spout):
+        spout.listen(host="127.0.0.1", port=self.port, **self.options)
+
+    def send(self, payload):
+        from websockets.sync.client import connect
+
+        # The listener reads one message per connection
+        with connect(f"ws://127.0.0.1:{self.port}") as websocket:
+            websocket.send(payload.decode())
+
+
+class ZeroMQScenario(Scenario):
+    name = "zeromq"
+    startup_seconds = 0.5
+
+    def create(self, output):
+        import zmq
+
+        from geniusrise_listeners.zeromq import ZeroMQ
+
+        self.endpoint = f"tcp://127.0.0.1:{free_port()}"
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.PUB)
+        self.socket.bind(self.endpoint)
+        return ZeroMQ(output, InMemoryState())
+
+    def listen(self, spout):
+        spout.listen(endpoint=self.endpoint, topic="benchmark", syntax="json", **self.options)
+
+    def send(self, payload):
+        self.socket.send_string(f"benchmark {payload.decode()}")
+
+    def stop(self):
+        self.socket.close(linger=0)
+
+
+class QuicScenario(Scenario):
+    name = "quic"
+    startup_seconds = 1.0
+
+    def create(self, output):
+        from geniusrise_listeners.quic import Quic
+
+        self.port = free_port(socket.SOCK_DGRAM)
+        self.cert_path, self.key_path = self._certificate()
+        self.loop = asyncio.new_event_loop()
+        self.client: Optional[Any] = None
+        return Quic(output, InMemoryState())
+
+    def listen(self, spout):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        spout.listen(cert_path=self.cert_path, key_path=self.key_path, host="127.0.0.1", port=self.port, **self.options)
+
+    def start(self, spout):
+        super().start(spout)
+        threading.Thread(target=self.loop.run_forever, name="quic-client", daemon=True).start()
+        self.client = asyncio.run_coroutine_threadsafe(self._connect(), self.loop).result(timeout=10)
+
+    def send(self, payload):
+        self.loop.call_soon_threadsafe(self._send, payload)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _send(self, payload: bytes) -> None:
+        # Every message goes on its own stream
+        client = self.client
+        assert client is not None, "start() connects the client"
+        quic = client._quic
+        quic.send_stream_data(quic.get_next_available_stream_id(), payload, end_stream=True)
+        client.transmit()
+
+    async def _connect(self):
+        import ssl
+
+        from aioquic.asyncio import connect
+        from aioquic.quic.configuration import QuicConfiguration
+
+        configuration = QuicConfiguration(is_client=True, verify_mode=ssl.CERT_NONE)
+        self._connection = connect("127.0.0.1", self.port, configuration=configuration)
+        return await self._connection.__aenter__()
+
+    @staticmethod
+    def _certificate():
+        import datetime
+
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+        now = datetime.datetime.utcnow()
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+
+        directory = tempfile.mkdtemp(prefix="quic-benchmark-")
+        cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+        with open(cert_path, "wb") as f:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as f:
+            f.write(
+                key.private_bytes(
+                    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+                )
+            )
+        return cert_path, key_path
+
+
+# Broker listeners
+
+
+class BrokerScenario(Scenario):
+    startup_seconds = 0.1
+
+    # The client to replace with a fake, and the fake
+    target = ""
+    fake: Type = object
+
+    def create(self, output):
+        self.feed = Feed()
+        self.patch = mock.patch(self.target, lambda *args, **kwargs: self.fake(self.feed, *args, **kwargs))
+        self.patch.start()
+        return self.listener()(output, InMemoryState())
+
+    def listener(self) -> Type:
+        raise NotImplementedError
+
+    def send(self, payload):
+        self.feed.put(payload)
+
+    def stop(self):
+        self.feed.close()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.patch.stop()
+
+
+class KafkaScenario(BrokerScenario):
+    name = "kafka"
+    target = "geniusrise_listeners.kafka.Consumer"
+    fake = FakeKafkaConsumer
+
+    def listener(self):
+        from geniusrise_listeners.kafka import Kafka
+
+        return Kafka
+
+    def listen(self, spout):
+        spout.listen(topic="benchmark", group_id="benchmark", **self.options)
+
+
+class RedisPubSubScenario(BrokerScenario):
+    name = "redis_pubsub"
+    target = "redis.StrictRedis"
+    fake = FakeRedis
+
+    def listener(self):
+        from geniusrise_listeners.redis_pubsub import RedisPubSub
+
+        return RedisPubSub
+
+    def listen(self, spout):
+        spout.listen(channel="benchmark", **self.options)
+
+
+class RedisStreamScenario(BrokerScenario):
+    name = "redis_streams"
+    target = "redis.StrictRedis"
+    fake = FakeRedis
+
+    def listener(self):
+        from geniusrise_listeners.redis_streams import RedisStream
+
+        return RedisStream
+
+    def listen(self, spout):
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        spout.listen(stream_key="benchmark", **self.options)
+
+
+class MQTTScenario(BrokerScenario):
+    name = "mqtt"
+    target = "paho.mqtt.client.Client"
+    fake = FakeMQTTClient
+
+    def listener(self):
+        from geniusrise_listeners.mqtt import MQTT
+
+        return MQTT
+
+    def listen(self, spout):
+        spout.listen(topic="benchmark", **self.options)
+
+
+class RabbitMQScenario(BrokerScenario):
+    name = "amqp"
+    target = "pika.BlockingConnection"
+    fake = FakePikaConnection
+
+    def listener(self):
+        from geniusrise_listeners.amqp import RabbitMQ
+
+        return RabbitMQ
+
+    def listen(self, spout):
+        spout.listen(queue_name="benchmark", **self.options)
+
+
+class ActiveMQScenario(BrokerScenario):
+    name = "activemq"
+    target = "stomp.Connection"
+    fake = FakeStompConnection
+
+    def listener(self):
+        from geniusrise_listeners.activemq import ActiveMQ
+
+        return ActiveMQ
+
+    def listen(self, spout):
+        spout.listen(host="localhost", port=61613, destination="benchmark", **self.options)
+
+
+class SQSScenario(BrokerScenario):
+    name = "sqs"
+    target = "boto3.client"
+    fake = FakeSQS
+
+    def listener(self):
+        from geniusrise_listeners.sqs import SQS
+
+        return SQS
+
+    def listen(self, spout):
+        spout.listen(queue_url="benchmark", batch_interval=1, **self.options)
+
+
+class KinesisScenario(BrokerScenario):
+    name = "kinesis"
+    target = "boto3.client"
+    fake = FakeKinesis
+
+    def listener(self):
+        from geniusrise_listeners.kinesis import Kinesis
+
+        return Kinesis
+
+    def listen(self, spout):
+        spout.listen(stream_name="benchmark", **self.options)
+
+
+SCENARIOS: Dict[str, Type[Scenario]] = {
+    scenario.name: scenario
+    for scenario in [
+        UdpScenario,
+        WebhookScenario,
+        WebsocketScenario,
+        ZeroMQScenario,
+        QuicScenario,
+        KafkaScenario,
+        RedisPubSubScenario,
+        RedisStreamScenario,
+        MQTTScenario,
+        RabbitMQScenario,
+        ActiveMQScenario,
+        SQSScenario,
+        KinesisScenario,
+    ]
+}
+
+
+def run(
+    name: str,
+    rate: int = 0,
+    size: int = 256,
+    duration: float = 5.0,
+    options: Optional[Dict[str, Any]] = None,
+) -> Result:
+    """
+    Benchmark one listener.
+
+    Args:
+        name (str): The scenario name, see `SCENARIOS`.
+        rate (int): Messages per second, 0 sends as fast as possible. Defaults to 0.
+        size (int): Payload size in bytes. Defaults to 256.
+        duration (float): Number of seconds to send for. Defaults to 5.
+        options (Optional[Dict[str, Any]]): Additional keyword arguments for the listener's listen method.
+
+    Returns:
+        Result: The measurements.
+    """
+    scenario = SCENARIOS[name](options)
+    output = RecordingOutput()
+    spout = scenario.create(output)
+    scenario.start(spout)
+    try:
+        return measure(name, LoadGenerator(scenario.send, rate=rate, size=size), output, duration)
+    finally:
+        scenario.stop()
+
+
+def run_all(names: List[str], **kwargs) -> List[Result]:
+    return [run(name, **kwargs) for name in names]
@@ -13,18 +13,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from geniusrise_listeners.amqp import RabbitMQ
-from geniusrise_listeners.http_polling import RESTAPIPoll
-from geniusrise_listeners.kafka import Kafka
-from geniusrise_listeners.mqtt import MQTT
-from geniusrise_listeners.quic import Quic
-from geniusrise_listeners.redis_pubsub import RedisPubSub
-from geniusrise_listeners.redis_streams import RedisStream
-from geniusrise_listeners.sns import SNS
-from geniusrise_listeners.sqs import SQS
-from geniusrise_listeners.udp import Udp
-from geniusrise_listeners.webhook import Webhook
-from geniusrise_listeners.websocket import Websocket
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from geniusrise_listeners.activemq import ActiveMQ
+    from geniusrise_listeners.amqp import RabbitMQ
+    from geniusrise_listeners.grpc import Grpc
+    from geniusrise_listeners.http_polling import RESTAPIPoll
+    from geniusrise_listeners.kafka import Kafka
+    from geniusrise_listeners.kinesis import Kinesis
+    from geniusrise_listeners.mqtt import MQTT
+    from geniusrise_listeners.quic import Quic
+    from geniusrise_listeners.redis_pubsub import RedisPubSub
+    from geniusrise_listeners.redis_streams import RedisStream
+    from geniusrise_listeners.sns import SNS
+    from geniusrise_listeners.socketio import SocketIo
+    from geniusrise_listeners.sqs import SQS
+    from geniusrise_listeners.udp import Udp
+    from geniusrise_listeners.webhook import Webhook
+    from geniusrise_listeners.websocket import Websocket
+    from geniusrise_listeners.zeromq import ZeroMQ
+
+# Listeners are imported on first access, so that a spout only pulls in its own transport's client library
+_LISTENERS = {
+    "RESTAPIPoll": "http_polling",
+    "Kafka": "kafka",
+    "Quic": "quic",
+    "Udp": "udp",
+    "Webhook": "webhook",
+    "Websocket": "websocket",
+    "RabbitMQ": "amqp",
+    "MQTT": "mqtt",
+    "RedisPubSub": "redis_pubsub",
+    "RedisStream": "redis_streams",
+    "SNS": "sns",
+    "SQS": "sqs",
+    # Not exported by `import *` nor listed by dir(), as before, but importable from here too
+    "ActiveMQ": "activemq",
+    "Grpc": "grpc",
+    "Kinesis": "kinesis",
+    "SocketIo": "socketio",
+    "ZeroMQ": "zeromq",
+}
 
 __all__ = [
     "RESTAPIPoll",
@@ -40,3 +71,17 @@ __all__ = [
     "SNS",
     "SQS",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _LISTENERS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    listener = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    # Cache it, later lookups do not come through here
+    globals()[name] = listener
+    return listener
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -15,10 +15,12 @@
 
 import stomp
 from typing import Optional
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
 
-class ActiveMQ(Spout):
+
+class ActiveMQ(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the ActiveMQ class.
@@ -57,8 +59,7 @@ class ActiveMQ(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
     def listen(
         self,
@@ -82,9 +83,11 @@ class ActiveMQ(Spout):
             Exception: If unable to connect to the ActiveMQ server.
         """
 
+        spout = self
+
         class MyListener(stomp.ConnectionListener):
             def on_message(self, headers, message):
-                self._message_handler(headers, message)
+                spout.process(message, {"headers": headers})
 
         conn = stomp.Connection([(host, port)])
         conn.set_listener("", MyListener())
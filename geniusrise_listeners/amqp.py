@@ -13,14 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 from typing import Optional
 
 import pika
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.supervisor import supervised
 
-class RabbitMQ(Spout):
+
+class RabbitMQ(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the RabbitMQ class.
@@ -58,8 +60,8 @@ class RabbitMQ(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
 
     def _callback(self, ch, method, properties, body):
         """
@@ -71,43 +73,18 @@ class RabbitMQ(Spout):
             properties: Properties.
             body: Message body.
         """
-        try:
-            data = json.loads(body)
-
-            # Enrich the data with metadata about the method and properties
-            enriched_data = {
-                "data": data,
-                "method": method.routing_key,
-                "properties": dict(properties.headers),
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
-        except Exception as e:
-            self.log.error(f"Error processing RabbitMQ message: {e}")
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+        # Enrich the data with metadata about the method and properties
+        self.process(body, {"method": method.routing_key, "properties": dict(properties.headers or {})})
 
+    @supervised
     def listen(
         self,
         queue_name: str,
         host: str = "localhost",
         username: Optional[str] = None,
         password: Optional[str] = None,
+        codec: str = "json",
+        workers: int = 1,
     ):
         """
         📖 Start listening for data from the RabbitMQ server.
@@ -117,10 +94,15 @@ class RabbitMQ(Spout):
             host (str): The RabbitMQ server host. Defaults to "localhost".
             username (Optional[str]): The username for authentication. Defaults to None.
             password (Optional[str]): The password for authentication. Defaults to None.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto". Defaults to "json".
+            workers (int): Number of worker processes, each consuming from the queue. Defaults to 1.
 
         Raises:
             Exception: If unable to connect to the RabbitMQ server.
         """
+        self.use_codec(codec)
+
         try:
             self.log.info("Starting RabbitMQ listener...")
             credentials = pika.PlainCredentials(username, password) if username and password else None
@@ -136,10 +118,6 @@ class RabbitMQ(Spout):
             channel.start_consuming()
         except Exception as e:
             self.log.error(f"Error listening to RabbitMQ: {e}")
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        finally:
+            self.counters.flush()
@@ -0,0 +1,374 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from geniusrise import Spout, State, StreamingOutput
+
+from geniusrise_listeners.batching import BatchingOutput, batching
+from geniusrise_listeners.counters import StateCounter
+from geniusrise_listeners.decoders import Decoder, get_codec, wrap_bytes
+from geniusrise_listeners.dedup import DedupCache, payload_key
+from geniusrise_listeners.queueing import ReceiveQueue, queueing
+
+if TYPE_CHECKING:
+    # prometheus_client is only imported once metrics are enabled
+    from geniusrise_listeners.metrics import ListenerMetrics
+
+Enricher = Callable[[Any, Optional[Dict[str, Any]]], Any]
+Filter = Callable[[Any], bool]
+Sink = Callable[[Any], None]
+
+
+class Listener(Spout):
+    def __init__(self, output: StreamingOutput, state: State, **kwargs):
+        r"""
+        Base class for all listeners.
+
+        A listener receives messages from its transport and hands each of them to `process`, which runs them
+        through the message pipeline:
+
+        0. **dedup**: skips messages whose identity was already saved, see `enable_dedup`. Off by default.
+        1. **decoder**: turns the raw payload into data, e.g. `json.loads`.
+        2. **filters**: predicates on the decoded data, a message is skipped unless all of them pass.
+        3. **enricher**: builds the record to save from the data and the transport's metadata. By default the
+           record is `{"data": data, **metadata}`, or the data itself when there is no metadata.
+        4. **sink**: saves the record. By default this is the output's `save` method.
+
+        Successes, failures and skipped messages are counted in `self.counters`. Stages that are not configured
+        cost nothing: the pipeline behind `process` is rebuilt by `configure` from only the stages that are set.
+
+        Prometheus metrics are off unless one of the `metrics_*` keyword arguments is given, see `enable_metrics`,
+        and deduplication is off unless one of the `dedup*` keyword arguments is given, see `enable_dedup`.
+
+        Args:
+            output (StreamingOutput): An instance of the StreamingOutput class for saving the data.
+            state (State): An instance of the State class for maintaining the state.
+            **kwargs: Additional keyword arguments.
+                - metrics_port (int): Serve Prometheus metrics at http://0.0.0.0:metrics_port/metrics.
+                - metrics_textfile (str): Write Prometheus metrics to this file periodically.
+                - metrics_statsd (str): Push metrics to this statsd server, as "host:port", periodically.
+                - metrics_interval (float): Number of seconds between pushes. Defaults to 10.
+                - dedup (bool): Skip redelivered messages.
+                - dedup_size (int): Maximum number of remembered message identities. Defaults to 100000.
+                - dedup_ttl (float): Number of seconds a message identity is remembered. Defaults to 3600.
+                - dedup_bloom (int): Also remember this many identities in a Bloom filter. Defaults to None.
+        """
+        super().__init__(output, state)
+        self.top_level_arguments = kwargs
+        self.counters = StateCounter(self.state, self.id)
+        self.metrics: Optional["ListenerMetrics"] = None
+        # The index of this worker process when running under a Supervisor
+        self.worker: Optional[int] = None
+        # The receive queue, while listening with a queue_size
+        self.queue: Optional[ReceiveQueue] = None
+
+        self.decoder: Optional[Decoder] = None
+        self.filters: List[Filter] = []
+        self.enricher: Optional[Enricher] = None
+        self.sink: Optional[Sink] = None
+        self.dedup: Optional[DedupCache] = None
+        self._pipeline: Callable[..., Optional[bool]]
+        self.configure()
+
+        if any(kwargs.get(k) for k in ("metrics_port", "metrics_textfile", "metrics_statsd")):
+            self.enable_metrics(
+                port=kwargs.get("metrics_port"),
+                textfile=kwargs.get("metrics_textfile"),
+                statsd=kwargs.get("metrics_statsd"),
+                interval=float(kwargs.get("metrics_interval", 10.0)),
+            )
+        if any(kwargs.get(k) for k in ("dedup", "dedup_size", "dedup_ttl", "dedup_bloom")):
+            self.enable_dedup(
+                max_size=int(kwargs.get("dedup_size") or 100000),
+                ttl=float(kwargs.get("dedup_ttl") or 3600.0),
+                bloom_capacity=int(kwargs["dedup_bloom"]) if kwargs.get("dedup_bloom") else None,
+            )
+
+    def configure(
+        self,
+        decoder: Optional[Decoder] = None,
+        filters: Optional[List[Filter]] = None,
+        enricher: Optional[Enricher] = None,
+        sink: Optional[Sink] = None,
+    ) -> None:
+        """
+        Set stages of the message pipeline and rebuild it. Stages that are not passed are left as they are.
+
+        Args:
+            decoder (Optional[Callable[[Any], Any]]): Turns the raw payload into data.
+            filters (Optional[List[Callable[[Any], bool]]]): Predicates on the decoded data.
+            enricher (Optional[Callable[[Any, Optional[dict]], Any]]): Builds the record from the data and metadata.
+            sink (Optional[Callable[[Any], None]]): Saves the record.
+        """
+        if decoder is not None:
+            self.decoder = decoder
+        if filters is not None:
+            self.filters = filters
+        if enricher is not None:
+            self.enricher = enricher
+        if sink is not None:
+            self.sink = sink
+        self._pipeline = self._build()
+
+    def use_codec(self, codec: str) -> None:
+        """
+        Decode payloads with a codec from the codec registry, see `geniusrise_listeners.decoders.get_codec`.
+
+        Args:
+            codec (str): The codec name, e.g. "json", "orjson" or "raw". The raw codec saves payloads as they are
+                received if the output sets `accepts_bytes = True`, and wraps bytes as {"base64": "..."} otherwise.
+        """
+        self.decoder = get_codec(codec)
+        if self.decoder is None and codec == "raw" and not getattr(self.output, "accepts_bytes", False):
+            self.decoder = wrap_bytes
+        self._pipeline = self._build()
+
+    def enable_metrics(
+        self,
+        port: Optional[int] = None,
+        textfile: Optional[str] = None,
+        statsd: Optional[str] = None,
+        interval: float = 10.0,
+    ) -> "ListenerMetrics":
+        """
+        Record Prometheus metrics for this listener: messages by outcome, bytes received, per stage latencies,
+        queue depth and drops, and reconnects, labelled by the listener class and id.
+
+        Args:
+            port (Optional[int]): Serve the metrics at http://0.0.0.0:port/metrics. Defaults to None.
+            textfile (Optional[str]): Write the metrics to this file every `interval` seconds. Defaults to None.
+            statsd (Optional[str]): Push the metrics to this statsd server, as "host:port", every `interval`
+                seconds. Defaults to None.
+            interval (float): Number of seconds between pushes. Defaults to 10.
+
+        Returns:
+            ListenerMetrics: The listener's metrics.
+        """
+        if self.metrics is None:
+            from geniusrise_listeners.metrics import ListenerMetrics
+
+            self.metrics = ListenerMetrics(self.__class__.__name__, self.id, self.counters)
+        if port:
+            self.metrics.serve(int(port))
+        if textfile:
+            self.metrics.push_to_textfile(textfile, interval)
+        if statsd:
+            self.metrics.push_to_statsd(statsd, interval)
+        self._pipeline = self._build()
+        return self.metrics
+
+    def enable_dedup(
+        self,
+        max_size: int = 100000,
+        ttl: float = 3600.0,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: float = 0.001,
+    ) -> DedupCache:
+        """
+        Skip messages that were already saved, for sources that redeliver.
+
+        Messages are identified by the key the listener passes to `process`, e.g. the SQS message id, the Kinesis
+        sequence number, the Kafka topic, partition and offset or the Redis stream id, or by a hash of the payload
+        for listeners without message ids. An identity is remembered once its message is saved, so a message that
+        failed is processed again when redelivered. Duplicates count as `dedup_hit_count`, other messages as
+        `dedup_miss_count`.
+
+        Args:
+            max_size (int): Maximum number of remembered identities. Defaults to 100000.
+            ttl (float): Number of seconds an identity is remembered. Defaults to 3600.
+            bloom_capacity (Optional[int]): Also remember identities in a Bloom filter of this capacity, see
+                `DedupCache`. Defaults to None.
+            bloom_error_rate (float): False positive rate of the Bloom filter. Defaults to 0.001.
+
+        Returns:
+            DedupCache: The cache of message identities.
+        """
+        self.dedup = DedupCache(
+            max_size=max_size,
+            ttl=ttl,
+            bloom_capacity=bloom_capacity,
+            bloom_error_rate=bloom_error_rate,
+        )
+        self._pipeline = self._build()
+        return self.dedup
+
+    def process(
+        self, payload: Any, metadata: Optional[Dict[str, Any]] = None, key: Optional[Hashable] = None
+    ) -> Optional[bool]:
+        """
+        Run a message through the pipeline and save it.
+
+        Args:
+            payload (Any): The message as received from the transport.
+            metadata (Optional[Dict[str, Any]]): Metadata about the message to add to the record. Defaults to None.
+            key (Optional[Hashable]): The message identity for deduplication. Defaults to None, which identifies
+                the message by a hash of its payload.
+
+        Returns:
+            Optional[bool]: True if the message was saved, or skipped as a duplicate of a saved message. None if
+                the pipeline rejected it, because it could not be decoded or was filtered out, which is falsy like
+                False but means that handling it again would not save it either. False if it could not be saved.
+        """
+        return self._pipeline(payload, metadata, key)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of received messages that are not saved yet: those waiting in the receive queue and the records
+        buffered by the batching output.
+        """
+        in_flight = 0
+        if self.queue is not None:
+            in_flight += self.queue.depth
+        if isinstance(self.output, BatchingOutput):
+            in_flight += self.output.pending
+        return in_flight
+
+    @contextmanager
+    def listening(
+        self,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_policy: str = "block",
+        sink_workers: int = 1,
+    ) -> Iterator[None]:
+        """
+        Set up the pipeline's shared machinery for the duration of a listen() call.
+
+        The output is batched if any batching option is given, and messages are handed from the receiving thread
+        to sink worker threads through a bounded queue if `queue_size` is given. The queue is drained, and pending
+        batches and counters are flushed when the block exits.
+
+        Args:
+            batch_size (Optional[int]): Maximum number of records in a batch. Defaults to None.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits in the batch. Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            queue_size (Optional[int]): Maximum number of messages waiting for a sink worker. Defaults to None.
+            queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of threads running the pipeline behind the queue. Defaults to 1.
+        """
+        try:
+            with batching(self, batch_size=batch_size, linger_ms=linger_ms, batch_bytes=batch_bytes):
+                with queueing(self, queue_size=queue_size, queue_policy=queue_policy, sink_workers=sink_workers):
+                    yield
+        finally:
+            self.counters.flush()
+            if self.metrics:
+                self.metrics.push()
+
+    def _build(self) -> Callable[..., Optional[bool]]:
+        decoder = self.decoder
+        filters = tuple(self.filters)
+        enricher = self.enricher
+        sink = self.sink
+        dedup = self.dedup
+        counters = self.counters
+        metrics = self.metrics
+        name = self.__class__.__name__
+
+        if metrics is None and decoder is None and not filters and enricher is None and sink is None and dedup is None:
+
+            def fast_process(
+                payload: Any, metadata: Optional[Dict[str, Any]] = None, key: Optional[Hashable] = None
+            ) -> bool:
+                try:
+                    # Look the output up on every message, it can be wrapped while listening
+                    self.output.save(payload if metadata is None else {"data": payload, **metadata})
+                    counters.incr("success_count")
+                    return True
+                except Exception as e:
+                    self.log.error(f"Error processing {name} message: {e}")
+                    counters.incr("failure_count")
+                    return False
+
+            return fast_process
+
+        # Bind the metrics used per message up front, they are only called when metrics are enabled. Message counts
+        # are read from the counters.
+        timed = metrics is not None
+        clock = time.perf_counter
+        count_bytes = observe_decode = observe_filter = observe_enrich = observe_save = _unobserved
+        if metrics is not None:
+            count_bytes = metrics.received_bytes.inc
+            observe_decode, observe_filter = metrics.decode_seconds.observe, metrics.filter_seconds.observe
+            observe_enrich, observe_save = metrics.enrich_seconds.observe, metrics.save_seconds.observe
+
+        def process(
+            payload: Any, metadata: Optional[Dict[str, Any]] = None, key: Optional[Hashable] = None
+        ) -> Optional[bool]:
+            try:
+                if timed and isinstance(payload, (bytes, str, bytearray, memoryview)):
+                    count_bytes(len(payload))
+                if dedup is not None:
+                    if key is None:
+                        key = payload_key(payload)
+                    if dedup.seen(key):
+                        counters.incr("dedup_hit_count")
+                        return True
+                    counters.incr("dedup_miss_count")
+                # The end of the last timed stage
+                mark = clock() if timed else 0.0
+                try:
+                    data = decoder(payload) if decoder else payload
+                except Exception as e:
+                    self.log.error(f"Error processing {name} message: {e}")
+                    counters.incr("failure_count")
+                    return None
+                if timed:
+                    mark, start = clock(), mark
+                    observe_decode(mark - start)
+                if filters:
+                    for keep in filters:
+                        if not keep(data):
+                            if timed:
+                                observe_filter(clock() - mark)
+                            counters.incr("filtered_count")
+                            return None
+                    if timed:
+                        mark, start = clock(), mark
+                        observe_filter(mark - start)
+                if enricher:
+                    record = enricher(data, metadata)
+                else:
+                    record = data if metadata is None else {"data": data, **metadata}
+                if timed:
+                    mark, start = clock(), mark
+                    observe_enrich(mark - start)
+                if sink:
+                    sink(record)
+                else:
+                    self.output.save(record)
+                if timed:
+                    observe_save(clock() - mark)
+                if dedup is not None:
+                    dedup.add(key)
+                counters.incr("success_count")
+                return True
+            except Exception as e:
+                self.log.error(f"Error processing {name} message: {e}")
+                counters.incr("failure_count")
+                return False
+
+        return process
+
+
+def _unobserved(value: float) -> None:
+    pass
@@ -0,0 +1,223 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from geniusrise_listeners.counters import StateCounter
+
+
+class BatchingOutput:
+    def __init__(
+        self,
+        output: Any,
+        batch_size: int = 500,
+        linger_ms: int = 100,
+        batch_bytes: Optional[int] = None,
+        counters: Optional[StateCounter] = None,
+        on_sent: Optional[Callable[[List[Any]], None]] = None,
+    ):
+        r"""
+        Collect records in front of an output and hand them over in batches.
+
+        A batch is sent with the output's `save_bulk` (or one `save` per record if the output has none) once it
+        holds `batch_size` records, once it holds `batch_bytes` bytes of JSON, or once its oldest record is
+        `linger_ms` milliseconds old, whichever happens first. A background timer takes care of lingering
+        batches when no new records come in. `flush()` sends whatever is buffered and flushes the output.
+
+        Args:
+            output (Output): The output to send the batches to, usually a StreamingOutput.
+            batch_size (int): Maximum number of records in a batch. Defaults to 500.
+            linger_ms (int): Maximum number of milliseconds a record waits in the batch. Defaults to 100.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Sizes are only computed when this
+                is set. Defaults to None.
+            counters (Optional[StateCounter]): Counters to record records that could not be sent as
+                `dropped_count`. Defaults to None. They are also counted in `dropped`.
+            on_sent (Optional[Callable[[List[Any]], None]]): Called with the tokens of the records of every batch
+                that was sent, see `tracking`, e.g. to acknowledge their messages. Defaults to None.
+
+        ## Usage
+        ```python
+        output = BatchingOutput(StreamingOutput("my_topic", "localhost:9094"), batch_size=1000, linger_ms=50)
+        output.save({"key": "value"})
+        output.close()
+        ```
+        """
+        self.output = output
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.batch_bytes = batch_bytes
+        self.counters = counters
+        self.on_sent = on_sent
+        self.dropped = 0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._buffer: List[Any] = []
+        self._tokens: List[Any] = []
+        self._tracked = threading.local()
+        self._bytes = 0
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._timer = threading.Thread(target=self._run, name="batching-output", daemon=True)
+        self._timer.start()
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of records waiting in the current batch.
+        """
+        return len(self._buffer)
+
+    def save(self, data: Any, filename: Optional[str] = None) -> None:
+        """
+        Add a record to the current batch, sending the batch if it is full.
+
+        Args:
+            data (Any): The record to save.
+            filename (Optional[str]): Ignored, batches are sent without file names.
+        """
+        size = self._sizeof(data) if self.batch_bytes else 0
+        token = getattr(self._tracked, "token", None)
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(data)
+            if token is not None:
+                self._tokens.append(token)
+            self._bytes += size
+            full = len(self._buffer) >= self.batch_size or (self.batch_bytes and self._bytes >= self.batch_bytes)
+        if full:
+            self._send()
+
+    @contextmanager
+    def tracking(self, token: Any) -> Iterator[None]:
+        """
+        Tag the records saved by this thread during the block with `token`, which is passed to `on_sent` once
+        their batch is sent, and never if it cannot be.
+
+        Args:
+            token (Any): The token, e.g. the receipt handle of the message being processed.
+        """
+        self._tracked.token = token
+        try:
+            yield
+        finally:
+            self._tracked.token = None
+
+    def flush(self) -> None:
+        """
+        Send the current batch and flush the underlying output.
+        """
+        self._send()
+        self.output.flush()
+
+    def close(self) -> None:
+        """
+        Stop the linger timer and flush.
+        """
+        self._stopped.set()
+        self.flush()
+
+    def _send(self) -> None:
+        # Hold the send lock across the swap and the send so that batches go out in order
+        with self._send_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                tokens, self._tokens = self._tokens, []
+                self._bytes = 0
+            if not batch:
+                return
+
+            try:
+                if hasattr(self.output, "save_bulk"):
+                    self.output.save_bulk(batch)
+                else:
+                    for record in batch:
+                        self.output.save(record)
+            except Exception as e:
+                self.log.error(f"Error saving batch of {len(batch)} records: {e}")
+                self.dropped += len(batch)
+                if self.counters:
+                    self.counters.incr("dropped_count", len(batch))
+                return
+
+            if tokens and self.on_sent:
+                try:
+                    self.on_sent(tokens)
+                except Exception as e:
+                    self.log.error(f"Error acknowledging batch of {len(batch)} records: {e}")
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.linger / 2 or 0.001):
+            if self._buffer and time.monotonic() - self._oldest >= self.linger:
+                self._send()
+
+    @staticmethod
+    def _sizeof(data: Any) -> int:
+        if isinstance(data, (bytes, bytearray, memoryview, str)):
+            return len(data)
+        return len(json.dumps(data, default=str))
+
+
+@contextmanager
+def batching(
+    spout: Any,
+    batch_size: Optional[int] = None,
+    linger_ms: Optional[int] = None,
+    batch_bytes: Optional[int] = None,
+) -> Iterator[None]:
+    r"""
+    Put a `BatchingOutput` in front of a spout's output for the duration of the block.
+
+    Nothing is changed unless at least one of the batching options is given. Missing options fall back to the
+    `BatchingOutput` defaults. Whatever is still buffered is sent when the block exits.
+
+    Args:
+        spout (Spout): The spout whose output to batch.
+        batch_size (Optional[int]): Maximum number of records in a batch. Defaults to None.
+        linger_ms (Optional[int]): Maximum number of milliseconds a record waits in the batch. Defaults to None.
+        batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+
+    ## Usage
+    ```python
+    with batching(self, batch_size=batch_size, linger_ms=linger_ms):
+        while True:
+            self.output.save(record)
+    ```
+    """
+    if batch_size is None and linger_ms is None and batch_bytes is None:
+        yield
+        return
+
+    output = spout.output
+    kwargs: Dict[str, Any] = {"batch_size": batch_size, "linger_ms": linger_ms, "batch_bytes": batch_bytes}
+    spout.output = BatchingOutput(
+        output,
+        counters=getattr(spout, "counters", None),
+        **{k: v for k, v in kwargs.items() if v is not None},
+    )
+    try:
+        yield
+    finally:
+        try:
+            spout.output.close()
+        finally:
+            spout.output = output
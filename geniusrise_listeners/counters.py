@@ -0,0 +1,164 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class StateCounter:
+    def __init__(self, state: Any, key: str, interval: float = 1.0, max_pending: int = 10000):
+        r"""
+        Accumulate listener counters in memory and write them to the state in coalesced batches.
+
+        Every thread increments its own shard, so the hot path never takes a lock. Shards only ever grow,
+        and a flush writes the difference between their sum and what was last written. A flush happens
+        on the first increment after `interval` seconds, after `max_pending` increments, from a background
+        timer while the listener is idle, and on `close()`.
+
+        Args:
+            state (State): The state manager to write the counters to.
+            key (str): The state key, usually the spout's id.
+            interval (float): Minimum number of seconds between two state writes. Defaults to 1.0.
+            max_pending (int): Number of increments after which a flush is forced. Defaults to 10000.
+
+        ## Usage
+        ```python
+        counters = StateCounter(state, spout.id)
+        counters.incr("success_count")
+        counters.set("last_id", "1692873632-0")
+        counters.close()
+        ```
+        """
+        self.state = state
+        self.key = key
+        self.interval = interval
+        self.max_pending = max_pending
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._local = threading.local()
+        self._shards: List[Dict[str, int]] = []
+        self._flushed: Dict[str, int] = {}
+        self._gauges: Dict[str, Any] = {}
+        self._pending = 0
+        self._last_flush = float("-inf")
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name (str): The counter name, e.g. "success_count".
+            value (int): The amount to add. Defaults to 1.
+        """
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._register()
+        shard[name] = shard.get(name, 0) + value
+
+        # Not synchronized, this is only a hint for when to flush
+        self._pending += 1
+        if self._pending >= self.max_pending or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def set(self, name: str, value: Any) -> None:
+        """
+        Set a value that is written as-is on the next flush, e.g. the last processed message id.
+
+        Args:
+            name (str): The key to set.
+            value (Any): The value to set.
+        """
+        self._gauges[name] = value
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Get the counter values accumulated in this process, flushed or not.
+
+        Returns:
+            Dict[str, int]: The counter values by name.
+        """
+        totals: Dict[str, int] = {}
+        for shard in list(self._shards):
+            for name, value in list(shard.items()):
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def flush(self) -> None:
+        """
+        Write the counters accumulated since the last flush to the state.
+        """
+        with self._lock:
+            self._pending = 0
+            self._last_flush = time.monotonic()
+
+            totals = self.totals()
+            deltas = {name: value - self._flushed.get(name, 0) for name, value in totals.items()}
+            gauges, self._gauges = self._gauges, {}
+            if not any(deltas.values()) and not gauges:
+                return
+
+            try:
+                self._write({name: delta for name, delta in deltas.items() if delta}, gauges)
+                self._flushed = totals
+            except Exception as e:
+                # Keep the deltas for the next flush
+                self._gauges = {**gauges, **self._gauges}
+                self.log.error(f"Error writing counters to state: {e}")
+
+        if self._timer is None:
+            self._start_timer()
+
+    def close(self) -> None:
+        """
+        Stop the background timer and write any pending counters to the state.
+        """
+        self._stopped.set()
+        self.flush()
+
+    def _write(self, deltas: Dict[str, int], gauges: Dict[str, Any]) -> None:
+        current_state = self.state.get_state(self.key) or {
+            "success_count": 0,
+            "failure_count": 0,
+        }
+        current_state.setdefault("success_count", 0)
+        current_state.setdefault("failure_count", 0)
+        for name, delta in deltas.items():
+            current_state[name] = current_state.get(name, 0) + delta
+        current_state.update(gauges)
+        self.state.set_state(self.key, current_state)
+
+    def _register(self) -> Dict[str, int]:
+        shard: Dict[str, int] = {}
+        self._local.shard = shard
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def _start_timer(self) -> None:
+        with self._lock:
+            if self._timer is not None or self._stopped.is_set():
+                return
+            self._timer = threading.Thread(target=self._run, name=f"{self.key}-counters", daemon=True)
+            self._timer.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if time.monotonic() - self._last_flush >= self.interval:
+                self.flush()
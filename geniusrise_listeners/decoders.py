@@ -0,0 +1,160 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+Decoder = Callable[[Any], Any]
+
+log = logging.getLogger(__name__)
+
+
+def _json() -> Decoder:
+    def decode(payload: Any) -> Any:
+        # json.loads takes str and bytes, but not memoryviews
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        return json.loads(payload)
+
+    return decode
+
+
+def _orjson() -> Decoder:
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec() -> Decoder:
+    import msgspec
+
+    return msgspec.json.Decoder().decode
+
+
+def _ujson() -> Decoder:
+    import ujson
+
+    def decode(payload: Any) -> Any:
+        if isinstance(payload, (memoryview, bytearray)):
+            payload = bytes(payload)
+        return ujson.loads(payload)
+
+    return decode
+
+
+def _msgpack() -> Decoder:
+    import msgpack
+
+    def decode(payload: Any) -> Any:
+        return msgpack.unpackb(payload, raw=False)
+
+    return decode
+
+
+def _raw() -> Optional[Decoder]:
+    return None
+
+
+def wrap_bytes(payload: Any) -> Any:
+    """
+    Wrap bytes-like payloads as {"base64": "..."}, so that outputs that save JSON can save them, and pass other
+    payloads through. Used by listeners with the raw codec, unless their output takes bytes.
+
+    Args:
+        payload (Any): The payload as received.
+
+    Returns:
+        Any: The payload, or a dict holding its base64 encoding.
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return {"base64": base64.b64encode(payload).decode("ascii")}
+    return payload
+
+
+CODECS: Dict[str, Callable[[], Optional[Decoder]]] = {
+    "json": _json,
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "ujson": _ujson,
+    "msgpack": _msgpack,
+    "raw": _raw,
+}
+
+# JSON codecs fall back to the standard library when their package is not installed
+FALLBACKS: Dict[str, str] = {"orjson": "json", "msgspec": "json", "ujson": "json"}
+
+# Fastest first, used by the "auto" codec
+PREFERENCE = ["orjson", "msgspec", "ujson", "json"]
+
+
+def register_codec(name: str, factory: Callable[[], Optional[Decoder]], fallback: Optional[str] = None) -> None:
+    """
+    Register a codec.
+
+    Args:
+        name (str): The name to select the codec by.
+        factory (Callable[[], Optional[Callable[[Any], Any]]]): Returns the decoding function, or None to pass
+            payloads through as-is. May raise ImportError if the codec's package is not installed.
+        fallback (Optional[str]): The codec to use instead if the factory raises ImportError. Defaults to None.
+    """
+    CODECS[name] = factory
+    if fallback:
+        FALLBACKS[name] = fallback
+
+
+def get_codec(name: str = "json") -> Optional[Decoder]:
+    r"""
+    Get the decoding function of a codec.
+
+    Every codec takes `str`, `bytes`, `bytearray` and `memoryview` payloads, so that listeners can hand over what
+    they receive without calling `.decode()` first.
+
+    - **json**: The standard library's `json.loads`.
+    - **orjson**, **msgspec**, **ujson**: Faster JSON parsers, falling back to `json` if not installed.
+    - **auto**: The fastest JSON parser that is installed.
+    - **msgpack**: MessagePack, requires the `msgpack` package.
+    - **raw**: No parsing at all, payloads are saved as they are received. `Listener.use_codec` wraps bytes
+      payloads with `wrap_bytes` for outputs that save JSON.
+
+    Args:
+        name (str): The codec name. Defaults to "json".
+
+    Returns:
+        Optional[Callable[[Any], Any]]: The decoding function, or None for the raw codec.
+
+    Raises:
+        ValueError: If the codec is unknown.
+        ImportError: If the codec's package is not installed and it has no fallback.
+    """
+    if name == "auto":
+        for candidate in PREFERENCE:
+            try:
+                return CODECS[candidate]()
+            except ImportError:
+                continue
+
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}, expected one of {', '.join(['auto', *CODECS])}")
+
+    try:
+        return CODECS[name]()
+    except ImportError:
+        fallback = FALLBACKS.get(name)
+        if fallback is None:
+            raise
+        log.warning(f"{name} is not installed, falling back to the {fallback} codec")
+        return get_codec(fallback)
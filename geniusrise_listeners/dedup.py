@@ -0,0 +1,172 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+def payload_key(payload: Any) -> bytes:
+    """
+    Identify a message by a hash of its payload, for transports without message ids.
+
+    Args:
+        payload (Any): The message as received from the transport.
+
+    Returns:
+        bytes: A 16 byte BLAKE2b digest of the payload, or of its JSON if it is not bytes or a string.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode()
+    elif not isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        r"""
+        A fixed size Bloom filter: a set that can answer "maybe" but never forgets, in about 1.8 bytes per key at
+        a 0.1% false positive rate.
+
+        Args:
+            capacity (int): Number of keys the filter is sized for.
+            error_rate (float): False positive rate at capacity. Defaults to 0.001.
+        """
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be at least 1 and error_rate between 0 and 1")
+
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: Hashable):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+        # Double hashing, k positions from two 64-bit hashes
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: Hashable) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DedupCache:
+    def __init__(
+        self,
+        max_size: int = 100000,
+        ttl: float = 3600.0,
+        bloom_capacity: Optional[int] = None,
+        bloom_error_rate: float = 0.001,
+    ):
+        r"""
+        Remember the identities of recently saved messages, to skip redeliveries of at-least-once sources.
+
+        Identities are kept in an LRU of at most `max_size` entries, each forgotten `ttl` seconds after it was
+        added. For very high cardinalities, a Bloom filter of `bloom_capacity` keys also remembers every identity
+        the LRU has forgotten, at a false positive rate of `bloom_error_rate`: a message that was never seen is
+        then taken for a duplicate with that probability. The Bloom filter is replaced by a fresh one once it is
+        full, and the full one is still looked at until the fresh one is full in turn.
+
+        All methods are thread safe.
+
+        Args:
+            max_size (int): Maximum number of identities in the LRU. Defaults to 100000.
+            ttl (float): Number of seconds an identity stays in the LRU. Defaults to 3600.
+            bloom_capacity (Optional[int]): Number of identities per Bloom filter. Defaults to None, no filter.
+            bloom_error_rate (float): False positive rate of the Bloom filter. Defaults to 0.001.
+
+        ## Usage
+        ```python
+        cache = DedupCache(max_size=100000, ttl=600)
+        if not cache.seen(message_id):
+            save(message)
+            cache.add(message_id)
+        ```
+        """
+        if max_size < 1 or ttl <= 0:
+            raise ValueError("max_size must be at least 1 and ttl positive")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity else None
+        self._previous_bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def seen(self, key: Hashable) -> bool:
+        """
+        Check whether a message with this identity was added before.
+
+        Args:
+            key (Hashable): The message identity.
+
+        Returns:
+            bool: True if the identity is in the LRU and has not expired, or may be in the Bloom filter.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is not None:
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return True
+                del self._entries[key]
+            if self._bloom is not None:
+                return key in self._bloom or (self._previous_bloom is not None and key in self._previous_bloom)
+            return False
+
+    def add(self, key: Hashable) -> None:
+        """
+        Remember a message identity.
+
+        Args:
+            key (Hashable): The message identity.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = now + self.ttl
+            self._entries.move_to_end(key)
+            # Least recently seen first, expired or not
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            while self._entries:
+                oldest, expires = next(iter(self._entries.items()))
+                if expires > now:
+                    break
+                del self._entries[oldest]
+
+            if self._bloom is not None:
+                if self._bloom.count >= self._bloom.capacity:
+                    self._previous_bloom = self._bloom
+                    self._bloom = BloomFilter(self._bloom.capacity, self.bloom_error_rate)
+                self._bloom.add(key)
@@ -0,0 +1,298 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A parser turns a packet into a record, or None if the packet is malformed
+Parser = Callable[[Any], Any]
+
+STATSD_TYPES = frozenset(("c", "g", "ms", "h", "s", "d"))
+
+# One [id param="value" ...] element of RFC 5424 structured data, values escape '"', '\' and ']' with '\'
+_SD_ELEMENT = re.compile(r'\[([^\s="\]]+)((?:\s+[^\s="\]]+="(?:[^"\\]|\\.)*")*)\]')
+_SD_PARAM = re.compile(r'([^\s="\]]+)="((?:[^"\\]|\\.)*)"')
+_SD_ESCAPE = re.compile(r'\\(["\\\]])')
+
+_INFLUX_TRUE = frozenset(("t", "T", "true", "True", "TRUE"))
+_INFLUX_FALSE = frozenset(("f", "F", "false", "False", "FALSE"))
+
+
+def _text(payload: Any) -> Optional[str]:
+    if isinstance(payload, str):
+        return payload
+    try:
+        return str(payload, "utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def parse_statsd(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse a statsd packet of one or more newline separated metrics, e.g. "requests:1|c|@0.5|#region:eu".
+
+    Every metric is parsed into {"name", "value", "type", "sample_rate", "tags"}, with "delta": True for gauges
+    that are changed by a signed value. Values are floats, except the members of sets, which are kept as strings.
+    Tags are the DogStatsD "#key:value,..." extension, None when absent.
+
+    Args:
+        payload (Any): The packet, as str, bytes or memoryview.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The metrics, or None if the packet is malformed.
+    """
+    text = _text(payload)
+    if not text:
+        return None
+    metrics = []
+    for line in text.split("\n"):
+        if not line:
+            continue
+        name, sep, rest = line.partition(":")
+        fields = rest.split("|")
+        if not sep or not name or len(fields) < 2:
+            return None
+        value, kind = fields[0], fields[1]
+        if kind not in STATSD_TYPES:
+            return None
+        metric: Dict[str, Any] = {"name": name, "value": value, "type": kind, "sample_rate": 1.0, "tags": None}
+        try:
+            if kind != "s":
+                metric["value"] = float(value)
+            for field in fields[2:]:
+                if field[:1] == "@":
+                    metric["sample_rate"] = float(field[1:])
+                elif field[:1] == "#":
+                    metric["tags"] = dict(tag.partition(":")[::2] for tag in field[1:].split(","))
+        except ValueError:
+            return None
+        if kind == "g" and value[:1] in ("+", "-"):
+            metric["delta"] = True
+        metrics.append(metric)
+    return metrics or None
+
+
+def parse_syslog(payload: Any) -> Optional[Dict[str, Any]]:
+    """
+    Parse an RFC 5424 syslog message, e.g. '<165>1 2003-10-11T22:14:15.003Z host app 1234 ID47 [id a="1"] hello'.
+
+    The message is parsed into {"facility", "severity", "version", "timestamp", "hostname", "app_name", "procid",
+    "msgid", "structured_data", "message"}. Nil ("-") header fields and missing structured data or message are
+    None. Structured data is {element id: {param: value}}. The timestamp is kept as it is sent.
+
+    Args:
+        payload (Any): The message, as str, bytes or memoryview.
+
+    Returns:
+        Optional[Dict[str, Any]]: The message, or None if it is malformed.
+    """
+    text = _text(payload)
+    if not text or text[0] != "<":
+        return None
+    end = text.find(">", 1, 5)
+    if end < 2 or not text[1:end].isdigit():
+        return None
+    priority = int(text[1:end])
+    header = text[end + 1 :].split(" ", 6)
+    if priority > 191 or len(header) < 7 or not header[0].isdigit():
+        return None
+
+    version, timestamp, hostname, app_name, procid, msgid, rest = header
+    structured_data: Optional[Dict[str, Dict[str, str]]] = None
+    if rest[:1] == "-":
+        position = 1
+    elif rest[:1] == "[":
+        structured_data = {}
+        position = 0
+        while rest[position : position + 1] == "[":
+            element = _SD_ELEMENT.match(rest, position)
+            if element is None:
+                return None
+            structured_data[element.group(1)] = {
+                name: _SD_ESCAPE.sub(r"\1", value) if "\\" in value else value
+                for name, value in _SD_PARAM.findall(element.group(2))
+            }
+            position = element.end()
+    else:
+        return None
+
+    message: Optional[str] = None
+    if position < len(rest):
+        if rest[position] != " ":
+            return None
+        message = rest[position + 1 :]
+        # An UTF-8 message may start with a byte order mark
+        if message[:1] == "\ufeff":
+            message = message[1:]
+
+    return {
+        "facility": priority >> 3,
+        "severity": priority & 7,
+        "version": int(version),
+        "timestamp": None if timestamp == "-" else timestamp,
+        "hostname": None if hostname == "-" else hostname,
+        "app_name": None if app_name == "-" else app_name,
+        "procid": None if procid == "-" else procid,
+        "msgid": None if msgid == "-" else msgid,
+        "structured_data": structured_data,
+        "message": message,
+    }
+
+
+def _split(text: str, separator: str) -> List[str]:
+    # Split on the separators that are neither escaped with a backslash nor inside a quoted string
+    parts = []
+    start = 0
+    quoted = escaped = False
+    for i, char in enumerate(text):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append(text[start:i])
+            start = i + 1
+    if quoted:
+        raise ValueError("Unterminated string")
+    parts.append(text[start:])
+    return parts
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r"\\(.)", r"\1", text) if "\\" in text else text
+
+
+def _pair(text: str, simple: bool) -> Tuple[str, str]:
+    # Split a key=value pair, unescaping the key
+    if simple:
+        name, sep, value = text.partition("=")
+    else:
+        parts = _split(text, "=")
+        sep = "=" if len(parts) == 2 else ""
+        name, value = _unescape(parts[0]), parts[-1]
+    if not sep or not name or not value:
+        raise ValueError(f"Invalid key=value pair: {text}")
+    return name, value
+
+
+def _influx_value(value: str) -> Any:
+    last = value[-1:]
+    if last == '"' and value[:1] == '"' and len(value) > 1:
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    if last == "i" or last == "u":
+        return int(value[:-1])
+    if value in _INFLUX_TRUE:
+        return True
+    if value in _INFLUX_FALSE:
+        return False
+    return float(value)
+
+
+def parse_influx(payload: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Parse InfluxDB line protocol, e.g. 'cpu,host=a usage=0.5,cores=4i 1700000000000000000', one point per line.
+
+    Every point is parsed into {"measurement", "tags", "fields", "timestamp"}. Integer ("4i") and unsigned ("4u")
+    fields are ints, "t"/"true" and "f"/"false" are bools, quoted fields are strings and anything else is a float.
+    The timestamp is an int in the precision it was sent in, None when absent. Comment lines are skipped. Lines
+    without escapes or strings are split directly, the others character by character.
+
+    Args:
+        payload (Any): The lines, as str, bytes or memoryview.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The points, or None if the lines are malformed.
+    """
+    text = _text(payload)
+    if not text:
+        return None
+    points = []
+    try:
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line or line[0] == "#":
+                continue
+            simple = "\\" not in line and '"' not in line
+            parts = line.split(" ") if simple else _split(line, " ")
+            if not 2 <= len(parts) <= 3 or not parts[1]:
+                return None
+            key = parts[0].split(",") if simple else _split(parts[0], ",")
+            if not key[0]:
+                return None
+
+            tags = {}
+            for tag in key[1:]:
+                name, value = _pair(tag, simple)
+                tags[name] = value if simple else _unescape(value)
+            fields = {}
+            for field in parts[1].split(",") if simple else _split(parts[1], ","):
+                name, value = _pair(field, simple)
+                fields[name] = _influx_value(value)
+
+            points.append(
+                {
+                    "measurement": key[0] if simple else _unescape(key[0]),
+                    "tags": tags,
+                    "fields": fields,
+                    "timestamp": int(parts[2]) if len(parts) == 3 else None,
+                }
+            )
+    except ValueError:
+        return None
+    return points or None
+
+
+FORMATS: Dict[str, Parser] = {
+    "statsd": parse_statsd,
+    "syslog": parse_syslog,
+    "influx": parse_influx,
+}
+
+
+def get_format(name: str) -> Parser:
+    """
+    Get the parser of a packet format.
+
+    - **statsd**: statsd metrics, see `parse_statsd`.
+    - **syslog**: RFC 5424 syslog messages, see `parse_syslog`.
+    - **influx**: InfluxDB line protocol, see `parse_influx`.
+
+    Args:
+        name (str): The format name.
+
+    Returns:
+        Callable[[Any], Any]: The parser, which returns None for malformed packets.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format: {name}, expected one of {', '.join(FORMATS)}")
+    return FORMATS[name]
+
+
+def parsed(data: Any) -> bool:
+    """
+    Filter out the packets a parser rejected.
+
+    Args:
+        data (Any): The parsed packet.
+
+    Returns:
+        bool: Whether the packet was parsed.
+    """
+    return data is not None
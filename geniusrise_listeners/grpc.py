@@ -14,13 +14,15 @@
 # limitations under the License.
 
 import grpc
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 from typing import Optional
 from my_service_pb2 import StreamRequest
 from my_service_pb2_grpc import MyServiceStub
 
+from geniusrise_listeners.base import Listener
 
-class Grpc(Spout):
+
+class Grpc(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Grpc class.
@@ -59,8 +61,7 @@ class Grpc(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
     def listen(
         self,
@@ -111,29 +112,12 @@ class Grpc(Spout):
         try:
             for response in stub.StreamMessages(request):
                 # Enrich the data with metadata about the response
-                enriched_data = {
-                    "data": response.response_data,
-                    "syntax": syntax,  # Include the syntax in the enriched data
-                }
-
-                # Use the output's save method
-                self.output.save(enriched_data)
-
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["success_count"] += 1
-                self.state.set_state(self.id, current_state)
+                # Include the syntax in the enriched data
+                self.process(response.response_data, {"syntax": syntax})
 
         except grpc.RpcError as e:
             self.log.error(f"Error processing gRPC message: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        finally:
+            self.counters.flush()
@@ -17,11 +17,13 @@ import time
 from typing import Dict, Optional
 
 import requests
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 from requests.exceptions import HTTPError, RequestException
 
+from geniusrise_listeners.base import Listener
 
-class RESTAPIPoll(Spout):
+
+class RESTAPIPoll(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the RESTAPIPoll class.
@@ -60,8 +62,7 @@ class RESTAPIPoll(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
     def poll_api(
         self,
@@ -89,26 +90,6 @@ class RESTAPIPoll(Spout):
             response = getattr(requests, method.lower())(url, json=body, headers=headers, params=params)
             response.raise_for_status()
             data = response.json()
-
-            # Add additional data about the request
-            enriched_data = {
-                "data": data,
-                "url": url,
-                "method": method,
-                "headers": headers,
-                "params": params,
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
         except HTTPError:
             self.log.error(
                 f"HTTP error {response.status_code} when fetching data from {url}. Response: {response.text}"
@@ -118,13 +99,10 @@ class RESTAPIPoll(Spout):
         except Exception as e:
             self.log.error(f"Unexpected error: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        else:
+            # Add additional data about the request
+            self.process(data, {"url": url, "method": method, "headers": headers, "params": params})
 
     def listen(
         self,
@@ -147,6 +125,9 @@ class RESTAPIPoll(Spout):
             params (Optional[Dict[str, str]]): The request query parameters. Defaults to None.
         """
 
-        while True:
-            self.poll_api(url, method, body, headers, params)
-            time.sleep(interval)
+        try:
+            while True:
+                self.poll_api(url, method, body, headers, params)
+                time.sleep(interval)
+        finally:
+            self.counters.flush()
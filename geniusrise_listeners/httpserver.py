@@ -0,0 +1,312 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+# Maximum size of a request line and its headers
+MAX_HEAD_BYTES = 65536
+
+
+class HTTPRequest:
+    def __init__(self, method: str, target: str, version: str, headers: Dict[str, str], body: bytes = b""):
+        r"""
+        An HTTP request received by `AsyncHTTPServer`.
+
+        Args:
+            method (str): The request method, e.g. "POST".
+            target (str): The request target, the path and the query string.
+            version (str): The HTTP version, e.g. "HTTP/1.1".
+            headers (Dict[str, str]): The headers, with names in title case as CherryPy has them, e.g.
+                "Content-Type". Repeated headers are joined with ", ".
+            body (bytes): The request body, de-chunked. Defaults to b"".
+        """
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+        split = urlsplit(target)
+        self.path = split.path or "/"
+        self.query = split.query
+
+    @property
+    def keep_alive(self) -> bool:
+        """
+        Whether the client wants to keep the connection open after the response.
+        """
+        connection = self.headers.get("Connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+# A handler returns the response status and body
+Handler = Callable[[HTTPRequest], Tuple[int, str]]
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+
+class AsyncHTTPServer:
+    def __init__(
+        self,
+        handler: Handler,
+        host: str = "0.0.0.0",
+        port: int = 3000,
+        max_concurrency: int = 64,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        keepalive_timeout: float = 75.0,
+        request_timeout: float = 30.0,
+        reuse_port: bool = False,
+    ):
+        r"""
+        A minimal HTTP/1.1 server on asyncio, for listeners that receive requests from many clients at once.
+
+        Connections are served by the event loop, so an idle or slow client only costs a coroutine, not a thread.
+        Connections are kept alive between requests, and pipelined requests are answered in order. Bodies are
+        read whole, by Content-Length or chunked, before `handler` is called with the request on one of
+        `max_concurrency` threads, which keeps the event loop free while the handler runs. At most
+        `max_concurrency` requests are handled at once, the others wait for a slot once their body is read.
+        Clients get `request_timeout` seconds to send a body, or are answered with 408, and as long to take
+        their response. When the server stops, the requests being read or handled get as long to finish before
+        their connections are closed.
+
+        Args:
+            handler (Callable[[HTTPRequest], Tuple[int, str]]): Handles a request on a worker thread and returns
+                the response status and body.
+            host (str): The host to bind. Defaults to "0.0.0.0".
+            port (int): The port to bind. Defaults to 3000.
+            max_concurrency (int): Maximum number of requests handled at once. Defaults to 64.
+            max_body_bytes (int): Larger requests are refused with 413. Defaults to 10 MiB.
+            keepalive_timeout (float): Number of seconds an idle connection is kept open. Defaults to 75.
+            request_timeout (float): Number of seconds to read a request body, and to send a response.
+                Defaults to 30.
+            reuse_port (bool): Bind with SO_REUSEPORT, to share the port with other processes. Defaults to False.
+
+        ## Usage
+        ```python
+        server = AsyncHTTPServer(lambda request: (200, ""), port=3000)
+        asyncio.run(server.serve())
+        ```
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.max_body_bytes = max_body_bytes
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.reuse_port = reuse_port
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        # The connections being served, with the writers of those waiting for a request
+        self._connections: Set[asyncio.Task] = set()
+        self._idle: Set[asyncio.StreamWriter] = set()
+
+    async def serve(self) -> None:
+        """
+        Serve until `stop` is called, then finish the requests being processed.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = stopped = asyncio.Event()
+        limit = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="http-worker") as executor:
+            server = await asyncio.start_server(
+                lambda reader, writer: self._connection(reader, writer, stopped, limit, executor),
+                self.host,
+                self.port,
+                reuse_port=self.reuse_port or None,
+                limit=MAX_HEAD_BYTES,
+            )
+            self.log.info(f"Listening on {self.host}:{self.port}")
+            try:
+                await stopped.wait()
+            finally:
+                # Close the idle connections and let those in the middle of a request answer it, for a while
+                server.close()
+                for writer in self._idle:
+                    writer.close()
+                if self._connections:
+                    _, pending = await asyncio.wait(self._connections, timeout=self.request_timeout)
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                await server.wait_closed()
+                self._loop = None
+
+    def stop(self) -> None:
+        """
+        Stop serving, from any thread. Does nothing when the server is not serving.
+        """
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _connection(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        stopped: asyncio.Event,
+        limit: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._connections.add(task)  # type: ignore
+        try:
+            while not stopped.is_set():
+                self._idle.add(writer)
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, "Request headers too large", False)
+                    return
+                finally:
+                    self._idle.discard(writer)
+
+                try:
+                    request = self._parse_head(head)
+                except _BadRequest as e:
+                    await self._respond(writer, e.status, e.message, False)
+                    return
+
+                try:
+                    request.body = await asyncio.wait_for(
+                        self._read_body(request, reader, writer), self.request_timeout
+                    )
+                except _BadRequest as e:
+                    await self._respond(writer, e.status, e.message, False)
+                    return
+                except asyncio.TimeoutError:
+                    await self._respond(writer, 408, "Request body timeout", False)
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+
+                async with limit:
+                    try:
+                        status, body = await loop.run_in_executor(executor, self.handler, request)
+                    except Exception as e:
+                        self.log.error(f"Error handling {request.method} {request.target}: {e}")
+                        status, body = 500, "Internal Server Error"
+
+                keep_alive = request.keep_alive and not stopped.is_set()
+                await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.TimeoutError):
+            return
+        finally:
+            self._connections.discard(task)  # type: ignore
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head: bytes) -> HTTPRequest:
+        try:
+            lines = head[:-4].decode("latin-1").split("\r\n")
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise _BadRequest(400, "Malformed request line")
+        if not version.startswith("HTTP/1."):
+            raise _BadRequest(505, "HTTP version not supported")
+
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if not sep or not name or name != name.strip():
+                raise _BadRequest(400, "Malformed header")
+            name = name.title()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+        return HTTPRequest(method, target, version, headers)
+
+    async def _read_body(
+        self,
+        request: HTTPRequest,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> bytes:
+        chunked = "chunked" in request.headers.get("Transfer-Encoding", "").lower()
+        length = 0
+        if not chunked:
+            content_length = request.headers.get("Content-Length")
+            if content_length is None:
+                return b""
+            if not (content_length.isascii() and content_length.isdigit()):
+                raise _BadRequest(400, "Malformed Content-Length")
+            length = int(content_length)
+            if length > self.max_body_bytes:
+                raise _BadRequest(413, "Request body too large")
+
+        if request.headers.get("Expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        if not chunked:
+            return await reader.readexactly(length)
+
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            line = await self._read_line(reader)
+            try:
+                chunk_size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise _BadRequest(400, "Malformed chunk size")
+            if chunk_size < 0:
+                raise _BadRequest(400, "Malformed chunk size")
+            if chunk_size == 0:
+                # Skip the trailers
+                while await self._read_line(reader) != b"\r\n":
+                    pass
+                return b"".join(chunks)
+            size += chunk_size
+            if size > self.max_body_bytes:
+                raise _BadRequest(413, "Request body too large")
+            chunks.append(await reader.readexactly(chunk_size))
+            await reader.readexactly(2)
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader) -> bytes:
+        try:
+            return await reader.readuntil(b"\r\n")
+        except asyncio.LimitOverrunError:
+            raise _BadRequest(400, "Chunk size or trailer line too long")
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: str, keep_alive: bool) -> None:
+        payload = body.encode("utf-8")
+        head = (
+            f"HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Content-Type: text/plain;charset=utf-8\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await asyncio.wait_for(writer.drain(), self.request_timeout)
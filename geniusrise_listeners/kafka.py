@@ -14,13 +14,25 @@
 # limitations under the License.
 
 import json
-from typing import Optional
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
 
-from confluent_kafka import Consumer, KafkaError
-from geniusrise import Spout, State, StreamingOutput
+from confluent_kafka import TIMESTAMP_NOT_AVAILABLE, Consumer, KafkaError, Message, TopicPartition
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.batching import BatchingOutput
+from geniusrise_listeners.lag import ConsumerStats
+from geniusrise_listeners.metrics import PARTITION_GAUGES
+from geniusrise_listeners.offsets import OffsetTracker
+from geniusrise_listeners.partitions import PartitionPool
+from geniusrise_listeners.replay import Position, ReplayWindow
+from geniusrise_listeners.routing import routing
+from geniusrise_listeners.schemas import ConfluentDecoder, get_schema_registry
+from geniusrise_listeners.supervisor import supervised
 
-class Kafka(Spout):
+
+class Kafka(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Kafka class.
@@ -58,34 +70,333 @@ class Kafka(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
+        self.consumer: Optional[Consumer] = None
+        self.offsets: Optional[OffsetTracker] = None
+        self.batching: Optional[BatchingOutput] = None
+        self.pool: Optional[PartitionPool] = None
+        self.stats = ConsumerStats()
+        self.replay: Optional[ReplayWindow] = None
+        self.paused = False
+
+    def _commit(self, partitions: Optional[List[TopicPartition]] = None, asynchronous: bool = True) -> None:
+        """
+        Flush the output, then commit the offsets below which every message was handled.
+
+        Once the batching output dropped records, nothing is committed anymore: the dropped records may belong
+        to messages that are done, and the next consumer of the partitions has to consume them again.
+
+        Args:
+            partitions (Optional[List[TopicPartition]]): Only commit these partitions. Defaults to None, all.
+            asynchronous (bool): Whether to return without waiting for the commit. Defaults to True.
+
+        Raises:
+            RuntimeError: If the batching output dropped records, the first time.
+        """
+        if self.offsets is None or self.consumer is None:
+            return
+        keys = None if partitions is None else [(p.topic, p.partition) for p in partitions]
+        # Take the offsets before flushing, their records are then in the output
+        committable = self.offsets.committable(keys)
+        if not committable:
+            return
+        self.output.flush()
+        if self.batching is not None and self.batching.dropped:
+            self.offsets.hold()
+            raise RuntimeError(f"{self.batching.dropped} records could not be saved, no longer committing offsets")
+        self.consumer.commit(
+            offsets=[TopicPartition(topic, partition, offset) for (topic, partition), offset in committable.items()],
+            asynchronous=asynchronous,
+        )
+        self.offsets.committed(committable)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of consumed messages that are not saved yet, including those waiting for a partition worker.
+        """
+        return super().in_flight + (self.pool.in_flight if self.pool is not None else 0)
+
+    def _throttle(self, high: int, low: int) -> None:
+        """
+        Pause fetching from the assigned partitions while too many messages are in flight, and resume once enough
+        of them are saved. The consumer keeps polling while paused, so that it stays in its group.
+
+        Args:
+            high (int): Pause at this many messages in flight.
+            low (int): Resume at this many messages in flight.
+        """
+        consumer = self.consumer
+        if consumer is None:
+            return
+        in_flight = self.in_flight
+        if in_flight >= high or (self.paused and in_flight > low):
+            # Also pauses partitions assigned since the last pause
+            consumer.pause(consumer.assignment())
+            if not self.paused:
+                self.paused = True
+                self.log.info(f"Pausing partitions, {in_flight} messages in flight")
+                self.counters.incr("pause_count")
+                self.counters.set("paused", True)
+        elif self.paused:
+            partitions = consumer.assignment()
+            if self.replay is not None:
+                # Finished partitions stay paused
+                partitions = [tp for tp in partitions if (tp.topic, tp.partition) not in self.replay.done]
+            consumer.resume(partitions)
+            self.paused = False
+            self.log.info(f"Resuming partitions, {in_flight} messages in flight")
+            self.counters.set("paused", False)
+
+    def lag(self) -> Dict[Tuple[str, int], int]:
+        """
+        Compute the lag of every assigned partition, from its high watermark and its committed position.
+
+        This makes no request to the brokers: the watermarks are the ones cached from the last fetch responses,
+        and the committed positions are the offsets committed by at_least_once, or else the consumer's positions,
+        which auto-commit commits every few seconds.
+
+        Returns:
+            Dict[Tuple[str, int], int]: The number of messages behind the high watermark by (topic, partition).
+        """
+        consumer = self.consumer
+        if consumer is None:
+            return {}
+        assignment = consumer.assignment()
+        if not assignment:
+            return {}
+
+        positions = {(tp.topic, tp.partition): tp.offset for tp in consumer.position(assignment)}
+        if self.offsets is not None:
+            positions.update(self.offsets.committed_offsets())
+
+        lags = {}
+        for tp in assignment:
+            low, high = consumer.get_watermark_offsets(tp, cached=True)
+            if high < 0:
+                continue
+            # Negative positions are logical offsets, nothing was consumed yet
+            position = positions.get((tp.topic, tp.partition), -1)
+            lags[(tp.topic, tp.partition)] = max(0, high - (position if position >= 0 else low))
+        return lags
+
+    def _on_stats(self, stats: str) -> None:
+        try:
+            partitions = self.stats.update(json.loads(stats))
+            for key, lag in self.lag().items():
+                partitions.setdefault(key, dict.fromkeys(PARTITION_GAUGES))["lag"] = lag
+            if self.metrics:
+                self.metrics.partitions = partitions
+            # Every worker process sets the partitions it consumes
+            name = "partitions" if self.worker is None else f"partitions_{self.worker}"
+            self.counters.set(
+                name, {f"{topic}[{partition}]": gauges for (topic, partition), gauges in partitions.items()}
+            )
+        except Exception as e:
+            self.log.error(f"Error handling Kafka statistics: {e}")
+
+    @staticmethod
+    def _metadata(message: Message) -> Dict[str, Any]:
+        timestamp_type, timestamp = message.timestamp()
+        return {
+            "topic": message.topic(),
+            "partition": message.partition(),
+            "offset": message.offset(),
+            "timestamp": None if timestamp_type == TIMESTAMP_NOT_AVAILABLE else timestamp,
+            "headers": {
+                name: value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+                for name, value in message.headers() or []
+            },
+        }
+
+    def _on_commit(self, error: Optional[KafkaError], partitions: List[TopicPartition]) -> None:
+        if error:
+            self.log.error(f"Error committing offsets: {error}")
+            self.counters.incr("commit_failure_count")
+
+    def _on_assign(self, consumer: Consumer, partitions: List[TopicPartition]) -> None:
+        self.log.info(f"Assigned partitions: {', '.join(f'{p.topic}[{p.partition}]' for p in partitions)}")
+        if self.replay is not None and self.replay.assign(consumer, partitions):
+            # Start from the offsets set by the replay instead of the committed ones
+            consumer.assign(partitions)
 
+    def _on_revoke(self, consumer: Consumer, partitions: List[TopicPartition]) -> None:
+        self.log.info(f"Revoked partitions: {', '.join(f'{p.topic}[{p.partition}]' for p in partitions)}")
+        # Let the workers finish the revoked partitions' messages, then commit what was handled before another
+        # consumer takes over
+        if self.pool is not None:
+            self.pool.drain([(p.topic, p.partition) for p in partitions])
+        try:
+            self._commit(partitions, asynchronous=False)
+        except Exception as e:
+            self.log.error(f"Error committing offsets of revoked partitions: {e}")
+        if self.offsets is not None:
+            self.offsets.revoke([(p.topic, p.partition) for p in partitions])
+        if self.replay is not None:
+            self.replay.revoke(partitions)
+
+    @supervised
     def listen(
         self,
-        topic: str,
+        topic: Union[str, List[str]],
         group_id: str,
         bootstrap_servers: str = "localhost:9092",
         username: Optional[str] = None,
         password: Optional[str] = None,
+        codec: str = "json",
+        num_messages: int = 1,
+        timeout: float = 1.0,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_policy: str = "block",
+        sink_workers: int = 1,
+        at_least_once: bool = False,
+        commit_every: int = 1000,
+        commit_interval: float = 5.0,
+        stats_interval_ms: int = 0,
+        partition_workers: int = 0,
+        partition_pool: str = "thread",
+        include_metadata: bool = False,
+        output_topics: Optional[Dict[str, str]] = None,
+        start_from: Optional[Position] = None,
+        stop_at: Optional[Position] = None,
+        max_in_flight: Optional[int] = None,
+        resume_in_flight: Optional[int] = None,
+        queued_max_kbytes: Optional[int] = None,
+        queued_min_messages: Optional[int] = None,
+        fetch_max_bytes: Optional[int] = None,
+        max_partition_fetch_bytes: Optional[int] = None,
+        schema_registry: Optional[str] = None,
+        schema_registry_auth: Optional[str] = None,
+        validate_schemas: bool = False,
+        workers: int = 1,
     ):
         """
-        📖 Start listening for data from the Kafka topic.
+        📖 Start listening for data from the Kafka topics.
 
         Args:
-            topic (str): The Kafka topic to listen to.
+            topic (Union[str, List[str]]): The Kafka topic to listen to, a list or comma separated string of topics,
+                or a regular expression starting with "^" matching the topics, e.g. "^events-.*". Topics created
+                later are picked up when the consumer refreshes its metadata.
             group_id (str): The Kafka consumer group ID.
             bootstrap_servers (str): The Kafka bootstrap servers. Defaults to "localhost:9092".
             username (Optional[str]): The username for SASL/PLAIN authentication. Defaults to None.
             password (Optional[str]): The password for SASL/PLAIN authentication. Defaults to None.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto", or "confluent" for the Confluent wire format of Avro, Protobuf and JSON Schema
+                serializers, with schemas from schema_registry. Defaults to "json".
+            num_messages (int): Consume up to this many messages at a time with `Consumer.consume`, instead of
+                polling them one by one. Unless a batching option is given, the records of a batch are then also
+                sent to the output together. Defaults to 1.
+            timeout (float): Maximum number of seconds to wait for messages. Defaults to 1.
+            batch_size (Optional[int]): Send records to the output in batches of at most this many records.
+                Defaults to None, which saves every record as it arrives.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits for its batch to fill up.
+                Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            queue_size (Optional[int]): Hand messages to sink worker threads through a queue of at most this many
+                messages, so that a slow output does not stall the reads. Defaults to None, which processes every
+                message on the receiving thread.
+            queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of sink worker threads. Defaults to 1.
+            at_least_once (bool): Commit offsets only once their messages are handled and the output is flushed,
+                instead of auto-committing them as they are consumed. Each partition's offset is committed up to
+                its highest offset below which every message was handled, so a crash can redeliver messages but
+                never loses them. Messages that could not be decoded or were filtered out count as handled. A
+                message that could not be saved is not, and holds its partition's commits back until another
+                consumer takes over; if the batching output drops records, no more offsets are committed at all.
+                Requires the "block" queue policy. Defaults to False.
+            commit_every (int): With at_least_once, commit after this many handled messages. Defaults to 1000.
+            commit_interval (float): With at_least_once, commit at least every this many seconds. Defaults to 5.
+            stats_interval_ms (int): Every this many milliseconds, expose the lag, fetch rates and fetch latency
+                of every partition in the state, under "partitions" or "partitions_<worker>" with several worker
+                processes, and in the metrics, from the librdkafka statistics and the cached watermarks. Defaults to
+                0, no statistics.
+            partition_workers (int): Run the pipeline on this many workers, with all messages of a partition on
+                the same worker, so that messages are processed in order within a partition and in parallel across
+                partitions. The messages of revoked partitions are drained before their offsets are committed.
+                Cannot be combined with queue_size. Defaults to 0, which processes every message on the consuming
+                thread.
+            partition_pool (str): What the partition workers are, "thread" or "process". Processes suit CPU-bound
+                decoders and enrichers, their records are saved by this process. They are forked from this
+                process while the consumer's librdkafka threads run, and again when one dies, so keep the pipeline
+                free of libraries with threads or sockets of their own, see `PartitionPool`. Defaults to "thread".
+            include_metadata (bool): Save records as {"data": ..., "topic": ..., "partition": ..., "offset": ...,
+                "timestamp": ..., "headers": {...}} instead of the bare message value. Header values are decoded
+                as UTF-8. Defaults to False.
+            output_topics (Optional[Dict[str, str]]): Send the records of some topics to other topics than the
+                output's, by source topic name or "^regex". Requires a streaming output, and implies
+                include_metadata. Defaults to None.
+            start_from (Optional[Position]): Where to start every partition when it is first assigned: "earliest",
+                "latest", a timestamp in milliseconds since the epoch or as an ISO 8601 string, looked up with
+                `offsets_for_times`, or offsets by partition as a dict or "topic:partition=offset,..." string.
+                Use a dedicated group_id to replay without moving the offsets of the live consumers. Defaults to
+                None, which resumes from the committed offsets, or the earliest ones.
+            stop_at (Optional[Position]): Replay up to this point, excluded, then return once every assigned
+                partition reached it: "latest" for the end of the partitions when they are assigned, a timestamp,
+                or offsets by partition. Partitions also stop at their end. Defaults to None, which never stops.
+            max_in_flight (Optional[int]): Pause the assigned partitions once this many consumed messages are not
+                saved yet, i.e. wait in the receive queue, for a partition worker or in the output batch, so that a
+                slow output does not pile messages up. Keep it below the capacity of the queue and of the
+                partition workers, which block the consumer instead. Defaults to None, never pause.
+            resume_in_flight (Optional[int]): Resume the partitions once this few messages are in flight. Defaults
+                to None, half of max_in_flight.
+            queued_max_kbytes (Optional[int]): Maximum kilobytes of messages prefetched by librdkafka, per
+                partition ("queued.max.messages.kbytes"). Defaults to None, the librdkafka default of 64 MiB.
+            queued_min_messages (Optional[int]): Minimum number of messages librdkafka tries to keep prefetched per
+                partition ("queued.min.messages"). Defaults to None, the librdkafka default of 100000.
+            fetch_max_bytes (Optional[int]): Maximum bytes of a fetch response ("fetch.max.bytes"). Defaults to None.
+            max_partition_fetch_bytes (Optional[int]): Maximum bytes fetched from a partition per request
+                ("max.partition.fetch.bytes"). Defaults to None.
+            schema_registry (Optional[str]): With the confluent codec, the schema registry URL, or a directory of
+                schema files, see `geniusrise_listeners.schemas.LocalSchemaRegistry`. Schemas are looked up and
+                compiled once per schema id. Defaults to None.
+            schema_registry_auth (Optional[str]): Basic authentication credentials for the schema registry, as
+                "username:password". Defaults to None.
+            validate_schemas (bool): With the confluent codec, validate JSON Schema payloads against their schema,
+                failing the messages that do not match. Requires jsonschema. Defaults to False.
+            workers (int): Number of worker processes, each running a consumer of the group, so that the
+                partitions are spread over them. Defaults to 1.
 
         Raises:
             Exception: If unable to connect to the Kafka server.
         """
-        config = {
+        if codec == "confluent":
+            if not schema_registry:
+                raise ValueError("The confluent codec requires a schema_registry")
+            registry = get_schema_registry(schema_registry, schema_registry_auth)
+            self.configure(decoder=ConfluentDecoder(registry, validate=validate_schemas))
+        else:
+            self.use_codec(codec)
+        if num_messages < 1:
+            raise ValueError("num_messages must be at least 1")
+        if num_messages > 1 and batch_size is None and linger_ms is None and batch_bytes is None:
+            batch_size = num_messages
+        if at_least_once and queue_size is not None and queue_policy != "block":
+            raise ValueError("at_least_once requires the block queue policy, dropped messages would never be done")
+        if isinstance(topic, str):
+            topics = [topic] if topic.startswith("^") else [t.strip() for t in topic.split(",") if t.strip()]
+        else:
+            topics = list(topic)
+        include_metadata = include_metadata or bool(output_topics)
+        replay = ReplayWindow(start_from, stop_at) if start_from is not None or stop_at is not None else None
+        if max_in_flight is not None:
+            if max_in_flight < 1:
+                raise ValueError("max_in_flight must be at least 1")
+            resume_in_flight = max_in_flight // 2 if resume_in_flight is None else resume_in_flight
+            if not 0 <= resume_in_flight < max_in_flight:
+                raise ValueError("resume_in_flight must be between 0 and max_in_flight")
+        if partition_workers and queue_size is not None:
+            raise ValueError("partition_workers and queue_size cannot be combined, the queue would reorder partitions")
+
+        config: Dict[str, Any] = {
             "bootstrap.servers": bootstrap_servers,
             "group.id": group_id,
-            "auto.offset.reset": "earliest",
+            "auto.offset.reset": "latest" if start_from == "latest" else "earliest",
         }
         if username and password:
             config.update(
@@ -96,41 +407,127 @@ class Kafka(Spout):
                     "sasl.password": password,
                 }
             )
+        fetch = {
+            "queued.max.messages.kbytes": queued_max_kbytes,
+            "queued.min.messages": queued_min_messages,
+            "fetch.max.bytes": fetch_max_bytes,
+            "max.partition.fetch.bytes": max_partition_fetch_bytes,
+        }
+        config.update({name: value for name, value in fetch.items() if value is not None})
+        if replay is not None and replay.bounded:
+            # Partition ends finish the replay too
+            config["enable.partition.eof"] = True
+        if stats_interval_ms:
+            config.update({"statistics.interval.ms": stats_interval_ms, "stats_cb": self._on_stats})
+        if at_least_once:
+            config.update({"enable.auto.commit": False, "on_commit": self._on_commit})
         consumer = Consumer(config)
+        self.consumer = consumer
 
-        consumer.subscribe([topic])
+        process = self.process
+        offsets = self.offsets = OffsetTracker() if at_least_once else None
+        if offsets is not None and not partition_workers:
+            # Mark messages done once they are saved or rejected by the pipeline, wherever it runs
+            def tracked(
+                payload: Any, metadata: Optional[Dict[str, Any]] = None, key: Hashable = None
+            ) -> Optional[bool]:
+                saved = process(payload, metadata, key)
+                if saved is not False:
+                    offsets.done(*key)  # type: ignore
+                return saved
 
-        while True:
-            try:
-                message = consumer.poll(1.0)
-
-                if message is None:
-                    continue
-                if message.error():
-                    if message.error().code() == KafkaError._PARTITION_EOF:
-                        self.log.info(f"Reached end of topic {topic}, partition {message.partition()}")
-                    else:
-                        self.log.error(f"Error while consuming message: {message.error()}")
-                else:
-                    # Use the output's save method
-                    self.output.save(json.loads(message.value()))
-
-                    # Update the state using the state
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["success_count"] += 1
-                    self.state.set_state(self.id, current_state)
-            except Exception as e:
-                self.log.error(f"Error processing Kafka message: {e}")
+            self.process = tracked  # type: ignore
+        self.replay = replay
+        if at_least_once or partition_workers or replay is not None:
+            consumer.subscribe(topics, on_assign=self._on_assign, on_revoke=self._on_revoke)
+        else:
+            consumer.subscribe(topics)
+        last_commit = time.monotonic()
 
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["failure_count"] += 1
-                self.state.set_state(self.id, current_state)
+        try:
+            with routing(self, output_topics), self.listening(
+                batch_size=batch_size,
+                linger_ms=linger_ms,
+                batch_bytes=batch_bytes,
+                queue_size=queue_size,
+                queue_policy=queue_policy,
+                sink_workers=sink_workers,
+            ):
+                # Kept for the last commit, which happens after the batching output is flushed and removed
+                self.batching = self.output if isinstance(self.output, BatchingOutput) else None
+                if partition_workers:
+                    self.pool = PartitionPool(
+                        self,
+                        workers=partition_workers,
+                        mode=partition_pool,
+                        on_done=None if offsets is None else lambda key: offsets.done(*key),  # type: ignore
+                    )
+                try:
+                    while True:
+                        try:
+                            if max_in_flight is not None:
+                                self._throttle(max_in_flight, resume_in_flight)  # type: ignore
+                            if num_messages > 1:
+                                messages = consumer.consume(num_messages=num_messages, timeout=timeout)
+                            else:
+                                message = consumer.poll(timeout)
+                                messages = [] if message is None else [message]
+
+                            for message in messages:
+                                if message.error():
+                                    if message.error().code() == KafkaError._PARTITION_EOF:
+                                        if replay is not None:
+                                            replay.eof(message.topic(), message.partition())
+                                        self.log.info(
+                                            f"Reached end of topic {message.topic()}, partition {message.partition()}"
+                                        )
+                                    else:
+                                        self.log.error(f"Error while consuming message: {message.error()}")
+                                elif replay is not None and replay.reached(
+                                    message.topic(), message.partition(), message.offset()
+                                ):
+                                    continue
+                                else:
+                                    key = (message.topic(), message.partition(), message.offset())
+                                    metadata = self._metadata(message) if include_metadata else None
+                                    if self.offsets is not None:
+                                        self.offsets.track(*key)
+                                    if self.pool is not None:
+                                        self.pool.submit(key[:2], message.value(), metadata, key)
+                                    else:
+                                        self.process(message.value(), metadata, key)
+
+                            if self.offsets is not None and (
+                                self.offsets.pending >= commit_every
+                                or time.monotonic() - last_commit >= commit_interval
+                            ):
+                                self._commit()
+                                last_commit = time.monotonic()
+                            if replay is not None and replay.finished:
+                                self.log.info("Replay finished")
+                                break
+                        except Exception as e:
+                            self.log.error(f"Error processing Kafka message: {e}")
 
-        consumer.close()
+                            self.counters.incr("failure_count")
+                finally:
+                    if self.pool is not None:
+                        # Process the submitted messages before the output is flushed
+                        self.pool.close()
+        finally:
+            try:
+                # The workers and the queue are drained and the output flushed by now
+                self._commit(asynchronous=False)
+            except Exception as e:
+                self.log.error(f"Error committing offsets: {e}")
+            finally:
+                self.process = process  # type: ignore
+                self.pool = None
+                self.replay = None
+                self.paused = False
+                self.offsets = None
+                self.batching = None
+                if self.metrics:
+                    self.metrics.partitions = {}
+                self.consumer = None
+                consumer.close()
@@ -13,13 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 import boto3
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 from typing import Optional
 
+from geniusrise_listeners.base import Listener
 
-class Kinesis(Spout):
+
+class Kinesis(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Kinesis class.
@@ -57,8 +58,8 @@ class Kinesis(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
         self.kinesis = boto3.client("kinesis")
 
     def listen(
@@ -68,6 +69,7 @@ class Kinesis(Spout):
         region_name: Optional[str] = None,
         aws_access_key_id: Optional[str] = None,
         aws_secret_access_key: Optional[str] = None,
+        codec: str = "json",
     ):
         """
         📖 Start listening for data from the Kinesis stream.
@@ -78,10 +80,14 @@ class Kinesis(Spout):
             region_name (str, optional): The AWS region name.
             aws_access_key_id (str, optional): AWS access key ID for authentication.
             aws_secret_access_key (str, optional): AWS secret access key for authentication.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto". Defaults to "json".
 
         Raises:
             Exception: If there is an error while processing Kinesis records.
         """
+        self.use_codec(codec)
+
         if region_name:
             self.kinesis = boto3.client("kinesis", region_name=region_name)
         if aws_access_key_id and aws_secret_access_key:
@@ -96,39 +102,20 @@ class Kinesis(Spout):
             StreamName=stream_name, ShardId=shard_id, ShardIteratorType="LATEST"
         )["ShardIterator"]
 
-        while True:
-            try:
-                response = self.kinesis.get_records(ShardIterator=shard_iterator, Limit=100)
-
-                for record in response["Records"]:
-                    data = json.loads(record["Data"])
-
-                    # Enrich the data with metadata about the sequence number
-                    enriched_data = {
-                        "data": data,
-                        "sequence_number": record["SequenceNumber"],
-                    }
-
-                    # Use the output's save method
-                    self.output.save(enriched_data)
-
-                    # Update the state using the state
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["success_count"] += 1
-                    self.state.set_state(self.id, current_state)
-
-                shard_iterator = response["NextShardIterator"]
-
-            except Exception as e:
-                self.log.error(f"Error processing Kinesis record: {e}")
-
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["failure_count"] += 1
-                self.state.set_state(self.id, current_state)
+        with self.listening():
+            while True:
+                try:
+                    response = self.kinesis.get_records(ShardIterator=shard_iterator, Limit=100)
+
+                    for record in response["Records"]:
+                        # Enrich the data with metadata about the sequence number
+                        self.process(
+                            record["Data"], {"sequence_number": record["SequenceNumber"]}, record["SequenceNumber"]
+                        )
+
+                    shard_iterator = response["NextShardIterator"]
+
+                except Exception as e:
+                    self.log.error(f"Error processing Kinesis record: {e}")
+
+                    self.counters.incr("failure_count")
@@ -0,0 +1,92 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, Optional, Tuple
+
+Partition = Tuple[str, int]
+
+# Fetch states of partitions that are assigned to the consumer
+FETCHING = {"offset-query", "offset-wait", "active"}
+
+
+class ConsumerStats:
+    def __init__(self):
+        r"""
+        Turn the statistics librdkafka emits every `statistics.interval.ms` into per partition gauges.
+
+        For every partition the consumer fetches from:
+
+        - **lag**: the consumer lag as computed by librdkafka, from the high watermark and the committed offset.
+        - **messages_per_second** and **bytes_per_second**: fetched since the previous statistics.
+        - **fetch_latency_seconds**: the average round trip time of requests to the partition's leader broker,
+          which for a consumer are mostly fetch requests.
+
+        ## Usage
+        ```python
+        stats = ConsumerStats()
+        consumer = Consumer({..., "statistics.interval.ms": 5000, "stats_cb": lambda s: stats.update(json.loads(s))})
+        stats.partitions  # {("topic", 0): {"lag": 12, "messages_per_second": 830.5, ...}}
+        ```
+        """
+        self.partitions: Dict[Partition, Dict[str, Optional[float]]] = {}
+        self._previous: Dict[Partition, Tuple[int, int, int]] = {}
+
+    def update(self, stats: Dict[str, Any]) -> Dict[Partition, Dict[str, Optional[float]]]:
+        """
+        Update the gauges from a statistics object.
+
+        Args:
+            stats (Dict[str, Any]): The decoded JSON statistics.
+
+        Returns:
+            Dict[Tuple[str, int], Dict[str, Optional[float]]]: The gauges by (topic, partition). Partitions that are
+                no longer fetched are left out.
+        """
+        ts = stats.get("ts", 0)
+        rtt = {
+            broker["nodeid"]: broker["rtt"]["avg"] / 1e6
+            for broker in stats.get("brokers", {}).values()
+            if broker.get("rtt", {}).get("cnt")
+        }
+
+        partitions: Dict[Partition, Dict[str, Optional[float]]] = {}
+        previous: Dict[Partition, Tuple[int, int, int]] = {}
+        for topic, topic_stats in stats.get("topics", {}).items():
+            for number, partition_stats in topic_stats.get("partitions", {}).items():
+                # -1 is the internal unassigned partition
+                if int(number) < 0 or partition_stats.get("fetch_state") not in FETCHING:
+                    continue
+                key = (topic, int(number))
+                lag = partition_stats.get("consumer_lag", -1)
+                gauges: Dict[str, Optional[float]] = {
+                    "lag": lag if lag >= 0 else None,
+                    "messages_per_second": None,
+                    "bytes_per_second": None,
+                    "fetch_latency_seconds": rtt.get(partition_stats.get("leader")),
+                }
+
+                received = (ts, partition_stats.get("rxmsgs", 0), partition_stats.get("rxbytes", 0))
+                last = self._previous.get(key)
+                # Statistics timestamps are in microseconds
+                if last is not None and received[0] > last[0]:
+                    elapsed = (received[0] - last[0]) / 1e6
+                    gauges["messages_per_second"] = (received[1] - last[1]) / elapsed
+                    gauges["bytes_per_second"] = (received[2] - last[2]) / elapsed
+                previous[key] = received
+                partitions[key] = gauges
+
+        self._previous = previous
+        self.partitions = partitions
+        return partitions
@@ -0,0 +1,410 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import socket
+import threading
+import weakref
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from prometheus_client import REGISTRY, Counter, Histogram, start_http_server, write_to_textfile
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+from geniusrise_listeners.counters import StateCounter
+
+# Stage latencies are mostly in the microseconds
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+# StateCounter counters exported as messages by outcome, and as drops by reason
+OUTCOMES = {"success_count": "success", "failure_count": "failure", "filtered_count": "filtered"}
+DROPS = {"queue_dropped_count": "queue", "dropped_count": "output"}
+DEDUP = {"dedup_hit_count": "hit", "dedup_miss_count": "miss"}
+
+# Registered through WORKERS below, which adds in the samples of worker processes
+BYTES = Counter(
+    "geniusrise_listener_received_bytes",
+    "Payload bytes received by the listener.",
+    ["listener", "id"],
+    registry=None,
+)
+STAGE_SECONDS = Histogram(
+    "geniusrise_listener_stage_seconds",
+    "Time spent in each stage of the message pipeline.",
+    ["listener", "id", "stage"],
+    buckets=LATENCY_BUCKETS,
+    registry=None,
+)
+RECONNECTS = Counter(
+    "geniusrise_listener_reconnects",
+    "Reconnections to the listener's source.",
+    ["listener", "id"],
+    registry=None,
+)
+
+# Per partition gauges of partitioned sources, as set in ListenerMetrics.partitions
+PARTITION_GAUGES = {
+    "lag": "Messages between the partition's committed position and its high watermark.",
+    "messages_per_second": "Messages fetched from the partition per second.",
+    "bytes_per_second": "Bytes fetched from the partition per second.",
+    "fetch_latency_seconds": "Average round trip time of requests to the partition's leader broker.",
+}
+
+# A forwarded sample: the metric family name, the sample name, its labels and its value
+ForwardedSample = Tuple[str, str, Tuple[Tuple[str, str], ...], float]
+
+
+class CountersCollector:
+    def __init__(self):
+        r"""
+        Export the listeners' StateCounter counters and queue depths when scraped.
+
+        The counters are already kept per thread for the state, so reading them at scrape time costs nothing
+        on the hot path.
+        """
+        self.listeners: "weakref.WeakSet[ListenerMetrics]" = weakref.WeakSet()
+
+    def collect(self) -> Iterator[Metric]:
+        messages = CounterMetricFamily(
+            "geniusrise_listener_messages",
+            "Messages processed by the listener, by outcome.",
+            labels=["listener", "id", "outcome"],
+        )
+        dropped = CounterMetricFamily(
+            "geniusrise_listener_dropped",
+            "Messages dropped by the full receive queue or by a failed output batch.",
+            labels=["listener", "id", "reason"],
+        )
+        dedup = CounterMetricFamily(
+            "geniusrise_listener_dedup_lookups",
+            "Lookups of message identities in the dedup cache, hits are skipped duplicates.",
+            labels=["listener", "id", "result"],
+        )
+        queue_depth = GaugeMetricFamily(
+            "geniusrise_listener_queue_depth",
+            "Messages waiting in the receive queue.",
+            labels=["listener", "id"],
+        )
+        for metrics in list(self.listeners):
+            totals = metrics.counters.totals()
+            for key, outcome in OUTCOMES.items():
+                messages.add_metric([metrics.listener, metrics.id, outcome], totals.get(key, 0))
+            for key, reason in DROPS.items():
+                dropped.add_metric([metrics.listener, metrics.id, reason], totals.get(key, 0))
+            for key, result in DEDUP.items():
+                dedup.add_metric([metrics.listener, metrics.id, result], totals.get(key, 0))
+            if metrics.queue is not None:
+                queue_depth.add_metric([metrics.listener, metrics.id], metrics.queue.depth)
+        yield messages
+        yield dropped
+        yield dedup
+        yield queue_depth
+
+
+class WorkersCollector:
+    def __init__(self, families: List[Any]):
+        r"""
+        Collect metric families, adding in the samples forwarded by the listeners' worker processes.
+
+        A listener supervising worker processes records nothing itself: its workers send it snapshots of their
+        own samples, see `ListenerMetrics.forward`, and the snapshots of all workers are summed into the samples
+        of the same name and labels. Counters and histogram buckets, sums and counts add up across processes, and per
+        partition gauges are only ever set by the worker consuming the partition.
+
+        Args:
+            families (List[Any]): The metric families to collect.
+        """
+        self.families = families
+
+    def collect(self) -> Iterator[Metric]:
+        forwarded: Dict[str, Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]] = {}
+        for metrics in list(COUNTERS.listeners):
+            for samples in list(metrics.forwarded.values()):
+                for family_name, name, labels, value in samples:
+                    totals = forwarded.setdefault(family_name, {})
+                    totals[(name, labels)] = totals.get((name, labels), 0.0) + value
+
+        for family in self.families:
+            for metric in family.collect():
+                metric_totals = forwarded.get(metric.name)
+                if metric_totals:
+                    samples = []
+                    for sample in metric.samples:
+                        key = (sample.name, tuple(sorted(sample.labels.items())))
+                        if key in metric_totals:
+                            sample = sample._replace(value=sample.value + metric_totals.pop(key))
+                        samples.append(sample)
+                    metric.samples = samples
+                    for (name, labels), value in metric_totals.items():
+                        metric.add_sample(name, dict(labels), value)
+                yield metric
+
+
+class PartitionsCollector:
+    def __init__(self):
+        r"""
+        Export the per partition gauges of the listeners that consume partitioned sources, e.g. the consumer lag
+        of Kafka partitions, when scraped.
+        """
+
+    def collect(self) -> Iterator[Metric]:
+        families = {
+            name: GaugeMetricFamily(
+                f"geniusrise_listener_partition_{name}", description, labels=["listener", "id", "topic", "partition"]
+            )
+            for name, description in PARTITION_GAUGES.items()
+        }
+        for metrics in list(COUNTERS.listeners):
+            for (topic, partition), values in list(metrics.partitions.items()):
+                for name, value in values.items():
+                    if name in families and value is not None:
+                        families[name].add_metric([metrics.listener, metrics.id, topic, str(partition)], value)
+        yield from families.values()
+
+
+class SocketsCollector:
+    def __init__(self):
+        r"""
+        Export the receive queue and kernel drops of the listeners' sockets, as set in `ListenerMetrics.sockets`,
+        when scraped.
+        """
+
+    def collect(self) -> Iterator[Metric]:
+        queue_bytes = GaugeMetricFamily(
+            "geniusrise_listener_socket_queue_bytes",
+            "Bytes waiting in the receive queues of the listener's sockets.",
+            labels=["listener", "id"],
+        )
+        drops = CounterMetricFamily(
+            "geniusrise_listener_socket_drops",
+            "Datagrams dropped by the kernel because the receive queues of the listener's sockets were full.",
+            labels=["listener", "id"],
+        )
+        for metrics in list(COUNTERS.listeners):
+            stats = metrics.sockets
+            if stats:
+                queue_bytes.add_metric([metrics.listener, metrics.id], stats["receive_queue_bytes"])
+                drops.add_metric([metrics.listener, metrics.id], stats["drops"])
+        yield queue_bytes
+        yield drops
+
+
+COUNTERS = CountersCollector()
+REGISTRY.register(COUNTERS)  # type: ignore
+PARTITIONS = PartitionsCollector()
+SOCKETS = SocketsCollector()
+WORKERS = WorkersCollector([BYTES, STAGE_SECONDS, RECONNECTS, PARTITIONS, SOCKETS])
+REGISTRY.register(WORKERS)  # type: ignore
+
+FAMILIES: List[Any] = [COUNTERS, WORKERS]
+
+_servers: Set[int] = set()
+_servers_lock = threading.Lock()
+
+
+class ListenerMetrics:
+    def __init__(self, listener: str, id: str, counters: StateCounter):
+        r"""
+        Prometheus metrics of one listener, labelled by the listener class and id.
+
+        Message counts come from the listener's counters, the queue depth from its receive queue and the per
+        partition gauges from `partitions` and the socket stats from `sockets`, all read when the metrics are
+        collected. The label children of the other metrics are bound once here, so that the hot path only
+        increments and observes. All listeners of a process share the default prometheus_client registry.
+
+        Args:
+            listener (str): The listener class name.
+            id (str): The listener id.
+            counters (StateCounter): The listener's counters.
+
+        ## Usage
+        ```python
+        metrics = ListenerMetrics("Udp", spout.id, spout.counters)
+        metrics.serve(9100)
+        metrics.save_seconds.observe(0.0001)
+        ```
+        """
+        self.listener = listener
+        self.id = id
+        self.counters = counters
+        self.queue: Optional[Any] = None
+        self.partitions: Dict[Tuple[str, int], Dict[str, Optional[float]]] = {}
+        self.sockets: Dict[str, int] = {}
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.received_bytes = BYTES.labels(listener, id)
+        self.decode_seconds = STAGE_SECONDS.labels(listener, id, "decode")
+        self.filter_seconds = STAGE_SECONDS.labels(listener, id, "filter")
+        self.enrich_seconds = STAGE_SECONDS.labels(listener, id, "enrich")
+        self.save_seconds = STAGE_SECONDS.labels(listener, id, "save")
+        self.reconnects = RECONNECTS.labels(listener, id)
+
+        self._pushers: List[Tuple[str, float]] = []
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._statsd: Optional[Tuple[socket.socket, Tuple[str, int]]] = None
+        self._pushed: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._forward: Optional[Any] = None
+        self.forwarded: Dict[int, List[ForwardedSample]] = {}
+        COUNTERS.listeners.add(self)
+
+    def serve(self, port: int, addr: str = "0.0.0.0") -> None:
+        """
+        Expose the metrics of all listeners of this process at http://addr:port/metrics.
+
+        Args:
+            port (int): The port to listen on. A port that is already served by this process is left as it is.
+            addr (str): The address to listen on. Defaults to "0.0.0.0".
+        """
+        with _servers_lock:
+            if port in _servers:
+                return
+            start_http_server(port, addr)
+            _servers.add(port)
+        self.log.info(f"Serving metrics at http://{addr}:{port}/metrics")
+
+    def push_to_textfile(self, path: str, interval: float = 10.0) -> None:
+        """
+        Write the metrics to a file every `interval` seconds, e.g. for the node exporter's textfile collector.
+
+        Args:
+            path (str): The file to write.
+            interval (float): Number of seconds between writes. Defaults to 10.
+        """
+        self._pushers.append((path, interval))
+        self._start()
+
+    def push_to_statsd(self, address: str, interval: float = 10.0) -> None:
+        """
+        Send this listener's metrics to a statsd server over UDP every `interval` seconds.
+
+        Counters and histogram sums and counts are sent as `c` deltas, gauges as `g`. Label values are appended
+        to the metric name, e.g. `geniusrise_listener_messages_total.Udp.my_spout.success`.
+
+        Args:
+            address (str): The statsd server as "host:port".
+            interval (float): Number of seconds between pushes. Defaults to 10.
+        """
+        host, _, port = address.rpartition(":")
+        self._statsd = (socket.socket(socket.AF_INET, socket.SOCK_DGRAM), (host or "localhost", int(port)))
+        self._pushers.append(("statsd", interval))
+        self._start()
+
+    def forward(self, queue: Any, interval: float = 10.0) -> None:
+        """
+        Send snapshots of this listener's samples to the supervising process every `interval` seconds, instead of
+        pushing them anywhere. Used by worker processes, see `geniusrise_listeners.supervisor.Supervisor`.
+
+        Args:
+            queue (multiprocessing.Queue): The queue the supervisor reads from.
+            interval (float): Number of seconds between snapshots. Defaults to 10.
+        """
+        # Everything else is pushed by the supervisor, the threads did not survive the fork anyway
+        self._forward = queue
+        self._pushers = [("forward", interval)]
+        self._stopped = threading.Event()
+        self._thread = None
+        self._start()
+
+    def merge(self, pid: int, samples: List[ForwardedSample]) -> None:
+        """
+        Take a snapshot of the samples of a worker process, replacing its previous snapshot.
+
+        Args:
+            pid (int): The worker's process id. A restarted worker starts from zero under a new pid.
+            samples (List[ForwardedSample]): The worker's samples.
+        """
+        self.forwarded[pid] = samples
+
+    def samples(self) -> List[ForwardedSample]:
+        """
+        Take a snapshot of this listener's samples, except the message counts which are kept by the counters.
+
+        Returns:
+            List[ForwardedSample]: The samples, as (family, name, labels, value) tuples.
+        """
+        samples = []
+        for family in (BYTES, STAGE_SECONDS, RECONNECTS, PARTITIONS, SOCKETS):
+            for metric in family.collect():
+                for sample in metric.samples:
+                    if sample.labels.get("id") == self.id and not sample.name.endswith("_created"):
+                        samples.append((metric.name, sample.name, tuple(sorted(sample.labels.items())), sample.value))
+        return samples
+
+    def push(self) -> None:
+        """
+        Push the metrics to every configured file and statsd server now.
+        """
+        for target, _ in self._pushers:
+            try:
+                if target == "forward":
+                    self._forward.put(("metrics", os.getpid(), self.samples()))  # type: ignore
+                elif target == "statsd":
+                    self._push_statsd()
+                else:
+                    write_to_textfile(target, REGISTRY)
+            except Exception as e:
+                self.log.error(f"Error pushing metrics to {target}: {e}")
+
+    def close(self) -> None:
+        """
+        Stop pushing, after a last push.
+        """
+        self._stopped.set()
+        self.push()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.id}-metrics", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(min(interval for _, interval in self._pushers)):
+            self.push()
+
+    def _push_statsd(self) -> None:
+        if self._statsd is None:
+            return
+        sock, address = self._statsd
+
+        lines = []
+        for family in FAMILIES:
+            for metric in family.collect():
+                for sample in metric.samples:
+                    # Buckets do not map onto statsd, sums and counts do
+                    if sample.labels.get("id") != self.id or "le" in sample.labels or sample.name.endswith("_created"):
+                        continue
+                    labels = tuple(sample.labels.values())
+                    name = ".".join([sample.name, *labels])
+                    if metric.type == "gauge":
+                        lines.append(f"{name}:{sample.value:g}|g")
+                    else:
+                        key = (sample.name, labels)
+                        delta = sample.value - self._pushed.get(key, 0.0)
+                        self._pushed[key] = sample.value
+                        if delta:
+                            lines.append(f"{name}:{delta:g}|c")
+
+        # Keep datagrams under a typical MTU
+        datagram: List[str] = []
+        size = 0
+        for line in lines:
+            if datagram and size + len(line) + 1 > 1400:
+                sock.sendto("\n".join(datagram).encode(), address)
+                datagram, size = [], 0
+            datagram.append(line)
+            size += len(line) + 1
+        if datagram:
+            sock.sendto("\n".join(datagram).encode(), address)
@@ -13,14 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 from typing import Optional
 
 import paho.mqtt.client as mqtt
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.supervisor import supervised
 
-class MQTT(Spout):
+
+class MQTT(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the MQTT class.
@@ -59,8 +61,9 @@ class MQTT(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
+        self.connections = 0
 
     def _on_connect(self, client, userdata, flags, rc):
         """
@@ -73,6 +76,9 @@ class MQTT(Spout):
             rc: Connection result.
         """
         self.log.debug(f"Connected with result code {rc}")
+        self.connections += 1
+        if self.connections > 1 and self.metrics:
+            self.metrics.reconnects.inc()
         client.subscribe(self.topic)
 
     def _on_message(self, client, userdata, msg):
@@ -84,36 +90,10 @@ class MQTT(Spout):
             userdata: Private user data as set in Client() or userdata_set().
             msg: An instance of MQTTMessage.
         """
-        try:
-            data = json.loads(msg.payload)
-
-            # Enrich the data with metadata about the topic
-            enriched_data = {
-                "data": data,
-                "topic": msg.topic,
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
-        except Exception as e:
-            self.log.error(f"Error processing MQTT message: {e}")
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+        # Enrich the data with metadata about the topic
+        self.process(msg.payload, {"topic": msg.topic})
 
+    @supervised
     def listen(
         self,
         host: str = "localhost",
@@ -121,6 +101,8 @@ class MQTT(Spout):
         topic: str = "#",
         username: Optional[str] = None,
         password: Optional[str] = None,
+        codec: str = "json",
+        workers: int = 1,
     ):
         """
         Start listening for data from the MQTT broker.
@@ -131,7 +113,16 @@ class MQTT(Spout):
             topic (str): The MQTT topic to subscribe to. Defaults to "#".
             username (Optional[str]): The username for authentication. Defaults to None.
             password (Optional[str]): The password for authentication. Defaults to None.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto". Defaults to "json".
+            workers (int): Number of worker processes. With more than one, the workers share the topic through
+                an MQTT 5 shared subscription named after the spout's id, so that each message goes to one of
+                them. Defaults to 1.
         """
+        self.use_codec(codec)
+
+        if workers > 1 and not topic.startswith("$share/"):
+            topic = f"$share/{self.id}/{topic}"
         self.topic = topic
         try:
             self.log.info("Starting MQTT listener...")
@@ -145,11 +136,7 @@ class MQTT(Spout):
             client.loop_forever()
         except Exception as e:
             self.log.error(f"Error listening to MQTT: {e}")
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
             raise
+        finally:
+            self.counters.flush()
@@ -0,0 +1,161 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+
+Partition = Tuple[str, int]
+
+
+class _PartitionOffsets:
+    def __init__(self):
+        self.in_flight: Deque[int] = deque()
+        self.done: Set[int] = set()
+        self.next: Optional[int] = None
+        self.committed: Optional[int] = None
+
+
+class OffsetTracker:
+    def __init__(self):
+        r"""
+        Track which offsets of each partition have been handled, to commit only offsets below which everything
+        was handled.
+
+        Messages are tracked in the order they are consumed, which is the offset order within a partition, and
+        marked done in any order, e.g. by several sink workers. The offset to commit for a partition is the one
+        after the highest offset below which every tracked offset is done. All methods are thread safe.
+
+        ## Usage
+        ```python
+        offsets = OffsetTracker()
+        offsets.track("topic", 0, 41)
+        offsets.track("topic", 0, 42)
+        offsets.done("topic", 0, 42)
+        offsets.committable()  # {}, 41 is not done yet
+        offsets.done("topic", 0, 41)
+        offsets.committable()  # {("topic", 0): 43}
+        ```
+        """
+        self.pending = 0
+        self.held = False
+        self._partitions: Dict[Partition, _PartitionOffsets] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of tracked offsets that are not done yet.
+        """
+        return sum(len(p.in_flight) - len(p.done) for p in list(self._partitions.values()))
+
+    def track(self, topic: str, partition: int, offset: int) -> None:
+        """
+        Start tracking a consumed message.
+
+        Args:
+            topic (str): The message's topic.
+            partition (int): The message's partition.
+            offset (int): The message's offset.
+        """
+        with self._lock:
+            offsets = self._partitions.get((topic, partition))
+            if offsets is None:
+                offsets = self._partitions[(topic, partition)] = _PartitionOffsets()
+            offsets.in_flight.append(offset)
+
+    def done(self, topic: str, partition: int, offset: int) -> None:
+        """
+        Mark a tracked message as handled. Messages of partitions that are no longer tracked are ignored.
+
+        Args:
+            topic (str): The message's topic.
+            partition (int): The message's partition.
+            offset (int): The message's offset.
+        """
+        with self._lock:
+            offsets = self._partitions.get((topic, partition))
+            if offsets is None:
+                return
+            offsets.done.add(offset)
+            while offsets.in_flight and offsets.in_flight[0] in offsets.done:
+                first = offsets.in_flight.popleft()
+                offsets.done.discard(first)
+                offsets.next = first + 1
+            self.pending += 1
+
+    def committable(self, partitions: Optional[Iterable[Partition]] = None) -> Dict[Partition, int]:
+        """
+        Get the offsets to commit, for the partitions that moved since their last commit. Nothing once `hold` was
+        called.
+
+        Args:
+            partitions (Optional[Iterable[Tuple[str, int]]]): Only these partitions. Defaults to None, all of them.
+
+        Returns:
+            Dict[Tuple[str, int], int]: The offset to commit by (topic, partition).
+        """
+        with self._lock:
+            if self.held:
+                return {}
+            keys = list(self._partitions) if partitions is None else [p for p in partitions if p in self._partitions]
+            return {
+                key: self._partitions[key].next  # type: ignore
+                for key in keys
+                if self._partitions[key].next is not None
+                and self._partitions[key].next != self._partitions[key].committed
+            }
+
+    def committed(self, offsets: Dict[Partition, int]) -> None:
+        """
+        Record that offsets were committed.
+
+        Args:
+            offsets (Dict[Tuple[str, int], int]): The committed offset by (topic, partition).
+        """
+        with self._lock:
+            for key, offset in offsets.items():
+                if key in self._partitions:
+                    self._partitions[key].committed = offset
+            self.pending = 0
+
+    def committed_offsets(self) -> Dict[Partition, int]:
+        """
+        Get the last committed offset of every partition that was committed since it was tracked.
+
+        Returns:
+            Dict[Tuple[str, int], int]: The committed offset by (topic, partition).
+        """
+        with self._lock:
+            return {key: p.committed for key, p in self._partitions.items() if p.committed is not None}
+
+    def hold(self) -> None:
+        """
+        Stop committing for good, e.g. once records of done messages were lost after all. The next consumer of
+        the partitions then starts over from their last commit, and consumes the lost messages again.
+        """
+        with self._lock:
+            self.held = True
+
+    def revoke(self, partitions: Iterable[Partition]) -> None:
+        """
+        Stop tracking partitions, e.g. when they are assigned to another consumer.
+
+        Args:
+            partitions (Iterable[Tuple[str, int]]): The (topic, partition) pairs.
+        """
+        with self._lock:
+            for key in partitions:
+                self._partitions.pop(key, None)
@@ -0,0 +1,346 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from geniusrise_listeners.supervisor import apply_worker_message, forward_to_parent
+
+MODES = ("thread", "process")
+
+
+class ForwardingOutput:
+    def __init__(self):
+        r"""
+        The output of a worker process: the records of a message are collected, and sent to the parent process
+        along with the message's outcome, see `take`. The parent saves them.
+        """
+        self.records: List[Any] = []
+
+    def take(self) -> List[Any]:
+        """
+        Take the records saved since the last call.
+
+        Returns:
+            List[Any]: The records.
+        """
+        records, self.records = self.records, []
+        return records
+
+    def save(self, data: Any, filename: Optional[str] = None) -> None:
+        self.records.append(data)
+
+    def save_bulk(self, messages: List[Any]) -> None:
+        self.records.extend(messages)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class PartitionPool:
+    def __init__(
+        self,
+        spout: Any,
+        workers: int = 4,
+        mode: str = "thread",
+        maxsize: int = 1000,
+        on_done: Optional[Callable[[Any], None]] = None,
+    ):
+        r"""
+        Run a listener's pipeline on a pool of workers, with all messages of a partition on the same worker.
+
+        Messages of a partition are processed one after the other, in the order they were submitted, while
+        messages of different partitions are processed in parallel. Every worker has a queue of at most `maxsize`
+        messages, and `submit` blocks while the worker of the partition is busy.
+
+        - **thread**: the workers are threads calling the listener's `process`.
+        - **process**: the workers are forked processes running the listener's pipeline, for CPU-bound decoders
+          and enrichers. The records are sent back and saved by this process, in order, so the output is never
+          used from two processes. Counters and metrics are sent back too. A record that cannot be saved is
+          counted as `dropped_count`. A worker process that dies is restarted with an empty queue, and the
+          messages it held, queued or not, are lost: they are counted as `failure_count` and are not done.
+
+          The workers are forked from this process, along with whatever it holds at the time, and restarted
+          workers are forked later on. Only the listener's pipeline runs in them, but a library that keeps
+          threads or sockets, e.g. the Kafka consumer's librdkafka, can leave locks held or state inconsistent
+          in the fork. Keep the pipeline to plain Python code, and create the pool before the process starts
+          other threads where possible.
+
+        `on_done` is called with the key of every message that is saved, in process mode once its records are
+        saved by this process, or rejected by the pipeline, see `Listener.process`. Messages that could not be
+        saved are only counted out of `in_flight`.
+
+        Args:
+            spout (Listener): The listener whose pipeline to run.
+            workers (int): Number of workers. Defaults to 4.
+            mode (str): "thread" or "process". Defaults to "thread".
+            maxsize (int): Maximum number of messages waiting for each worker. Defaults to 1000.
+            on_done (Optional[Callable[[Any], None]]): Called with the key of every saved or rejected message.
+                Defaults to None.
+
+        ## Usage
+        ```python
+        pool = PartitionPool(spout, workers=8, on_done=lambda key: offsets.done(*key))
+        pool.submit(("topic", 0), payload, metadata, ("topic", 0, 42))
+        pool.drain([("topic", 0)])
+        pool.close()
+        ```
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown pool mode: {mode}, expected one of {', '.join(MODES)}")
+        if workers < 1 or maxsize < 1:
+            raise ValueError("workers and maxsize must be at least 1")
+
+        self.spout = spout
+        self.workers = workers
+        self.mode = mode
+        self.maxsize = maxsize
+        self.on_done = on_done
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._in_flight: Dict[Hashable, int] = {}
+        self._idle = threading.Condition()
+        self._closed = False
+        # In process mode, the messages queued on each worker, in order, and the worker's restart count
+        self._outstanding: List[Deque[Tuple[Hashable, Any]]] = [deque() for _ in range(workers)]
+        self._generations = [0] * workers
+
+        if mode == "thread":
+            self._inboxes: List[Any] = [queue.Queue(maxsize) for _ in range(workers)]
+            self._threads = [
+                threading.Thread(target=self._work, args=(inbox,), name=f"partition-worker-{i}", daemon=True)
+                for i, inbox in enumerate(self._inboxes)
+            ]
+        else:
+            self._context = multiprocessing.get_context("fork")
+            self._inboxes = [self._context.Queue(maxsize) for _ in range(workers)]
+            self._results: Any = self._context.Queue()
+            self._processes: List[Any] = [self._start(i) for i in range(workers)]
+            self._threads = [threading.Thread(target=self._collect, name="partition-results", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of submitted messages that are not done yet.
+        """
+        with self._idle:
+            return sum(self._in_flight.values())
+
+    def submit(self, partition: Hashable, payload: Any, metadata: Optional[Dict[str, Any]] = None, key: Any = None):
+        """
+        Queue a message on the worker of its partition.
+
+        Args:
+            partition (Hashable): The partition, e.g. ("topic", 0).
+            payload (Any): The message as received from the transport.
+            metadata (Optional[Dict[str, Any]]): Metadata about the message. Defaults to None.
+            key (Any): The message identity, passed to the pipeline and to `on_done`. Defaults to None.
+        """
+        # A stable hash, so that a partition sticks to a worker whatever the hash seed
+        index = zlib.crc32(repr(partition).encode()) % self.workers
+        item = (partition, payload, metadata, key)
+        with self._idle:
+            self._in_flight[partition] = self._in_flight.get(partition, 0) + 1
+            generation = self._generations[index]
+            if self.mode == "process":
+                self._outstanding[index].append((partition, key))
+        if self.mode == "thread":
+            self._inboxes[index].put(item)
+            return
+
+        # A dead worker's queue is replaced, and the messages on it failed
+        while True:
+            with self._idle:
+                if self._generations[index] != generation:
+                    return
+                inbox = self._inboxes[index]
+            try:
+                inbox.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+
+    def drain(self, partitions: Optional[Iterable[Hashable]] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every submitted message of the partitions is done.
+
+        Args:
+            partitions (Optional[Iterable[Hashable]]): The partitions to wait for. Defaults to None, all of them.
+            timeout (Optional[float]): Maximum number of seconds to wait. Defaults to None, no limit.
+
+        Returns:
+            bool: Whether all messages are done, False if the timeout expired first.
+        """
+        keys = None if partitions is None else list(partitions)
+
+        def idle() -> bool:
+            if keys is None:
+                return not any(self._in_flight.values())
+            return not any(self._in_flight.get(key) for key in keys)
+
+        with self._idle:
+            return self._idle.wait_for(idle, timeout)
+
+    def close(self) -> None:
+        """
+        Wait for the submitted messages, then stop the workers.
+        """
+        self.drain()
+        self._closed = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        if self.mode == "process":
+            for process in self._processes:
+                process.join()
+            # The workers' last counters are queued behind their last records
+            self._results.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _done(self, partition: Hashable, key: Any, handled: bool) -> None:
+        try:
+            if self.on_done and handled:
+                self.on_done(key)
+        except Exception as e:
+            self.log.error(f"Error completing message {key}: {e}")
+        with self._idle:
+            self._in_flight[partition] -= 1
+            if not self._in_flight[partition]:
+                del self._in_flight[partition]
+                self._idle.notify_all()
+
+    def _work(self, inbox: "queue.Queue") -> None:
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            partition, payload, metadata, key = item
+            saved: Optional[bool] = False
+            try:
+                saved = self.spout.process(payload, metadata, key)
+            except Exception as e:
+                self.log.error(f"Error processing message {key}: {e}")
+            finally:
+                self._done(partition, key, saved is not False)
+
+    def _start(self, index: int) -> Any:
+        process = self._context.Process(
+            target=self._child,
+            args=(index, self._generations[index], self._inboxes[index]),
+            name=f"{self.spout.id}-partition-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _child(self, index: int, generation: int, inbox: Any) -> None:
+        spout = self.spout
+        forward_to_parent(spout, self._results)
+        output = spout.output = ForwardingOutput()
+        try:
+            while True:
+                item = inbox.get()
+                if item is None:
+                    return
+                partition, payload, metadata, key = item
+                saved: Optional[bool] = False
+                try:
+                    saved = spout.process(payload, metadata, key)
+                finally:
+                    self._results.put(("done", index, generation, partition, key, saved, output.take()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            spout.counters.close()
+            if spout.metrics:
+                spout.metrics.close()
+
+    def _collect(self) -> None:
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+
+            try:
+                if not message:
+                    pass
+                elif message[0] == "done":
+                    _, index, generation, partition, key, saved, records = message
+                    with self._idle:
+                        # Messages of a worker that died were failed already
+                        stale = generation != self._generations[index]
+                        if not stale:
+                            self._outstanding[index].popleft()
+                    if not stale:
+                        if records and not self._save(records):
+                            saved = False
+                        self._done(partition, key, saved is not False)
+                else:
+                    apply_worker_message(self.spout, message)
+            except Exception as e:
+                self.log.error(f"Error collecting partition worker results: {e}")
+
+            if time.monotonic() - last_check >= 1.0:
+                last_check = time.monotonic()
+                self._restart_dead()
+
+    def _save(self, records: List[Any]) -> bool:
+        try:
+            if len(records) > 1 and hasattr(self.spout.output, "save_bulk"):
+                self.spout.output.save_bulk(records)
+            else:
+                for record in records:
+                    self.spout.output.save(record)
+            return True
+        except Exception as e:
+            self.log.error(f"Error saving {len(records)} records: {e}")
+            self.spout.counters.incr("dropped_count", len(records))
+            return False
+
+    def _restart_dead(self) -> None:
+        if self._closed:
+            return
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                # The dead worker may hold its queue's lock, and whatever it took off the queue is gone
+                with self._idle:
+                    self._generations[index] += 1
+                    self._inboxes[index] = self._context.Queue(self.maxsize)
+                    lost, self._outstanding[index] = list(self._outstanding[index]), deque()
+                self.log.error(
+                    f"Partition worker {index} exited with code {process.exitcode}, restarting it, "
+                    f"{len(lost)} messages are lost"
+                )
+                self.spout.counters.incr("worker_restarts")
+                if lost:
+                    self.spout.counters.incr("failure_count", len(lost))
+                for partition, key in lost:
+                    self._done(partition, key, False)
+                self._processes[index] = self._start(index)
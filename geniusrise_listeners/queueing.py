@@ -0,0 +1,369 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from geniusrise_listeners.counters import StateCounter
+
+POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class ReceiveQueue:
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        maxsize: int = 10000,
+        policy: str = "block",
+        sink_workers: int = 1,
+        counters: Optional[StateCounter] = None,
+    ):
+        r"""
+        A bounded queue between the thread that receives messages and the threads that process them.
+
+        The receiving thread calls `put` with the arguments for `handler`, and `sink_workers` threads take them off
+        the queue and call `handler` with them. This way a slow output does not stall the network reads. When the
+        queue is full, the policy decides what happens:
+
+        - **block**: `put` waits for a free slot, pushing back on the transport.
+        - **drop_oldest**: the oldest queued message is dropped to make room.
+        - **drop_newest**: the new message is dropped.
+
+        Dropped messages are counted as `queue_dropped_count` and the queue depth is kept in `queue_depth`.
+        With more than one sink worker, messages are no longer processed in order.
+
+        Args:
+            handler (Callable[..., Any]): Called by the sink workers with the arguments of every `put`.
+            maxsize (int): Maximum number of queued messages. Defaults to 10000.
+            policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of threads calling the handler. Defaults to 1.
+            counters (Optional[StateCounter]): Counters to record drops and the queue depth in. Defaults to None.
+
+        ## Usage
+        ```python
+        queue = ReceiveQueue(self.process, maxsize=10000, policy="drop_oldest")
+        queue.put(payload, metadata)
+        queue.close()
+        ```
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}, expected one of {', '.join(POLICIES)}")
+        if maxsize < 1 or sink_workers < 1:
+            raise ValueError("maxsize and sink_workers must be at least 1")
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.counters = counters
+        self.dropped = 0
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._items: Deque[Tuple[Any, ...]] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._work, name=f"sink-worker-{i}", daemon=True) for i in range(sink_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of queued messages.
+        """
+        return len(self._items)
+
+    def put(self, *args: Any) -> bool:
+        """
+        Queue the arguments for a handler call.
+
+        Args:
+            *args: The arguments to call the handler with.
+
+        Returns:
+            bool: Whether the message was queued, False if it was dropped.
+        """
+        dropped = accepted = False
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "block":
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._not_full.wait()
+                elif self.policy == "drop_oldest":
+                    self._items.popleft()
+                    dropped = True
+                else:
+                    dropped = True
+            if not self._closed and not (dropped and self.policy == "drop_newest"):
+                self._items.append(args)
+                self._not_empty.notify()
+                accepted = True
+            if dropped:
+                self.dropped += 1
+
+        # Count outside of the lock, counters may write to the state
+        if dropped and self.counters:
+            self.counters.incr("queue_dropped_count")
+        return accepted
+
+    def close(self) -> None:
+        """
+        Stop accepting messages, and wait for the sink workers to process whatever is queued.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                while not self._items and not self._closed:
+                    self._not_empty.wait()
+                if not self._items:
+                    return
+                # Take a few messages at a time to keep the lock out of the way of the receiver
+                items: List[Tuple[Any, ...]] = [self._items.popleft() for _ in range(min(len(self._items), 64))]
+                depth = len(self._items)
+                self._not_full.notify(len(items))
+
+            if self.counters:
+                self.counters.set("queue_depth", depth)
+            for args in items:
+                try:
+                    self.handler(*args)
+                except Exception as e:
+                    self.log.error(f"Error handling queued message: {e}")
+
+
+class AsyncReceiveQueue:
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        maxsize: int = 10000,
+        policy: str = "block",
+        sink_workers: int = 1,
+        counters: Optional[StateCounter] = None,
+        pause: Optional[Callable[[], None]] = None,
+        resume: Optional[Callable[[], None]] = None,
+    ):
+        r"""
+        A bounded queue between an asyncio event loop that receives messages and the threads that process them.
+
+        The event loop calls `put` with the arguments for `handler`, and `sink_workers` threads call `handler` with
+        them, a few messages at a time, so that neither the pipeline nor a slow output holds up the event loop.
+        `put` never waits, the policy decides what happens when the queue is full:
+
+        - **block**: `pause` is called as soon as the queue is full, to stop reading messages until the queue is
+          down to half its size, when `resume` is called. Messages put while the queue is full anyway are dropped,
+          so that it never holds more than `maxsize`.
+        - **drop_oldest**: the oldest queued message is dropped to make room.
+        - **drop_newest**: the new message is dropped.
+
+        Dropped messages are counted as `queue_dropped_count` and the queue depth is kept in `queue_depth`, as with
+        `ReceiveQueue`.
+
+        Args:
+            handler (Callable[..., Any]): Called by the sink workers with the arguments of every `put`.
+            maxsize (int): Maximum number of queued messages. Defaults to 10000.
+            policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of threads calling the handler. Defaults to 1.
+            counters (Optional[StateCounter]): Counters to record drops and the queue depth in. Defaults to None.
+            pause (Optional[Callable[[], None]]): Stops reading messages, with the block policy. Defaults to None.
+            resume (Optional[Callable[[], None]]): Resumes reading messages. Defaults to None.
+
+        ## Usage
+        ```python
+        queue = AsyncReceiveQueue(self.process, maxsize=10000, pause=reader.pause, resume=reader.resume)
+        queue.start()
+        queue.put(payload, metadata)
+        await queue.close()
+        ```
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}, expected one of {', '.join(POLICIES)}")
+        if maxsize < 1 or sink_workers < 1:
+            raise ValueError("maxsize and sink_workers must be at least 1")
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sink_workers = sink_workers
+        self.counters = counters
+        self.pause = pause
+        self.resume = resume
+        self.dropped = 0
+        self.paused = False
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self._items: Deque[Tuple[Any, ...]] = deque()
+        self._closed = False
+        self._ready: Optional[asyncio.Event] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of queued messages.
+        """
+        return len(self._items)
+
+    def start(self) -> None:
+        """
+        Start the sink workers, from the event loop.
+        """
+        self._ready = asyncio.Event()
+        self._executor = ThreadPoolExecutor(self.sink_workers, thread_name_prefix="sink-worker")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.sink_workers)]
+
+    def put(self, *args: Any) -> bool:
+        """
+        Queue the arguments for a handler call, from the event loop.
+
+        Args:
+            *args: The arguments to call the handler with.
+
+        Returns:
+            bool: Whether the message was queued, False if it was dropped.
+        """
+        if self._closed:
+            return False
+        if len(self._items) >= self.maxsize:
+            self.dropped += 1
+            if self.counters:
+                self.counters.incr("queue_dropped_count")
+            if self.policy != "drop_oldest":
+                return False
+            self._items.popleft()
+        self._items.append(args)
+        if self.policy == "block" and not self.paused and len(self._items) >= self.maxsize:
+            # Stop reading as soon as the queue is full, rather than when the next message has to be dropped
+            self.paused = True
+            if self.pause:
+                self.pause()
+        self._ready.set()  # type: ignore
+        return True
+
+    async def close(self) -> None:
+        """
+        Stop accepting messages, and wait for the sink workers to process whatever is queued.
+        """
+        self._closed = True
+        if self._ready is not None:
+            self._ready.set()
+        try:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            # Sink workers cancelled along with the event loop leave their messages behind
+            items, self._items = list(self._items), deque()
+            self._handle(items)
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+
+    def _handle(self, items: List[Tuple[Any, ...]]) -> None:
+        for args in items:
+            try:
+                self.handler(*args)
+            except Exception as e:
+                self.log.error(f"Error handling queued message: {e}")
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._items:
+                if self._closed:
+                    return
+                self._ready.clear()  # type: ignore
+                await self._ready.wait()  # type: ignore
+                continue
+
+            items: List[Tuple[Any, ...]] = [self._items.popleft() for _ in range(min(len(self._items), 64))]
+            if self.counters:
+                self.counters.set("queue_depth", len(self._items))
+            await loop.run_in_executor(self._executor, self._handle, items)
+            if self.paused and len(self._items) <= self.maxsize // 2:
+                self.paused = False
+                if self.resume:
+                    self.resume()
+
+
+@contextmanager
+def queueing(
+    spout: Any,
+    queue_size: Optional[int] = None,
+    queue_policy: str = "block",
+    sink_workers: int = 1,
+) -> Iterator[None]:
+    r"""
+    Put a `ReceiveQueue` in front of a listener's `process` for the duration of the block.
+
+    Nothing is changed unless `queue_size` is given. While the block runs, `process` only queues messages, and the
+    listener's pipeline runs on the sink workers. Whatever is still queued is processed when the block exits.
+    The queue depth is exported by the listener's metrics, if enabled.
+
+    Args:
+        spout (Listener): The listener whose messages to queue.
+        queue_size (Optional[int]): Maximum number of queued messages. Defaults to None.
+        queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+            Defaults to "block".
+        sink_workers (int): Number of threads running the pipeline. Defaults to 1.
+
+    ## Usage
+    ```python
+    with queueing(self, queue_size=10000, queue_policy="drop_oldest"):
+        while True:
+            self.process(payload, metadata)
+    ```
+    """
+    if queue_size is None:
+        yield
+        return
+
+    process = spout.process
+    queue = ReceiveQueue(
+        process,
+        maxsize=queue_size,
+        policy=queue_policy,
+        sink_workers=sink_workers,
+        counters=getattr(spout, "counters", None),
+    )
+    spout.process = queue.put
+    spout.queue = queue
+    metrics = getattr(spout, "metrics", None)
+    if metrics:
+        metrics.queue = queue
+    try:
+        yield
+    finally:
+        try:
+            queue.close()
+        finally:
+            spout.process = process
+            spout.queue = None
+            if metrics:
+                metrics.queue = None
@@ -14,12 +14,16 @@
 # limitations under the License.
 
 import asyncio
-import json
+from typing import Optional, cast
 
 from aioquic.asyncio import QuicConnectionProtocol, serve
+from aioquic.asyncio.server import QuicServer
 from aioquic.quic.configuration import QuicConfiguration
 from aioquic.quic.events import StreamDataReceived
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.supervisor import supervised
 
 
 class GeniusQuicProtocol(QuicConnectionProtocol):
@@ -32,7 +36,7 @@ class GeniusQuicProtocol(QuicConnectionProtocol):
             asyncio.create_task(self.handler(event.data, event.stream_id))
 
 
-class Quic(Spout):
+class Quic(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Quic class.
@@ -72,8 +76,8 @@ class Quic(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
 
     async def handle_stream_data(self, data: bytes, stream_id: int):
         """
@@ -82,37 +86,22 @@ class Quic(Spout):
         :param data: The incoming data.
         :param stream_id: The ID of the stream.
         """
-        try:
-            data = json.loads(data.decode())
-
-            # Add additional data about the stream ID
-            enriched_data = {
-                "data": data,
-                "stream_id": stream_id,
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
-        except Exception as e:
-            self.log.error(f"Error processing stream data: {e}")
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
-
-    def listen(self, cert_path: str, key_path: str, host: str = "localhost", port: int = 4433):
+        # Add additional data about the stream ID
+        self.process(data, {"stream_id": stream_id})
+
+    @supervised
+    def listen(
+        self,
+        cert_path: str,
+        key_path: str,
+        host: str = "localhost",
+        port: int = 4433,
+        codec: str = "json",
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        workers: int = 1,
+    ):
         """
         📖 Start listening for data from the QUIC server.
 
@@ -121,27 +110,46 @@ class Quic(Spout):
             key_path (str): Path to the private key file.
             host (str): Hostname to listen on. Defaults to "localhost".
             port (int): Port to listen on. Defaults to 4433.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto". Defaults to "json".
+            batch_size (Optional[int]): Send records to the output in batches of at most this many records.
+                Defaults to None, which saves every record as it arrives.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits for its batch to fill up.
+                Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            workers (int): Number of worker processes, all bound to the port with SO_REUSEPORT so that the kernel
+                spreads the datagrams over them. Defaults to 1.
 
         Raises:
             Exception: If unable to start the QUIC server.
         """
+        self.use_codec(codec)
+
         configuration = QuicConfiguration(is_client=False)
         configuration.load_cert_chain(cert_path, key_path)
 
+        def create_protocol(*args, **kwargs):
+            return GeniusQuicProtocol(*args, handler=self.handle_stream_data, **kwargs)
+
         loop = asyncio.get_event_loop()
-        server = loop.run_until_complete(
-            serve(
-                host=host,
-                port=port,
-                configuration=configuration,
-                create_protocol=lambda *args, **kwargs: GeniusQuicProtocol(
-                    *args, handler=self.handle_stream_data, **kwargs
-                ),
+        if workers > 1:
+            # serve() cannot share the port, this binds the same server with SO_REUSEPORT
+            _, protocol = loop.run_until_complete(
+                loop.create_datagram_endpoint(
+                    lambda: QuicServer(configuration=configuration, create_protocol=create_protocol),
+                    local_addr=(host, port),
+                    reuse_port=True,
+                )
+            )
+            server = cast(QuicServer, protocol)
+        else:
+            server = loop.run_until_complete(
+                serve(host=host, port=port, configuration=configuration, create_protocol=create_protocol)
             )
-        )
 
         try:
-            loop.run_forever()
+            with self.listening(batch_size=batch_size, linger_ms=linger_ms, batch_bytes=batch_bytes):
+                loop.run_forever()
         except KeyboardInterrupt:
             pass
         finally:
@@ -13,14 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 from typing import Optional
 
 import redis  # type: ignore
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
 
-class RedisPubSub(Spout):
+
+class RedisPubSub(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the RedisPubSub class.
@@ -60,8 +61,8 @@ class RedisPubSub(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        self.use_codec("json")
 
     def listen(
         self,
@@ -70,6 +71,10 @@ class RedisPubSub(Spout):
         port: int = 6379,
         db: int = 0,
         password: Optional[str] = None,
+        codec: str = "json",
+        queue_size: Optional[int] = None,
+        queue_policy: str = "block",
+        sink_workers: int = 1,
     ):
         """
         📖 Start listening for data from the Redis Pub/Sub channel.
@@ -80,44 +85,33 @@ class RedisPubSub(Spout):
             port (int): The Redis server port. Defaults to 6379.
             db (int): The Redis database index. Defaults to 0.
             password (Optional[str]): The password for authentication. Defaults to None.
+            codec (str): The codec to decode payloads with, one of "json", "orjson", "msgspec", "ujson", "msgpack",
+                "raw" or "auto". Defaults to "json".
+            queue_size (Optional[int]): Hand messages to sink worker threads through a queue of at most this many
+                messages, so that a slow output does not stall the reads. Defaults to None, which processes every
+                message on the receiving thread.
+            queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of sink worker threads. Defaults to 1.
 
         Raises:
             Exception: If unable to connect to the Redis server.
         """
+        self.use_codec(codec)
+
         self.redis = redis.StrictRedis(host=host, port=port, password=password, decode_responses=True, db=db)
         pubsub = self.redis.pubsub()
         pubsub.subscribe(channel)
 
         self.log.info(f"Listening to channel {channel} on Redis server at {host}:{port}")
 
-        for message in pubsub.listen():
-            try:
-                if message["type"] == "message":
-                    data = json.loads(message["data"])
-
-                    # Enrich the data with metadata about the channel
-                    enriched_data = {
-                        "data": data,
-                        "channel": channel,
-                    }
-
-                    # Use the output's save method
-                    self.output.save(enriched_data)
-
-                    # Update the state using the state
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["success_count"] += 1
-                    self.state.set_state(self.id, current_state)
-            except Exception as e:
-                self.log.error(f"Error processing Redis Pub/Sub message: {e}")
+        with self.listening(queue_size=queue_size, queue_policy=queue_policy, sink_workers=sink_workers):
+            for message in pubsub.listen():
+                try:
+                    if message["type"] == "message":
+                        # Enrich the data with metadata about the channel
+                        self.process(message["data"], {"channel": channel})
+                except Exception as e:
+                    self.log.error(f"Error processing Redis Pub/Sub message: {e}")
 
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["failure_count"] += 1
-                self.state.set_state(self.id, current_state)
+                    self.counters.incr("failure_count")
@@ -17,10 +17,12 @@ import asyncio
 from typing import Optional
 
 import redis  # type: ignore
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
 
-class RedisStream(Spout):
+
+class RedisStream(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the RedisStream class.
@@ -60,8 +62,7 @@ class RedisStream(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
     async def _listen(
         self,
@@ -115,44 +116,22 @@ class RedisStream(Spout):
                     for _, messages in result:
                         for msg_id, fields in messages:
                             last_id = msg_id
+                            self.counters.set("last_id", last_id)
 
                             # Enrich the data with metadata about the stream key and message ID
-                            enriched_data = {
-                                "data": fields,
-                                "stream_key": stream_key,
-                                "message_id": msg_id,
-                            }
-
-                            # Use the output's save method
-                            self.output.save(enriched_data)
-
-                            # Update the state using the state
-                            current_state = self.state.get_state(self.id) or {
-                                "success_count": 0,
-                                "failure_count": 0,
-                                "last_id": last_id,
-                            }
-                            current_state["success_count"] += 1
-                            current_state["last_id"] = last_id
-                            self.state.set_state(self.id, current_state)
+                            self.process(fields, {"stream_key": stream_key, "message_id": msg_id}, (stream_key, msg_id))
                 except Exception as e:
                     self.log.exception(f"Failed to process SNS message: {e}")
-                    current_state["failure_count"] += 1
-                    self.state.set_state(self.id, current_state)
+                    self.counters.incr("failure_count")
 
                 await asyncio.sleep(1)  # to prevent high CPU usage
 
         except Exception as e:
             self.log.error(f"Error processing Redis Stream message: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-                "last_id": last_id,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        finally:
+            self.counters.flush()
 
     def listen(
         self,
@@ -161,6 +140,9 @@ class RedisStream(Spout):
         port: int = 6379,
         db=0,
         password: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
     ):
         """
         📖 Start the asyncio event loop to listen for data from the Redis stream.
@@ -171,6 +153,12 @@ class RedisStream(Spout):
             port (int): The Redis server port. Defaults to 6379.
             db (int): The Redis database index. Defaults to 0.
             password (Optional[str]): The password for authentication. Defaults to None.
+            batch_size (Optional[int]): Send records to the output in batches of at most this many records.
+                Defaults to None, which saves every record as it arrives.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits for its batch to fill up.
+                Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
         """
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(self._listen(stream_key=stream_key, host=host, port=port, db=db, password=password))
+        with self.listening(batch_size=batch_size, linger_ms=linger_ms, batch_bytes=batch_bytes):
+            loop.run_until_complete(self._listen(stream_key=stream_key, host=host, port=port, db=db, password=password))
@@ -0,0 +1,262 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from confluent_kafka import OFFSET_BEGINNING, OFFSET_END, Consumer, TopicPartition
+
+Partition = Tuple[str, int]
+Position = Union[str, int, float, datetime, Dict[Any, int]]
+
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """
+    Read a timestamp as milliseconds since the epoch.
+
+    Args:
+        value (Any): Milliseconds since the epoch, as a number or a string of digits, a datetime, or an ISO 8601
+            string. Naive datetimes are taken as UTC.
+
+    Returns:
+        Optional[int]: The timestamp in milliseconds, None if the value is not a timestamp.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        if value.isdigit():
+            return int(value)
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return None
+
+
+def parse_offsets(value: Any) -> Optional[Dict[Partition, int]]:
+    """
+    Read offsets by partition.
+
+    Args:
+        value (Any): A dict of offsets by (topic, partition) or "topic:partition", or a string like
+            "orders:0=1200,orders:1=900".
+
+    Returns:
+        Optional[Dict[Tuple[str, int], int]]: The offsets by (topic, partition), None if the value is not offsets.
+    """
+    if isinstance(value, str):
+        if "=" not in value:
+            return None
+        pairs = [item.strip().rpartition("=") for item in value.split(",") if item.strip()]
+        value = {key: offset for key, _, offset in pairs}
+    if not isinstance(value, dict):
+        return None
+
+    offsets = {}
+    for key, offset in value.items():
+        if isinstance(key, str):
+            topic, _, partition = key.rpartition(":")
+            key = (topic, partition)
+        topic, partition = key
+        offsets[(topic, int(partition))] = int(offset)
+    return offsets
+
+
+class ReplayWindow:
+    def __init__(
+        self, start_from: Optional[Position] = None, stop_at: Optional[Position] = None, timeout: float = 10.0
+    ):
+        r"""
+        Start consuming partitions from a point in time or an offset, and stop at another.
+
+        `start_from` is applied once to every partition, when it is first assigned: a partition that comes back
+        after a rebalance resumes from its committed offset. It is one of:
+
+        - "earliest" or "latest": the start or the end of the partition.
+        - a timestamp: the first message at or after it, found with `offsets_for_times`.
+        - offsets by partition: these offsets, other partitions start from their committed offset.
+
+        `stop_at` bounds the replay, the stop point of a partition is excluded. It is one of:
+
+        - "latest": the end of the partition when it is assigned.
+        - a timestamp: the first message at or after it, or the end of the partition if there is none.
+        - offsets by partition: these offsets, other partitions stop at their end when they are assigned.
+
+        A partition is also finished when its end is reached. Timestamps are milliseconds since the epoch, datetimes
+        or ISO 8601 strings, see `parse_timestamp`, and offsets are parsed by `parse_offsets`.
+
+        Args:
+            start_from (Optional[Position]): Where to start. Defaults to None, the committed offsets.
+            stop_at (Optional[Position]): Where to stop. Defaults to None, never.
+            timeout (float): Maximum number of seconds to wait for offset lookups. Defaults to 10.
+
+        ## Usage
+        ```python
+        replay = ReplayWindow(start_from="2024-01-01T00:00:00Z", stop_at="2024-01-01T01:00:00Z")
+        consumer.subscribe(["orders"], on_assign=lambda c, p: replay.assign(c, p) and c.assign(p))
+        while not replay.finished:
+            message = consumer.poll(1.0)
+            if message and not replay.reached(message.topic(), message.partition(), message.offset()):
+                handle(message)
+        ```
+        """
+        self.start_from = self._parse(start_from, "start_from", ("earliest", "latest"))
+        self.stop_at = self._parse(stop_at, "stop_at", ("latest",))
+        self.timeout = timeout
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        self.stops: Dict[Partition, int] = {}
+        self.assigned: Set[Partition] = set()
+        self.done: Set[Partition] = set()
+        self._started: Set[Partition] = set()
+        self._consumer: Optional[Consumer] = None
+
+    @staticmethod
+    def _parse(value: Optional[Position], name: str, keywords: Tuple[str, ...]) -> Any:
+        if value is None or value in keywords:
+            return value
+        parsed = parse_offsets(value)
+        if parsed is not None:
+            return parsed
+        timestamp = parse_timestamp(value)
+        if timestamp is not None:
+            return timestamp
+        raise ValueError(f"Invalid {name}: {value}, expected {', '.join(keywords)}, a timestamp or offsets")
+
+    @property
+    def bounded(self) -> bool:
+        """
+        Whether the replay stops.
+        """
+        return self.stop_at is not None
+
+    @property
+    def finished(self) -> bool:
+        """
+        Whether every assigned partition reached its stop point.
+        """
+        return self.bounded and bool(self.assigned) and self.assigned <= self.done
+
+    def assign(self, consumer: Consumer, partitions: List[TopicPartition]) -> bool:
+        """
+        Set the start offsets of newly assigned partitions and compute their stop points.
+
+        Args:
+            consumer (Consumer): The consumer the partitions are assigned to.
+            partitions (List[TopicPartition]): The assigned partitions, whose offsets are set in place.
+
+        Returns:
+            bool: Whether any start offset was set, in which case the partitions must be assigned explicitly.
+        """
+        self._consumer = consumer
+        new = [tp for tp in partitions if (tp.topic, tp.partition) not in self._started]
+        self._started.update((tp.topic, tp.partition) for tp in new)
+        self.assigned.update((tp.topic, tp.partition) for tp in partitions)
+
+        moved = bool(new) and self.start_from is not None and self._seek(consumer, new)
+        if self.bounded:
+            for tp in new:
+                key = (tp.topic, tp.partition)
+                self.stops[key] = self._stop(consumer, tp)
+                # Nothing to replay, e.g. a window with no messages
+                if tp.offset >= 0 and tp.offset >= self.stops[key]:
+                    self._finish(key)
+        return moved
+
+    def revoke(self, partitions: List[TopicPartition]) -> None:
+        """
+        Forget revoked partitions, they no longer hold the replay back.
+
+        Args:
+            partitions (List[TopicPartition]): The revoked partitions.
+        """
+        self.assigned.difference_update((tp.topic, tp.partition) for tp in partitions)
+
+    def reached(self, topic: str, partition: int, offset: int) -> bool:
+        """
+        Check a consumed message against the stop point of its partition. The partition is paused once finished.
+
+        Args:
+            topic (str): The message's topic.
+            partition (int): The message's partition.
+            offset (int): The message's offset.
+
+        Returns:
+            bool: Whether the message is past the stop point and must be skipped.
+        """
+        stop = self.stops.get((topic, partition))
+        if stop is None:
+            return False
+        if offset + 1 >= stop:
+            self._finish((topic, partition))
+        return offset >= stop
+
+    def eof(self, topic: str, partition: int) -> None:
+        """
+        Record that the end of a partition was reached.
+
+        Args:
+            topic (str): The partition's topic.
+            partition (int): The partition.
+        """
+        if self.bounded:
+            self._finish((topic, partition))
+
+    def _seek(self, consumer: Consumer, partitions: List[TopicPartition]) -> bool:
+        start = self.start_from
+        if start == "earliest" or start == "latest":
+            for tp in partitions:
+                tp.offset = OFFSET_BEGINNING if start == "earliest" else OFFSET_END
+        elif isinstance(start, dict):
+            for tp in partitions:
+                tp.offset = start.get((tp.topic, tp.partition), tp.offset)
+        else:
+            query = [TopicPartition(tp.topic, tp.partition, start) for tp in partitions]
+            offsets = {(tp.topic, tp.partition): tp.offset for tp in consumer.offsets_for_times(query, self.timeout)}
+            for tp in partitions:
+                offset = offsets.get((tp.topic, tp.partition), -1)
+                # No message at or after the timestamp
+                tp.offset = offset if offset >= 0 else OFFSET_END
+        self.log.info(f"Replaying from {', '.join(f'{tp.topic}[{tp.partition}]@{tp.offset}' for tp in partitions)}")
+        return True
+
+    def _stop(self, consumer: Consumer, tp: TopicPartition) -> int:
+        stop = self.stop_at
+        if isinstance(stop, dict) and (tp.topic, tp.partition) in stop:
+            return stop[(tp.topic, tp.partition)]
+        if isinstance(stop, int):
+            (found,) = consumer.offsets_for_times([TopicPartition(tp.topic, tp.partition, stop)], self.timeout)
+            if found.offset >= 0:
+                return found.offset
+        _, high = consumer.get_watermark_offsets(TopicPartition(tp.topic, tp.partition), self.timeout, cached=False)
+        return high
+
+    def _finish(self, key: Partition) -> None:
+        if key in self.done:
+            return
+        self.done.add(key)
+        self.log.info(f"Replay of {key[0]}[{key[1]}] finished")
+        if self._consumer is not None:
+            try:
+                self._consumer.pause([TopicPartition(*key)])
+            except Exception as e:
+                self.log.error(f"Error pausing {key[0]}[{key[1]}]: {e}")
@@ -0,0 +1,130 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class TopicRouter:
+    def __init__(self, output: Any, routes: Dict[str, str]):
+        r"""
+        Send records to an output topic chosen by their source topic, through the producer of a streaming output.
+
+        The source topic is the record's "topic" field. A route's key is either a topic name or, starting with
+        "^", a regular expression matching topic names. Exact names win over expressions, which are tried in
+        order. Records of unrouted topics go to the output as usual.
+
+        Args:
+            output (StreamingOutput): The output whose producer to send with.
+            routes (Dict[str, str]): The output topic by source topic name or "^regex".
+
+        ## Usage
+        ```python
+        output = TopicRouter(StreamingOutput("default", "localhost:9094"), {"orders": "orders_raw", "^logs-.*": "logs"})
+        output.save({"data": {...}, "topic": "logs-eu"})  # Sent to "logs"
+        ```
+        """
+        if routes and getattr(output, "producer", None) is None:
+            raise ValueError("Routing records to topics requires a streaming output")
+
+        self.output = output
+        self.routes = {source: target for source, target in routes.items() if not source.startswith("^")}
+        self.patterns = [(re.compile(source), target) for source, target in routes.items() if source.startswith("^")]
+        self._resolved: Dict[Any, Optional[str]] = {}
+
+    def route(self, topic: Any) -> Optional[str]:
+        """
+        Get the output topic of a source topic.
+
+        Args:
+            topic (Any): The source topic.
+
+        Returns:
+            Optional[str]: The output topic, None if the topic is not routed.
+        """
+        try:
+            return self._resolved[topic]
+        except KeyError:
+            pass
+        target = self.routes.get(topic)
+        if target is None and isinstance(topic, str):
+            target = next((target for pattern, target in self.patterns if pattern.match(topic)), None)
+        # Subscriptions are bounded, so is the number of source topics
+        self._resolved[topic] = target
+        return target
+
+    def save(self, data: Any, filename: Optional[str] = None) -> None:
+        target = self.route(data.get("topic") if isinstance(data, dict) else None)
+        if target is None:
+            self.output.save(data)
+        else:
+            self.output.producer.send(target, json.dumps(data).encode("utf-8"))
+
+    def save_bulk(self, messages: List[Any]) -> None:
+        unrouted = []
+        for data in messages:
+            target = self.route(data.get("topic") if isinstance(data, dict) else None)
+            if target is None:
+                unrouted.append(data)
+            else:
+                self.output.producer.send(target, json.dumps(data).encode("utf-8"))
+        if unrouted:
+            if hasattr(self.output, "save_bulk"):
+                self.output.save_bulk(unrouted)
+            else:
+                for data in unrouted:
+                    self.output.save(data)
+
+    def flush(self) -> None:
+        self.output.flush()
+
+    def close(self) -> None:
+        # The output belongs to the spout
+        self.output.flush()
+
+
+@contextmanager
+def routing(spout: Any, routes: Optional[Dict[str, str]] = None) -> Iterator[None]:
+    r"""
+    Put a `TopicRouter` in front of a spout's output for the duration of the block.
+
+    Nothing is changed unless routes are given. Enter it before `Listener.listening`, so that batches are routed
+    record by record.
+
+    Args:
+        spout (Spout): The spout whose output to route.
+        routes (Optional[Dict[str, str]]): The output topic by source topic name or "^regex". Defaults to None.
+
+    ## Usage
+    ```python
+    with routing(self, {"orders": "orders_raw"}), self.listening(batch_size=batch_size):
+        self.process(payload, {"topic": "orders"})
+    ```
+    """
+    if not routes:
+        yield
+        return
+
+    output = spout.output
+    spout.output = TopicRouter(output, routes)
+    try:
+        yield
+    finally:
+        try:
+            spout.output.close()
+        finally:
+            spout.output = output
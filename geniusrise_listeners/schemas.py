@@ -0,0 +1,369 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import datetime
+import decimal
+import io
+import json
+import os
+import re
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+Reader = Callable[[memoryview], Any]
+
+# Confluent wire format: a zero magic byte, then the schema id as a big-endian 32-bit integer
+MAGIC_BYTE = 0
+HEADER_SIZE = 5
+
+# Local registry files by extension
+SCHEMA_TYPES = {".avsc": "AVRO", ".proto": "PROTOBUF", ".json": "JSON"}
+
+
+class SchemaRegistry:
+    def __init__(self):
+        r"""
+        Look schemas up by id, and referenced schemas by subject and version, each once.
+
+        Schemas are immutable once registered, so they are cached for the life of the registry. A schema is a
+        dict with the "schema" string, its "schemaType", one of "AVRO", "PROTOBUF" or "JSON", and its
+        "references", as returned by the Confluent Schema Registry API.
+        """
+        self._schemas: Dict[int, Dict[str, Any]] = {}
+        self._references: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def schema(self, schema_id: int) -> Dict[str, Any]:
+        """
+        Get a schema by id.
+
+        Args:
+            schema_id (int): The schema id.
+
+        Returns:
+            Dict[str, Any]: The schema.
+        """
+        with self._lock:
+            if schema_id not in self._schemas:
+                self._schemas[schema_id] = self._normalize(self._fetch(schema_id))
+            return self._schemas[schema_id]
+
+    def reference(self, subject: str, version: int) -> Dict[str, Any]:
+        """
+        Get a referenced schema by subject and version.
+
+        Args:
+            subject (str): The subject of the referenced schema.
+            version (int): The version of the referenced schema.
+
+        Returns:
+            Dict[str, Any]: The schema.
+        """
+        with self._lock:
+            key = (subject, version)
+            if key not in self._references:
+                self._references[key] = self._normalize(self._fetch_reference(subject, version))
+            return self._references[key]
+
+    @staticmethod
+    def _normalize(schema: Dict[str, Any]) -> Dict[str, Any]:
+        # The registry leaves the type out for Avro
+        return {"schemaType": "AVRO", "references": [], **schema}
+
+    def _fetch(self, schema_id: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _fetch_reference(self, subject: str, version: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class HttpSchemaRegistry(SchemaRegistry):
+    def __init__(self, url: str, auth: Optional[str] = None, timeout: float = 10.0):
+        r"""
+        A client of the Confluent Schema Registry REST API.
+
+        Args:
+            url (str): The registry URL, e.g. "http://localhost:8081".
+            auth (Optional[str]): Basic authentication credentials as "username:password". Defaults to None.
+            timeout (float): Maximum number of seconds to wait for the registry. Defaults to 10.
+
+        ## Usage
+        ```python
+        registry = HttpSchemaRegistry("http://localhost:8081")
+        registry.schema(42)  # {"schemaType": "AVRO", "schema": "{...}", "references": []}
+        ```
+        """
+        import requests
+
+        super().__init__()
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        if auth:
+            username, _, password = auth.partition(":")
+            self.session.auth = (username, password)
+
+    def _get(self, path: str) -> Dict[str, Any]:
+        response = self.session.get(f"{self.url}{path}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch(self, schema_id: int) -> Dict[str, Any]:
+        return self._get(f"/schemas/ids/{schema_id}")
+
+    def _fetch_reference(self, subject: str, version: int) -> Dict[str, Any]:
+        return self._get(f"/subjects/{quote(subject, safe='')}/versions/{version}")
+
+
+class LocalSchemaRegistry(SchemaRegistry):
+    def __init__(self, path: str):
+        r"""
+        A stand-in for the schema registry, reading schemas from a directory, e.g. for tests.
+
+        The schema of id 42 is the file "42.avsc" for Avro, "42.proto" for Protobuf or "42.json" for JSON
+        Schema. A schema referenced by subject and version is the file "<subject>/<version>.<extension>". Schemas
+        in local files cannot have references themselves.
+
+        Args:
+            path (str): The directory.
+
+        ## Usage
+        ```python
+        registry = LocalSchemaRegistry("tests/schemas")
+        registry.schema(42)
+        ```
+        """
+        super().__init__()
+        self.path = path
+
+    def _read(self, base: str) -> Dict[str, Any]:
+        for extension, schema_type in SCHEMA_TYPES.items():
+            if os.path.exists(base + extension):
+                with open(base + extension) as f:
+                    return {"schema": f.read(), "schemaType": schema_type}
+        raise KeyError(f"No schema file {base}{{{','.join(SCHEMA_TYPES)}}}")
+
+    def _fetch(self, schema_id: int) -> Dict[str, Any]:
+        return self._read(os.path.join(self.path, str(schema_id)))
+
+    def _fetch_reference(self, subject: str, version: int) -> Dict[str, Any]:
+        return self._read(os.path.join(self.path, subject, str(version)))
+
+
+def get_schema_registry(location: str, auth: Optional[str] = None) -> SchemaRegistry:
+    """
+    Get a schema registry client.
+
+    Args:
+        location (str): An http(s) URL for the Confluent Schema Registry, or a directory for a local registry,
+            optionally as a file:// URL.
+        auth (Optional[str]): Basic authentication credentials for the registry, as "username:password".
+            Defaults to None.
+
+    Returns:
+        SchemaRegistry: The registry.
+    """
+    if location.startswith(("http://", "https://")):
+        return HttpSchemaRegistry(location, auth)
+    return LocalSchemaRegistry(location[len("file://") :] if location.startswith("file://") else location)
+
+
+def _varint(data: memoryview, position: int) -> Tuple[int, int]:
+    # Zigzag encoded, as written by the Confluent serializers
+    shift = result = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return (result >> 1) ^ -(result & 1), position
+        shift += 7
+
+
+def proto_message_names(schema: str) -> List[Tuple[str, List[Any]]]:
+    """
+    List the messages of a .proto file, in the order the Confluent message indexes refer to them.
+
+    Args:
+        schema (str): The .proto file.
+
+    Returns:
+        List[Tuple[str, List[Any]]]: The fully qualified name and nested messages of every top-level message.
+    """
+    schema = re.sub(r"//[^\n]*|/\*.*?\*/", "", schema, flags=re.S)
+    package = re.search(r"\bpackage\s+([\w.]+)\s*;", schema)
+    prefix = f"{package.group(1)}." if package else ""
+
+    top: List[Tuple[str, List[Any]]] = []
+    # The nested messages of the enclosing blocks, None for blocks other than messages
+    stack: List[Optional[Tuple[str, List[Any]]]] = []
+    for match in re.finditer(r"\b(message|enum|service|oneof|extend)\s+([\w.]+)\s*\{|\{|\}", schema):
+        if match.group(0) == "}":
+            if stack:
+                stack.pop()
+        elif match.group(1) == "message":
+            parent = next((block for block in reversed(stack) if block is not None), None)
+            name = f"{parent[0] if parent else prefix.rstrip('.')}.{match.group(2)}".lstrip(".")
+            message: Tuple[str, List[Any]] = (name, [])
+            (parent[1] if parent else top).append(message)
+            stack.append(message)
+        else:
+            stack.append(None)
+    return top
+
+
+def json_safe(value: Any) -> Any:
+    """
+    Turn what fastavro reads for Avro bytes, fixed and logical types into values JSON outputs can save: dates and
+    times as ISO 8601 strings, decimals and UUIDs as strings, and bytes as base64 strings.
+
+    Args:
+        value (Any): A value read by fastavro.
+
+    Returns:
+        Any: The value, with nested records, maps and arrays turned too.
+    """
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    # datetime.datetime is a datetime.date
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+class ConfluentDecoder:
+    def __init__(self, registry: SchemaRegistry, validate: bool = False):
+        r"""
+        Decode payloads in the Confluent wire format, whatever their schema type, into dicts.
+
+        The reader of a schema id is compiled on the first payload of that id and cached, so that decoding
+        never looks a schema up again:
+
+        - **AVRO**: a fastavro schemaless reader of the parsed writer schema and its references. Bytes and logical
+          types are turned into strings, see `json_safe`. Requires `fastavro`.
+        - **PROTOBUF**: the message class named by the message indexes, which must be generated and imported, to
+          be found in the default descriptor pool. Messages are turned into dicts with their field names.
+          Requires `protobuf`.
+        - **JSON**: the JSON payload, validated against the schema if `validate` is set. Validation requires
+          `jsonschema`.
+
+        Args:
+            registry (SchemaRegistry): Where to look schemas up.
+            validate (bool): Validate JSON Schema payloads. Defaults to False.
+
+        ## Usage
+        ```python
+        decoder = ConfluentDecoder(get_schema_registry("http://localhost:8081"))
+        spout.configure(decoder=decoder)
+        ```
+        """
+        self.registry = registry
+        self.validate = validate
+        self._readers: Dict[int, Reader] = {}
+
+    def __call__(self, payload: Any) -> Any:
+        data = memoryview(payload)
+        if len(data) < HEADER_SIZE or data[0] != MAGIC_BYTE:
+            raise ValueError("Payload is not in the Confluent wire format")
+        schema_id = int.from_bytes(data[1:HEADER_SIZE], "big")
+        reader = self._readers.get(schema_id)
+        if reader is None:
+            reader = self._readers[schema_id] = self._compile(self.registry.schema(schema_id))
+        return reader(data[HEADER_SIZE:])
+
+    def _compile(self, schema: Dict[str, Any]) -> Reader:
+        schema_type = schema["schemaType"]
+        if schema_type == "AVRO":
+            return self._avro(schema)
+        if schema_type == "PROTOBUF":
+            return self._protobuf(schema)
+        if schema_type == "JSON":
+            return self._json(schema)
+        raise ValueError(f"Unknown schema type: {schema_type}")
+
+    def _avro(self, schema: Dict[str, Any]) -> Reader:
+        from fastavro import parse_schema, schemaless_reader
+
+        named: Dict[str, Any] = {}
+
+        def parse(schema: Dict[str, Any]) -> Any:
+            for reference in schema["references"]:
+                parse(self.registry.reference(reference["subject"], reference["version"]))
+            return parse_schema(json.loads(schema["schema"]), named_schemas=named)
+
+        parsed = parse(schema)
+
+        def read(data: memoryview) -> Any:
+            return json_safe(schemaless_reader(io.BytesIO(data), parsed, None))
+
+        return read
+
+    def _protobuf(self, schema: Dict[str, Any]) -> Reader:
+        from google.protobuf import descriptor_pool, message_factory
+        from google.protobuf.json_format import MessageToDict
+
+        messages = proto_message_names(schema["schema"])
+        classes: Dict[Tuple[int, ...], Any] = {}
+        # Newer protobuf releases replace MessageFactory.GetPrototype with GetMessageClass
+        message_class_of = (
+            getattr(message_factory, "GetMessageClass", None) or message_factory.MessageFactory().GetPrototype
+        )
+
+        def read(data: memoryview) -> Any:
+            count, position = _varint(data, 0)
+            # A single 0 stands for the first message
+            indexes = [0] if count == 0 else []
+            for _ in range(count):
+                index, position = _varint(data, position)
+                indexes.append(index)
+
+            key = tuple(indexes)
+            message_class = classes.get(key)
+            if message_class is None:
+                name, nested = messages[indexes[0]]
+                for index in indexes[1:]:
+                    name, nested = nested[index]
+                descriptor = descriptor_pool.Default().FindMessageTypeByName(name)
+                message_class = classes[key] = message_class_of(descriptor)
+            return MessageToDict(message_class.FromString(data[position:].tobytes()), preserving_proto_field_name=True)
+
+        return read
+
+    def _json(self, schema: Dict[str, Any]) -> Reader:
+        if not self.validate:
+            return lambda data: json.loads(data.tobytes())
+
+        from jsonschema.validators import validator_for
+
+        document = json.loads(schema["schema"])
+        validator = validator_for(document)(document)
+
+        def read(data: memoryview) -> Any:
+            value = json.loads(data.tobytes())
+            validator.validate(value)
+            return value
+
+        return read
@@ -17,10 +17,12 @@ import asyncio
 
 import boto3
 from botocore.exceptions import ClientError
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
 
-class SNS(Spout):
+
+class SNS(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the SNS class.
@@ -54,8 +56,7 @@ class SNS(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
         self.sns = boto3.resource("sns")
 
     async def _listen_to_subscription(self, subscription):
@@ -74,39 +75,14 @@ class SNS(Spout):
                     messages = subscription.get_messages()
                     for message in messages:
                         # Enrich the data with metadata about the subscription ARN
-                        enriched_data = {
-                            "data": message,
-                            "subscription_arn": subscription.arn,
-                        }
-
-                        # Use the output's save method
-                        self.output.save(enriched_data)
-
-                        # Update the state using the state
-                        current_state = self.state.get_state(self.id) or {
-                            "success_count": 0,
-                            "failure_count": 0,
-                        }
-                        current_state["success_count"] += 1
-                        self.state.set_state(self.id, current_state)
+                        self.process(message, {"subscription_arn": subscription.arn})
                 except Exception as e:
                     self.log.exception(f"Failed to process SNS message: {e}")
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["failure_count"] += 1
-                    self.state.set_state(self.id, current_state)
+                    self.counters.incr("failure_count")
         except ClientError as e:
             self.log.error(f"Error processing SNS message from subscription {subscription.arn}: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
 
     async def _listen(self):
         """
@@ -123,13 +99,9 @@ class SNS(Spout):
         except ClientError as e:
             self.log.error(f"Error listening to AWS SNS: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        finally:
+            self.counters.flush()
 
     def listen(self):
         """
@@ -16,10 +16,12 @@
 import socketio
 import json
 from typing import Optional
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
 
-class SocketIo(Spout):
+
+class SocketIo(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the SocketIo class.
@@ -57,8 +59,7 @@ class SocketIo(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
         self.sio = socketio.Client()
 
     def _message_handler(self, msg):
@@ -104,10 +105,4 @@ class SocketIo(Spout):
         except Exception as e:
             self.log.error(f"Error connecting to Socket.io server: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
@@ -0,0 +1,443 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Tuple, Union
+
+# Kernel tables of the UDP sockets, one line per socket
+PROC_NET_UDP = ("/proc/net/udp", "/proc/net/udp6")
+
+# Makes the receive calls return the full length of a datagram larger than the buffer, on Linux
+MSG_TRUNC = getattr(socket, "MSG_TRUNC", 0)
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+# Makes recvmmsg block for the first datagram only
+MSG_WAITFORONE = 0x10000
+
+log = logging.getLogger(__name__)
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IoVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+# Large enough for any socket address, like struct sockaddr_storage
+_SOCKADDR_SIZE = 128
+_UINT = struct.Struct("I")
+
+
+def _load_recvmmsg() -> Optional[Any]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+_recvmmsg = _load_recvmmsg()
+
+
+def _sockaddr(name: Any) -> Tuple[Any, ...]:
+    # Decode a struct sockaddr_in or sockaddr_in6 into the address tuple that recvfrom would return
+    family = int.from_bytes(name[0:2], sys.byteorder)
+    port = int.from_bytes(name[2:4], "big")
+    if family == socket.AF_INET6:
+        return (
+            socket.inet_ntop(socket.AF_INET6, bytes(name[8:24])),
+            port,
+            int.from_bytes(name[4:8], "big"),
+            int.from_bytes(name[24:28], sys.byteorder),
+        )
+    return (socket.inet_ntop(socket.AF_INET, bytes(name[4:8])), port)
+
+
+def parse_addresses(addresses: Union[str, List[str]], port: int) -> List[Tuple[str, int]]:
+    """
+    Parse bind addresses given as "host:port", "[ipv6]:port" or "host" strings.
+
+    Args:
+        addresses (Union[str, List[str]]): The addresses, as a list or a comma separated string.
+        port (int): The port of the addresses without one.
+
+    Returns:
+        List[Tuple[str, int]]: The (host, port) pairs.
+    """
+    if isinstance(addresses, str):
+        addresses = [address.strip() for address in addresses.split(",") if address.strip()]
+    pairs = []
+    for address in addresses:
+        if address.startswith("["):
+            host, _, rest = address[1:].partition("]")
+            pairs.append((host, int(rest[1:]) if rest.startswith(":") else port))
+        elif address.count(":") == 1:
+            host, _, number = address.partition(":")
+            pairs.append((host, int(number)))
+        else:
+            # A bare host, or a bare IPv6 address
+            pairs.append((address, port))
+    return pairs
+
+
+def address_family(host: str) -> int:
+    """
+    Get the address family to bind a host with: IPv6 for IPv6 addresses such as "::" or "::1", IPv4 otherwise,
+    including host names.
+
+    Args:
+        host (str): The host.
+
+    Returns:
+        int: socket.AF_INET6 or socket.AF_INET.
+    """
+    return socket.AF_INET6 if ":" in host else socket.AF_INET
+
+
+def join_multicast_group(sock: socket.socket, group: str, interface: Optional[str] = None) -> None:
+    """
+    Join a multicast group on a bound UDP socket, so that it receives the datagrams sent to the group.
+
+    Args:
+        sock (socket.socket): The socket, of the family of the group.
+        group (str): The group address, e.g. "239.1.2.3" or "ff15::1234".
+        interface (Optional[str]): The interface to join on: its address for IPv4 groups, its name or index for
+            IPv6 groups. Defaults to None, which lets the kernel pick it from the routing table.
+    """
+    if address_family(group) == socket.AF_INET6:
+        index = 0
+        if interface:
+            index = int(interface) if interface.isdigit() else socket.if_nametoindex(interface)
+        membership = socket.inet_pton(socket.AF_INET6, group) + struct.pack("@I", index)
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP, membership)
+    else:
+        membership = socket.inet_aton(group) + socket.inet_aton(interface or "0.0.0.0")
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+
+
+def run_event_loop(main: Awaitable[None]) -> None:
+    """
+    Run a coroutine to completion on uvloop where it is installed, on asyncio's own event loop otherwise.
+
+    Args:
+        main (Awaitable[None]): The coroutine to run.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main)  # type: ignore
+        return
+    uvloop.run(main)
+
+
+def read_udp_table(paths: Iterable[str] = PROC_NET_UDP) -> Dict[int, Dict[str, int]]:
+    """
+    Read the receive queue and drop counters of every UDP socket from the kernel's tables.
+
+    Args:
+        paths (Iterable[str]): The tables to read. Defaults to /proc/net/udp and /proc/net/udp6.
+
+    Returns:
+        Dict[int, Dict[str, int]]: {"receive_queue_bytes", "drops"} by socket inode. Empty where the tables do
+            not exist, e.g. outside Linux.
+    """
+    sockets: Dict[int, Dict[str, int]] = {}
+    for path in paths:
+        try:
+            with open(path) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            # sl local_address rem_address st tx_queue:rx_queue tr:tm->when retrnsmt uid timeout inode ref pointer drops
+            fields = line.split()
+            if len(fields) < 13:
+                continue
+            sockets[int(fields[9])] = {
+                "receive_queue_bytes": int(fields[4].split(":")[1], 16),
+                "drops": int(fields[12]),
+            }
+    return sockets
+
+
+def udp_socket_stats(sockets: List[socket.socket]) -> Optional[Dict[str, int]]:
+    """
+    Get the bytes waiting in the receive queues of UDP sockets and the datagrams the kernel dropped because the
+    queues were full, summed over the sockets.
+
+    Args:
+        sockets (List[socket.socket]): The bound sockets.
+
+    Returns:
+        Optional[Dict[str, int]]: {"receive_queue_bytes", "drops"}, or None if none of the sockets is found in
+            the kernel's tables.
+    """
+    table = read_udp_table()
+    stats = {"receive_queue_bytes": 0, "drops": 0}
+    found = False
+    for sock in sockets:
+        try:
+            inode = os.fstat(sock.fileno()).st_ino
+        except (OSError, TypeError, ValueError):
+            continue
+        if inode in table:
+            found = True
+            for name, value in table[inode].items():
+                stats[name] += value
+    return stats if found else None
+
+
+def set_receive_buffer(sock: socket.socket, size: int) -> int:
+    """
+    Ask the kernel for a receive buffer of `size` bytes, so that bursts are queued instead of dropped while the
+    listener is busy.
+
+    Linux caps the size at net.core.rmem_max, and reports twice the size it granted to account for its
+    bookkeeping. A warning is logged when the granted buffer is smaller than requested.
+
+    Args:
+        sock (socket.socket): The socket.
+        size (int): The requested size in bytes.
+
+    Returns:
+        int: The size reported by the kernel.
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if isinstance(granted, int) and granted < size:
+        log.warning(
+            f"Asked for a receive buffer of {size} bytes but got {granted}, raise net.core.rmem_max to get more"
+        )
+    return granted
+
+
+class SocketWatcher:
+    def __init__(self, spout: Any, sockets: List[socket.socket], interval: float = 10.0):
+        r"""
+        Periodically export the receive queue and kernel drops of a listener's UDP sockets.
+
+        The stats are set as the `socket_queue_bytes` and `socket_drops` gauges of the listener's state, suffixed
+        with the worker number in worker processes, and as the listener's socket metrics. Reading them from a
+        thread keeps the receive loop free of any bookkeeping.
+
+        Args:
+            spout (Listener): The listener.
+            sockets (List[socket.socket]): The bound sockets.
+            interval (float): Number of seconds between two reads. Defaults to 10.
+
+        ## Usage
+        ```python
+        watcher = SocketWatcher(spout, [s])
+        watcher.start()
+        ...
+        watcher.close()
+        ```
+        """
+        self.spout = spout
+        self.sockets = sockets
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start reading the stats in a daemon thread.
+        """
+        self._thread = threading.Thread(target=self._run, name=f"{self.spout.id}-socket-stats", daemon=True)
+        self._thread.start()
+
+    def update(self) -> Optional[Dict[str, int]]:
+        """
+        Read and export the stats now.
+
+        Returns:
+            Optional[Dict[str, int]]: {"receive_queue_bytes", "drops"}, or None if the sockets are not found.
+        """
+        stats = udp_socket_stats(self.sockets)
+        if stats is None:
+            return None
+        suffix = "" if self.spout.worker is None else f"_{self.spout.worker}"
+        self.spout.counters.set(f"socket_queue_bytes{suffix}", stats["receive_queue_bytes"])
+        self.spout.counters.set(f"socket_drops{suffix}", stats["drops"])
+        if self.spout.metrics:
+            self.spout.metrics.sockets = stats
+        return stats
+
+    def close(self) -> None:
+        """
+        Stop reading the stats and clear the socket metrics.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.spout.metrics:
+            self.spout.metrics.sockets = {}
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.update()
+            except Exception as e:
+                log.error(f"Error reading socket stats: {e}")
+            self._stopped.wait(self.interval)
+
+
+class DatagramReader:
+    def __init__(self, sock: socket.socket, max_datagram_size: int, batch: int = 1):
+        r"""
+        Receive datagrams into preallocated buffers, up to `batch` of them per wakeup.
+
+        `read` blocks until a datagram arrives, then drains the datagrams already queued on the socket, up to
+        `batch`, without blocking again. On Linux they are all received with a single recvmmsg call, elsewhere
+        with non-blocking `recvfrom_into` calls. The datagrams are returned as memoryviews of the reader's
+        buffer, which the next `read` overwrites.
+
+        Args:
+            sock (socket.socket): The bound socket, in blocking mode.
+            max_datagram_size (int): Size in bytes of the buffer of each datagram.
+            batch (int): Maximum number of datagrams per read. Defaults to 1.
+
+        ## Usage
+        ```python
+        reader = DatagramReader(s, 65535, batch=64)
+        while True:
+            for data, addr, size in reader.read():
+                ...
+        ```
+        """
+        if batch < 1:
+            raise ValueError("batch must be at least 1")
+
+        self.sock = sock
+        self.max_datagram_size = max_datagram_size
+        # Datagrams cannot be drained without blocking where MSG_DONTWAIT is missing, e.g. on Windows
+        self.batch = batch if MSG_DONTWAIT or _recvmmsg is not None else 1
+        self.buffer = bytearray(max_datagram_size * self.batch)
+        self.view = memoryview(self.buffer)
+        self._slots = [self.view[i * max_datagram_size : (i + 1) * max_datagram_size] for i in range(self.batch)]
+
+        self._messages: Optional[Any] = None
+        if self.batch > 1 and _recvmmsg is not None:
+            self._setup_recvmmsg()
+
+    def read(self) -> List[Tuple[memoryview, Any, int]]:
+        """
+        Wait for datagrams and receive those that are queued.
+
+        Returns:
+            List[Tuple[memoryview, Any, int]]: (data, sender address, size) for every datagram. The size is the
+                full length of the datagram where the platform reports it, and is larger than the data when the
+                datagram was truncated to max_datagram_size.
+        """
+        if self._messages is not None:
+            return self._read_recvmmsg()
+
+        size = self.max_datagram_size
+        recvfrom_into = self.sock.recvfrom_into
+        slots = self._slots
+        received, addr = recvfrom_into(slots[0], size, MSG_TRUNC)
+        datagrams = [(slots[0][:received] if received < size else slots[0], addr, received)]
+        for slot in slots[1:]:
+            try:
+                received, addr = recvfrom_into(slot, size, MSG_TRUNC | MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            datagrams.append((slot[:received] if received < size else slot, addr, received))
+        return datagrams
+
+    def _setup_recvmmsg(self) -> None:
+        size = self.max_datagram_size
+        self._data = (ctypes.c_char * len(self.buffer)).from_buffer(self.buffer)
+        self._names = ctypes.create_string_buffer(_SOCKADDR_SIZE * self.batch)
+        self._iovecs = (_IoVec * self.batch)()
+        self._messages = (_MMsgHdr * self.batch)()
+        base = ctypes.addressof(self._data)
+        names = ctypes.addressof(self._names)
+        for i in range(self.batch):
+            self._iovecs[i].iov_base = base + i * size
+            self._iovecs[i].iov_len = size
+            header = self._messages[i].msg_hdr
+            header.msg_name = names + i * _SOCKADDR_SIZE
+            header.msg_namelen = _SOCKADDR_SIZE
+            header.msg_iov = ctypes.pointer(self._iovecs[i])
+            header.msg_iovlen = 1
+
+        # Read the results straight from the structs' memory, attribute access through ctypes is slow
+        stride = ctypes.sizeof(_MMsgHdr)
+        self._headers = memoryview(self._messages).cast("B")  # type: ignore
+        names_view = memoryview(self._names).cast("B")  # type: ignore
+        self._name_views = [names_view[i * _SOCKADDR_SIZE : (i + 1) * _SOCKADDR_SIZE] for i in range(self.batch)]
+        self._namelen_offsets = [i * stride + _MsgHdr.msg_namelen.offset for i in range(self.batch)]
+        self._len_offsets = [i * stride + _MMsgHdr.msg_len.offset for i in range(self.batch)]
+        # Senders are few compared to datagrams, so their decoded addresses are kept by raw address
+        self._addresses: Dict[bytes, Tuple[Any, ...]] = {}
+
+    def _read_recvmmsg(self) -> List[Tuple[memoryview, Any, int]]:
+        fd = self.sock.fileno()
+        while True:
+            count = _recvmmsg(fd, self._messages, self.batch, MSG_WAITFORONE | MSG_TRUNC, None)  # type: ignore
+            if count >= 0:
+                break
+            error = ctypes.get_errno()
+            # Retry when interrupted, a pending KeyboardInterrupt is raised on the way
+            if error != errno.EINTR:
+                raise OSError(error, os.strerror(error))
+
+        size = self.max_datagram_size
+        headers = self._headers
+        addresses = self._addresses
+        datagrams = []
+        for i in range(count):
+            received = _UINT.unpack_from(headers, self._len_offsets[i])[0]
+            namelen_offset = self._namelen_offsets[i]
+            namelen = _UINT.unpack_from(headers, namelen_offset)[0]
+            # The kernel shrinks the name length to the sender's address, it is reset for the next read
+            _UINT.pack_into(headers, namelen_offset, _SOCKADDR_SIZE)
+            name = self._name_views[i][:namelen].tobytes()
+            addr = addresses.get(name)
+            if addr is None:
+                if len(addresses) >= 65536:
+                    addresses.clear()
+                addr = addresses[name] = _sockaddr(name)
+            slot = self._slots[i]
+            datagrams.append((slot[:received] if received < size else slot, addr, received))
+        return datagrams
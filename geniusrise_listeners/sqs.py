@@ -13,11 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List, Optional
+
 import boto3
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.batching import BatchingOutput
+from geniusrise_listeners.supervisor import supervised
 
 
-class SQS(Spout):
+class SQS(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the SQS class.
@@ -56,11 +62,19 @@ class SQS(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
         self.sqs = boto3.client("sqs")
 
-    def listen(self, queue_url: str, batch_size: int = 10, batch_interval: int = 10):
+    @supervised
+    def listen(
+        self,
+        queue_url: str,
+        batch_size: int = 10,
+        batch_interval: int = 10,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        workers: int = 1,
+    ):
         """
         📖 Start listening for new messages in the SQS queue.
 
@@ -68,55 +82,62 @@ class SQS(Spout):
             queue_url (str): The URL of the SQS queue to listen to.
             batch_size (int): The maximum number of messages to receive in each batch. Defaults to 10.
             batch_interval (int): The time in seconds to wait for a new message if the queue is empty. Defaults to 10.
+            linger_ms (Optional[int]): Send records to the output in batches of at most `batch_size` records, waiting
+                at most this many milliseconds for a batch to fill up. Messages are deleted from the queue in bulk
+                once their batch is sent, and left to be received again if it cannot be. Defaults to None, which
+                saves every record as it arrives.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            workers (int): Number of worker processes, each receiving from the queue. Defaults to 1.
 
         Raises:
             Exception: If unable to connect to the SQS service.
         """
         self.queue_url = queue_url
-        while True:
-            try:
-                # Receive message from SQS queue
-                response = self.sqs.receive_message(
-                    QueueUrl=self.queue_url,
-                    AttributeNames=["All"],
-                    MaxNumberOfMessages=batch_size,
-                    MessageAttributeNames=["All"],
-                    VisibilityTimeout=batch_interval,
-                    WaitTimeSeconds=batch_interval,
-                )
-
-                if "Messages" in response:
-                    for message in response["Messages"]:
-                        receipt_handle = message["ReceiptHandle"]
-
-                        # Enrich the data with metadata about the message ID
-                        enriched_data = {
-                            "data": message,
-                            "message_id": message["MessageId"],
-                        }
+        with self.listening(
+            batch_size=batch_size if linger_ms or batch_bytes else None,
+            linger_ms=linger_ms,
+            batch_bytes=batch_bytes,
+        ):
+            batched = self.output if isinstance(self.output, BatchingOutput) else None
+            if batched:
+                batched.on_sent = self._delete
+            while True:
+                try:
+                    # Receive message from SQS queue
+                    response = self.sqs.receive_message(
+                        QueueUrl=self.queue_url,
+                        AttributeNames=["All"],
+                        MaxNumberOfMessages=batch_size,
+                        MessageAttributeNames=["All"],
+                        VisibilityTimeout=batch_interval,
+                        WaitTimeSeconds=batch_interval,
+                    )
 
-                        # Use the output's save method
-                        self.output.save(enriched_data)
+                    if "Messages" in response:
+                        for message in response["Messages"]:
+                            receipt_handle = message["ReceiptHandle"]
 
-                        # Update the state using the state
-                        current_state = self.state.get_state(self.id) or {
-                            "success_count": 0,
-                            "failure_count": 0,
-                        }
-                        current_state["success_count"] += 1
-                        self.state.set_state(self.id, current_state)
+                            # Enrich the data with metadata about the message ID
+                            if batched:
+                                with batched.tracking(receipt_handle):
+                                    self.process(message, {"message_id": message["MessageId"]}, message["MessageId"])
+                            elif self.process(message, {"message_id": message["MessageId"]}, message["MessageId"]):
+                                # Delete received message from queue
+                                self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+                    else:
+                        self.log.debug("No messages available in the queue.")
+                except Exception as e:
+                    self.log.error(f"Error processing SQS message: {e}")
 
-                        # Delete received message from queue
-                        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
-                else:
-                    self.log.debug("No messages available in the queue.")
-            except Exception as e:
-                self.log.error(f"Error processing SQS message: {e}")
+                    self.counters.incr("failure_count")
 
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["failure_count"] += 1
-                self.state.set_state(self.id, current_state)
+    def _delete(self, receipt_handles: List[str]) -> None:
+        # Delete the messages of a batch that was sent, at most 10 per request
+        for start in range(0, len(receipt_handles), 10):
+            entries = [
+                {"Id": str(i), "ReceiptHandle": receipt_handle}
+                for i, receipt_handle in enumerate(receipt_handles[start : start + 10])
+            ]
+            response = self.sqs.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            for failed in response.get("Failed", []):
+                self.log.error(f"Error deleting SQS message: {failed.get('Message', failed['Code'])}")
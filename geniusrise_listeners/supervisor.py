@@ -0,0 +1,387 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import inspect
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from geniusrise_listeners.counters import StateCounter
+
+
+class ForwardingCounter(StateCounter):
+    def __init__(self, queue: Any, key: str, interval: float = 1.0, max_pending: int = 10000):
+        r"""
+        Counters of a worker process, sent to the supervising process instead of being written to the state.
+
+        Counting works as in `StateCounter`, but every flush puts the counter deltas and the gauges on `queue`.
+        The supervisor adds them to its own counters, so the state is only ever written by one process.
+
+        Args:
+            queue (multiprocessing.Queue): The queue the supervisor reads from.
+            key (str): The state key, usually the spout's id.
+            interval (float): Minimum number of seconds between two flushes. Defaults to 1.0.
+            max_pending (int): Number of increments after which a flush is forced. Defaults to 10000.
+        """
+        super().__init__(None, key, interval=interval, max_pending=max_pending)
+        self.queue = queue
+
+    def _write(self, deltas: Dict[str, int], gauges: Dict[str, Any]) -> None:
+        self.queue.put(("counters", os.getpid(), deltas, gauges))
+
+
+class RelayOutput:
+    def __init__(self, connection: Any, accepts_bytes: bool = False):
+        r"""
+        The output of a worker process: records are sent to the supervising process, which saves them with the
+        listener's output and answers once they are saved, so that `save` still fails if saving fails.
+
+        Outputs do not survive a fork, e.g. the network thread of a Kafka producer is gone in the child process,
+        so only the supervising process ever uses the listener's output.
+
+        Args:
+            connection (multiprocessing.connection.Connection): The worker's end of its pipe to the supervisor.
+            accepts_bytes (bool): Whether the listener's output takes bytes. Defaults to False.
+        """
+        self.connection = connection
+        self.accepts_bytes = accepts_bytes
+
+    def _call(self, *request: Any) -> None:
+        self.connection.send(request)
+        error = self.connection.recv()
+        if error is not None:
+            raise RuntimeError(error)
+
+    def save(self, data: Any, filename: Optional[str] = None) -> None:
+        self._call("save", [data])
+
+    def save_bulk(self, messages: List[Any]) -> None:
+        self._call("save", list(messages))
+
+    def flush(self) -> None:
+        self._call("flush")
+
+    def close(self) -> None:
+        pass
+
+
+def _interrupt(signum: int, frame: Any) -> None:
+    # Leave listen() the same way as on Ctrl-C, so that the listener flushes what it has
+    raise KeyboardInterrupt
+
+
+class Supervisor:
+    def __init__(
+        self,
+        spout: Any,
+        workers: int,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        interval: float = 10.0,
+    ):
+        r"""
+        Run a listener in several worker processes, and restart the workers that crash.
+
+        Every worker is a fork of the current process running the same `listen()` call, with `spout.worker` set
+        to its index. Server listeners bind their sockets with SO_REUSEPORT in the workers, so that the kernel
+        spreads connections and datagrams over them. Broker listeners simply run one consumer per worker, and
+        let the broker balance partitions, queues or shared subscriptions between them.
+
+        The workers send their counters and their metrics to the supervisor, which keeps them in its own state
+        and exports them as if it had processed every message itself. They send their records to the supervisor
+        too, see `RelayOutput`, which saves them with the listener's output. A worker that exits with an error is
+        restarted after `restart_delay` seconds, doubling up to `max_restart_delay` while it keeps crashing, and
+        counted as `worker_restarts`. Workers that exit cleanly are not restarted, and the supervisor returns
+        once all of them have exited. On Ctrl-C or SIGTERM, the workers are asked to stop and waited for.
+
+        Args:
+            spout (Listener): The listener to run.
+            workers (int): Number of worker processes.
+            restart_delay (float): Number of seconds to wait before restarting a crashed worker. Defaults to 1.
+            max_restart_delay (float): Maximum number of seconds to wait before restarting a worker that keeps
+                crashing. Defaults to 30.
+            interval (float): Number of seconds between the metrics snapshots of the workers. Defaults to 10.
+
+        ## Usage
+        ```python
+        supervisor = Supervisor(spout, workers=4)
+        supervisor.run(lambda: spout.listen(host="0.0.0.0", port=12345, workers=4))
+        ```
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.spout = spout
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.interval = interval
+        self.log = logging.getLogger(self.__class__.__name__)
+
+        # Forking keeps the listener as configured, hooks and all, without pickling it
+        self._context = multiprocessing.get_context("fork")
+        self._queue: Any = self._context.Queue()
+        self._processes: Dict[int, Any] = {}
+        self._stopped = threading.Event()
+        # The supervisor's ends of the workers' pipes, until the workers exit
+        self._connections: List[Any] = []
+        self._lock = threading.Lock()
+
+    def run(self, target: Callable[[], Any]) -> None:
+        """
+        Start the workers, each calling `target`, and supervise them until they have all exited.
+
+        Args:
+            target (Callable[[], Any]): The listen() call to run in every worker.
+        """
+        collector = threading.Thread(target=self._collect, name=f"{self.spout.id}-supervisor", daemon=True)
+        collector.start()
+        relay = threading.Thread(target=self._relay, name=f"{self.spout.id}-supervisor-output", daemon=True)
+        relay.start()
+        # Signal handlers can only be set from the main thread
+        main = threading.current_thread() is threading.main_thread()
+        previous = signal.signal(signal.SIGTERM, _interrupt) if main else None
+
+        # Worker index -> when to restart it, and how long to wait the next time it crashes
+        restarts: Dict[int, float] = {}
+        delays: Dict[int, float] = {}
+        try:
+            for index in range(self.workers):
+                self._start(index, target)
+
+            while self._processes or restarts:
+                now = time.monotonic()
+                for index, due in list(restarts.items()):
+                    if due <= now:
+                        del restarts[index]
+                        self._start(index, target)
+                timeout = min(restarts.values(), default=now + 1.0) - now
+                sentinels = {process.sentinel: index for index, process in self._processes.items()}
+                for sentinel in wait(list(sentinels), timeout=max(0.0, timeout)):
+                    index = sentinels[sentinel]
+                    process = self._processes.pop(index)
+                    process.join()
+                    if process.exitcode == 0:
+                        self.log.info(f"Worker {index} exited")
+                        continue
+
+                    delay = delays.get(index, self.restart_delay)
+                    self.log.error(
+                        f"Worker {index} exited with code {process.exitcode}, restarting it in {delay:g} seconds"
+                    )
+                    self.spout.counters.incr("worker_restarts")
+                    restarts[index] = time.monotonic() + delay
+                    delays[index] = min(delay * 2, self.max_restart_delay)
+        except KeyboardInterrupt:
+            self.log.info("Stopping the workers")
+        finally:
+            self.stop()
+            if main:
+                signal.signal(signal.SIGTERM, previous)
+            self._stopped.set()
+            collector.join()
+            relay.join()
+            try:
+                self.spout.output.flush()
+            except Exception as e:
+                self.log.error(f"Error flushing the output: {e}")
+            self.spout.counters.flush()
+            if self.spout.metrics:
+                self.spout.metrics.push()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Ask the running workers to stop, and kill those that have not stopped after `timeout` seconds.
+
+        Args:
+            timeout (float): Number of seconds to wait for the workers. Defaults to 10.
+        """
+        processes = list(self._processes.values())
+        self._processes.clear()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                self.log.error(f"Worker {process.name} did not stop, killing it")
+                process.kill()
+                process.join()
+
+    def _start(self, index: int, target: Callable[[], Any]) -> None:
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=self._work,
+            args=(index, target, child_connection),
+            name=f"{self.spout.id}-worker-{index}",
+        )
+        process.start()
+        # Only the worker holds its end, so that the supervisor reads EOF once the worker exits
+        child_connection.close()
+        with self._lock:
+            self._connections.append(connection)
+        self._processes[index] = process
+        self.log.info(f"Started worker {index} with pid {process.pid}")
+
+    def _work(self, index: int, target: Callable[[], Any], connection: Any) -> None:
+        signal.signal(signal.SIGTERM, _interrupt)
+        spout = self.spout
+        spout.worker = index
+        forward_to_parent(spout, self._queue, self.interval)
+        spout.output = RelayOutput(connection, accepts_bytes=getattr(spout.output, "accepts_bytes", False))
+        try:
+            target()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            spout.counters.close()
+            if spout.metrics:
+                spout.metrics.close()
+
+    def _relay(self) -> None:
+        while True:
+            with self._lock:
+                connections = list(self._connections)
+            if not connections:
+                if self._stopped.is_set():
+                    return
+                time.sleep(0.1)
+                continue
+
+            ready: List[Any] = wait(connections, timeout=0.1)
+            for connection in ready:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    # The worker has exited
+                    with self._lock:
+                        self._connections.remove(connection)
+                    connection.close()
+                    continue
+
+                try:
+                    connection.send(self._output(request))
+                except OSError as e:
+                    self.log.error(f"Error answering a worker: {e}")
+
+    def _output(self, request: Tuple[Any, ...]) -> Optional[str]:
+        # Saves the records of a worker, or flushes, and returns the error if that fails
+        kind, *args = request
+        output = self.spout.output
+        try:
+            if kind == "flush":
+                output.flush()
+            elif len(args[0]) > 1 and hasattr(output, "save_bulk"):
+                output.save_bulk(args[0])
+            else:
+                for record in args[0]:
+                    output.save(record)
+            return None
+        except Exception as e:
+            self.log.error(f"Error saving the records of a worker: {e}")
+            return str(e) or type(e).__name__
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                message = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+
+            try:
+                apply_worker_message(self.spout, message)
+            except Exception as e:
+                self.log.error(f"Error collecting worker data: {e}")
+
+
+def forward_to_parent(spout: Any, queue: Any, interval: float = 10.0) -> None:
+    """
+    Make the listener of a forked worker process send its counters and metrics to the parent process, which
+    adds them to its own with `apply_worker_message`.
+
+    Args:
+        spout (Listener): The worker's listener.
+        queue (multiprocessing.Queue): The queue the parent reads from.
+        interval (float): Number of seconds between the metrics snapshots. Defaults to 10.
+    """
+    spout.counters = ForwardingCounter(queue, spout.id)
+    if spout.metrics:
+        spout.metrics.counters = spout.counters
+        spout.metrics.forward(queue, interval)
+
+    # Rebuild the pipeline around the worker's counters
+    spout.configure()
+
+
+def apply_worker_message(spout: Any, message: Tuple[Any, ...]) -> None:
+    """
+    Add the counters or metrics sent by a worker process to the listener of the parent process.
+
+    Args:
+        spout (Listener): The parent's listener.
+        message (Tuple[Any, ...]): A ("counters", pid, deltas, gauges) or ("metrics", pid, samples) message.
+    """
+    kind, pid, *data = message
+    if kind == "counters":
+        deltas, gauges = data
+        for name, delta in deltas.items():
+            spout.counters.incr(name, delta)
+        for name, value in gauges.items():
+            spout.counters.set(name, value)
+    elif kind == "metrics" and spout.metrics:
+        spout.metrics.merge(pid, data[0])
+
+
+def supervised(listen: Callable[..., Any]) -> Callable[..., Any]:
+    r"""
+    Let a listen() method run in several worker processes, when called with `workers` greater than 1.
+
+    The method must take a `workers` argument. It is called as is in every worker process, where it can use
+    `workers` to share its server socket with SO_REUSEPORT or to join a consumer group.
+
+    Args:
+        listen (Callable[..., Any]): The listen() method.
+
+    Returns:
+        Callable[..., Any]: The wrapped method.
+
+    ## Usage
+    ```python
+    @supervised
+    def listen(self, host: str = "localhost", port: int = 12345, workers: int = 1):
+        ...
+    ```
+    """
+    signature = inspect.signature(listen)
+
+    @functools.wraps(listen)
+    def wrapper(self, *args, **kwargs):
+        workers = int(signature.bind(self, *args, **kwargs).arguments.get("workers", 1))
+        if workers <= 1 or getattr(self, "worker", None) is not None:
+            return listen(self, *args, **kwargs)
+        interval = float(self.top_level_arguments.get("metrics_interval", 10.0))
+        Supervisor(self, workers, interval=interval).run(functools.partial(listen, self, *args, **kwargs))
+
+    return wrapper
@@ -13,12 +13,93 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import base64
+import selectors
 import socket
+from contextlib import ExitStack
+from typing import Any, List, Optional, Tuple, Union
 
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.formats import get_format, parsed
+from geniusrise_listeners.queueing import AsyncReceiveQueue
+from geniusrise_listeners.sockets import (
+    DatagramReader,
+    SocketWatcher,
+    address_family,
+    join_multicast_group,
+    parse_addresses,
+    run_event_loop,
+    set_receive_buffer,
+)
+from geniusrise_listeners.supervisor import supervised
 
-class Udp(Spout):
+# The largest UDP payload, above which datagrams cannot be received whole
+MAX_DATAGRAM_SIZE = 65535
+
+ENGINES = ("socket", "asyncio")
+
+# Datagrams the asyncio engine reads from a socket each time it is readable
+READS_PER_WAKEUP = 64
+
+
+def _decode_utf8(data: Any) -> str:
+    # Unlike bytes.decode, also decodes the memoryviews of the receive buffer
+    return str(data, "utf-8")
+
+
+def _encode_base64(data: Any) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+# Decoders by encoding, the raw encoding has none
+ENCODINGS = {"utf-8": _decode_utf8, "base64": _encode_base64, "raw": None}
+
+
+class _DatagramReader:
+    def __init__(self, spout: "Udp", sock: socket.socket, queue: AsyncReceiveQueue):
+        r"""
+        Read datagrams from a non-blocking socket on the running event loop, and queue them until paused.
+
+        Reading is paused by removing the socket from the event loop's readers, which every event loop supports,
+        unlike `pause_reading` on datagram transports, so that datagrams wait in the receive buffer meanwhile.
+        """
+        self.spout = spout
+        self.sock = sock
+        self.queue = queue
+        self.loop = asyncio.get_running_loop()
+        self.reading = False
+
+    def resume(self) -> None:
+        if not self.reading:
+            self.reading = True
+            self.loop.add_reader(self.sock.fileno(), self._read)
+
+    def pause(self) -> None:
+        if self.reading:
+            self.reading = False
+            self.loop.remove_reader(self.sock.fileno())
+
+    def _read(self) -> None:
+        # A few datagrams at a time, so that a busy socket does not hold up the others
+        for _ in range(READS_PER_WAKEUP):
+            if not self.reading:
+                return
+            try:
+                data, addr = self.sock.recvfrom(MAX_DATAGRAM_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.spout.log.error(f"Error receiving UDP data: {e}")
+                self.spout.counters.incr("failure_count")
+                return
+            # Enrich the data with metadata about the sender's address and port
+            self.queue.put(data, {"sender_address": addr[0], "sender_port": addr[1]})
+
+
+class Udp(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Udp class.
@@ -56,50 +137,245 @@ class Udp(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
+        # Assuming the data is a utf-8 encoded string
+        self.configure(decoder=_decode_utf8)
 
-    def listen(self, host: str = "localhost", port: int = 12345):
+    @supervised
+    def listen(
+        self,
+        host: str = "localhost",
+        port: int = 12345,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_policy: str = "block",
+        sink_workers: int = 1,
+        workers: int = 1,
+        max_datagram_size: int = MAX_DATAGRAM_SIZE,
+        rcvbuf_bytes: Optional[int] = None,
+        stats_interval: float = 10.0,
+        receive_batch: int = 1,
+        engine: str = "socket",
+        addresses: Optional[Union[str, List[str]]] = None,
+        ipv6_only: bool = False,
+        multicast_groups: Optional[Union[str, List[str]]] = None,
+        multicast_interface: Optional[str] = None,
+        format: Optional[str] = None,
+        encoding: Optional[str] = None,
+        zero_copy: bool = False,
+    ):
         """
         📖 Start listening for data from the UDP server.
 
         Args:
-            host (str): The UDP server host. Defaults to "localhost".
+            host (str): The UDP server host. IPv6 addresses, e.g. "::", bind IPv6 sockets, which also receive IPv4
+                datagrams unless ipv6_only is set. Host names bind IPv4 sockets. Defaults to "localhost".
             port (int): The UDP server port. Defaults to 12345.
+            batch_size (Optional[int]): Send records to the output in batches of at most this many records.
+                Defaults to None, which saves every record as it arrives.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits for its batch to fill up.
+                Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            queue_size (Optional[int]): Hand messages to sink worker threads through a queue of at most this many
+                messages, so that a slow output does not stall the reads. Defaults to None, which processes every
+                message on the receiving thread.
+            queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of sink worker threads. Defaults to 1.
+            workers (int): Number of worker processes, all bound to the port with SO_REUSEPORT so that the kernel
+                spreads the datagrams over them. Defaults to 1.
+            max_datagram_size (int): Size in bytes of the receive buffer, up to 65535. Longer datagrams are
+                truncated and counted as `truncated_count`. Defaults to 65535.
+            rcvbuf_bytes (Optional[int]): Size in bytes of the socket's kernel receive buffer (SO_RCVBUF), which
+                queues bursts while the listener is busy. Linux caps it at net.core.rmem_max. Defaults to None,
+                the system default.
+            stats_interval (float): Number of seconds between two reads of the socket's receive queue and of the
+                datagrams the kernel dropped because it was full, see `SocketWatcher`. Defaults to 10.
+            receive_batch (int): Receive up to this many queued datagrams per wakeup, with one recvmmsg call on
+                Linux, instead of one call per datagram. Unless a batching option is given, the records of the
+                datagrams are then also sent to the output together. Defaults to 1.
+            engine (str): How datagrams are received, "socket" for a blocking loop on the calling thread, or
+                "asyncio" for an asyncio event loop, uvloop if it is installed, that hands them to the sink workers
+                through a queue. The asyncio engine always queues, with queue_size defaulting to 10000, and the
+                block policy stops reading from the sockets while the queue is full. max_datagram_size and
+                receive_batch only apply to the socket engine. Defaults to "socket".
+            addresses (Optional[Union[str, List[str]]]): Listen on these addresses instead of host and port, as a
+                list or a comma separated string of "host:port" or "[ipv6]:port", e.g. "0.0.0.0:8125,[::]:514".
+                The socket engine waits on all of them with one selector. Defaults to None.
+            ipv6_only (bool): Only receive IPv6 datagrams on IPv6 sockets, instead of IPv4 ones too. Defaults to
+                False.
+            multicast_groups (Optional[Union[str, List[str]]]): Join these multicast groups, as a list or a comma
+                separated string, e.g. "239.1.2.3,ff15::1234". Each group is joined on the sockets of its address
+                family, which are bound with SO_REUSEADDR so that other listeners of the groups can share the port.
+                Defaults to None.
+            multicast_interface (Optional[str]): The interface to join the groups on: its address for IPv4 groups,
+                its name or index for IPv6 groups. Defaults to None, which lets the kernel pick it.
+            format (Optional[str]): Parse the datagrams as "statsd" metrics, "syslog" messages (RFC 5424) or
+                "influx" line protocol points, see `geniusrise_listeners.formats`, instead of saving them as
+                strings. Malformed datagrams are skipped without logging and counted as `filtered_count`.
+                Defaults to None.
+            encoding (Optional[str]): How datagrams are saved, when no format is given: "utf-8" as strings,
+                "base64" as base64 strings, which JSON outputs can carry for binary protocols such as protobuf,
+                CBOR or msgpack, or "raw" as the bytes received, for outputs that set `accepts_bytes = True`.
+                Defaults to None, which keeps the listener's decoder, utf-8 unless configured otherwise.
+            zero_copy (bool): With the socket engine, decode datagrams straight from the receive buffer, and with
+                the raw encoding hand them to the output as memoryviews of it, instead of copying them to bytes.
+                The buffer is reused for the next datagram, so the output must be done with the memoryview when
+                `save` returns. Requires no queue and no batching. Defaults to False.
 
         Raises:
             Exception: If unable to connect to the UDP server.
         """
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.bind((host, port))
-            while True:
-                try:
-                    data, addr = s.recvfrom(1024)
-
-                    # Enrich the data with metadata about the sender's address and port
-                    enriched_data = {
-                        "data": data.decode("utf-8"),  # Assuming the data is a utf-8 encoded string
-                        "sender_address": addr[0],
-                        "sender_port": addr[1],
-                    }
-
-                    # Use the output's save method
-                    self.output.save(enriched_data)
-
-                    # Update the state using the state
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["success_count"] += 1
-                    self.state.set_state(self.id, current_state)
-                except Exception as e:
-                    self.log.error(f"Error processing UDP data: {e}")
-
-                    # Update the state using the state
-                    current_state = self.state.get_state(self.id) or {
-                        "success_count": 0,
-                        "failure_count": 0,
-                    }
-                    current_state["failure_count"] += 1
-                    self.state.set_state(self.id, current_state)
+        if not 1 <= max_datagram_size <= MAX_DATAGRAM_SIZE:
+            raise ValueError(f"max_datagram_size must be between 1 and {MAX_DATAGRAM_SIZE}")
+        if receive_batch < 1:
+            raise ValueError("receive_batch must be at least 1")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}, expected one of {', '.join(ENGINES)}")
+        if format is not None and encoding is not None:
+            raise ValueError("format and encoding cannot be combined")
+        if encoding is not None and encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}, expected one of {', '.join(ENCODINGS)}")
+        if encoding == "raw" and not getattr(self.output, "accepts_bytes", False):
+            raise ValueError('The output cannot save bytes, use encoding="base64" instead of "raw"')
+        if zero_copy and (
+            engine != "socket" or queue_size is not None or batch_size or linger_ms or batch_bytes or receive_batch > 1
+        ):
+            raise ValueError("zero_copy requires the socket engine, no queue and no batching")
+        if format is not None:
+            self.configure(decoder=get_format(format), filters=[*(f for f in self.filters if f is not parsed), parsed])
+        elif encoding == "raw":
+            self.use_codec("raw")
+        elif encoding is not None:
+            self.configure(decoder=ENCODINGS[encoding])
+        binds = parse_addresses(addresses, port) if addresses else [(host, port)]
+        groups = parse_addresses(multicast_groups, port) if multicast_groups else []
+        families = {address_family(bind[0]) for bind in binds}
+        for group, _ in groups:
+            if address_family(group) not in families:
+                raise ValueError(f"Cannot join the multicast group {group} without a socket of its address family")
+        if receive_batch > 1 and batch_size is None and linger_ms is None and batch_bytes is None:
+            batch_size = receive_batch
+
+        with ExitStack() as stack:
+            sockets = []
+            for bind in binds:
+                family = address_family(bind[0])
+                s = stack.enter_context(socket.socket(family, socket.SOCK_DGRAM))
+                sockets.append(s)
+                if family == socket.AF_INET6:
+                    s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, int(ipv6_only))
+                if workers > 1:
+                    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+                if groups:
+                    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if rcvbuf_bytes:
+                    self.log.info(f"Receive buffer of {set_receive_buffer(s, rcvbuf_bytes)} bytes")
+                s.bind(bind)
+                for group, _ in groups:
+                    if address_family(group) == family:
+                        join_multicast_group(s, group, multicast_interface)
+
+            watcher = SocketWatcher(self, sockets, stats_interval)
+            watcher.start()
+            try:
+                if engine == "asyncio":
+                    with self.listening(batch_size=batch_size, linger_ms=linger_ms, batch_bytes=batch_bytes):
+                        run_event_loop(
+                            self._serve(
+                                sockets,
+                                queue_size=queue_size or 10000,
+                                queue_policy=queue_policy,
+                                sink_workers=sink_workers,
+                            )
+                        )
+                    return
+
+                # Datagrams are received into preallocated buffers instead of a new bytes object each
+                readers = [DatagramReader(s, max_datagram_size, receive_batch) for s in sockets]
+                if len(readers) == 1:
+                    read = readers[0].read
+                else:
+                    selector = stack.enter_context(selectors.DefaultSelector())
+                    for reader in readers:
+                        selector.register(reader.sock, selectors.EVENT_READ, reader)
+
+                    def read() -> List[Tuple[memoryview, Any, int]]:
+                        # Every reader has its own buffers, so the datagrams of all of them stay valid together
+                        datagrams = []
+                        for key, _ in selector.select():
+                            datagrams.extend(key.data.read())
+                        return datagrams
+
+                with self.listening(
+                    batch_size=batch_size,
+                    linger_ms=linger_ms,
+                    batch_bytes=batch_bytes,
+                    queue_size=queue_size,
+                    queue_policy=queue_policy,
+                    sink_workers=sink_workers,
+                ):
+                    # Decoding on this thread reads the buffer before the next datagram overwrites it, and so
+                    # does an output that saves right away with zero_copy, anything else gets a copy
+                    shared = self.queue is None and (self.decoder is not None or zero_copy)
+                    while True:
+                        try:
+                            for data, addr, size in read():
+                                if size > max_datagram_size:
+                                    self.log.warning(f"Truncated a datagram of {size} bytes from {addr[0]}:{addr[1]}")
+                                    self.counters.incr("truncated_count")
+
+                                # Enrich the data with metadata about the sender's address and port
+                                self.process(
+                                    data if shared else bytes(data),
+                                    {"sender_address": addr[0], "sender_port": addr[1]},
+                                )
+                        except Exception as e:
+                            self.log.error(f"Error processing UDP data: {e}")
+
+                            self.counters.incr("failure_count")
+            finally:
+                watcher.close()
+
+    async def _serve(self, sockets: List[socket.socket], queue_size: int, queue_policy: str, sink_workers: int) -> None:
+        readers: List[_DatagramReader] = []
+
+        def pause() -> None:
+            for reader in readers:
+                reader.pause()
+
+        def resume() -> None:
+            for reader in readers:
+                reader.resume()
+
+        queue = AsyncReceiveQueue(
+            self.process,
+            maxsize=queue_size,
+            policy=queue_policy,
+            sink_workers=sink_workers,
+            counters=self.counters,
+            pause=pause,
+            resume=resume,
+        )
+        queue.start()
+        self.queue = queue  # type: ignore
+        if self.metrics:
+            self.metrics.queue = queue
+        try:
+            for s in sockets:
+                s.setblocking(False)
+                readers.append(_DatagramReader(self, s, queue))
+            resume()
+            loop_name = type(asyncio.get_running_loop()).__name__
+            self.log.info(f"Listening on {', '.join(str(s.getsockname()) for s in sockets)} with {loop_name}")
+            await asyncio.Future()  # run forever
+        finally:
+            pause()
+            try:
+                await queue.close()
+            finally:
+                self.queue = None
+                if self.metrics:
+                    self.metrics.queue = None
@@ -14,13 +14,22 @@
 # limitations under the License.
 
 import base64
-from typing import List, Optional
+import json
+from typing import List, Optional, Tuple
 
 import cherrypy
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.httpserver import AsyncHTTPServer, HTTPRequest
+from geniusrise_listeners.sockets import run_event_loop
+from geniusrise_listeners.supervisor import supervised
 
-class Webhook(Spout):
+# The request body media types CherryPy's json_in tool accepts
+JSON_CONTENT_TYPES = ("application/json", "text/javascript")
+
+
+class Webhook(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Webhook class.
@@ -58,69 +67,90 @@ class Webhook(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
+        super().__init__(output, state, **kwargs)
         self.buffer: List[dict] = []
-
-    def _check_auth(self, username, password):
-        auth_header = cherrypy.request.headers.get("Authorization")
-        if auth_header:
+        self.server: Optional[AsyncHTTPServer] = None
+        # Basic authentication credentials, set by listen()
+        self.username: Optional[str] = None
+        self.password: Optional[str] = None
+
+    def _authorized(self, auth_header: Optional[str]) -> bool:
+        # Both engines check requests here, against the credentials given to listen()
+        if not (self.username and self.password):
+            return True
+        if not auth_header:
+            return False
+        try:
             auth_decoded = base64.b64decode(auth_header[6:]).decode("utf-8")
             provided_username, provided_password = auth_decoded.split(":", 1)
-            if provided_username != username or provided_password != password:
-                raise cherrypy.HTTPError(401, "Unauthorized")
-        else:
+        except ValueError:
+            return False
+        return provided_username == self.username and provided_password == self.password
+
+    def _check_auth(self):
+        if not self._authorized(cherrypy.request.headers.get("Authorization")):
             raise cherrypy.HTTPError(401, "Unauthorized")
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    def default(self, username=None, password=None):
-        if username and password:
-            self._check_auth(username, password)
+    def default(self, *args, **kwargs):
+        # CherryPy passes the path segments and the query string, which are not used
+        self._check_auth()
 
         try:
             data = cherrypy.request.json
 
             # Add additional data about the endpoint and headers
-            enriched_data = {
-                "data": data,
-                "endpoint": cherrypy.url(),
-                "headers": dict(cherrypy.request.headers),
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            if "success_count" not in current_state.keys():
-                current_state = {"success_count": 0, "failure_count": 0}
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
-
-            return ""
+            metadata = {"endpoint": cherrypy.url(), "headers": dict(cherrypy.request.headers)}
         except Exception as e:
             self.log.error(f"Error processing webhook data: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+            self.counters.incr("failure_count")
+        else:
+            if self.process(data, metadata):
+                return ""
+
+        cherrypy.response.status = 500
+        return "Error processing data"
+
+    def _handle(self, request: HTTPRequest) -> Tuple[int, str]:
+        # The asyncio engine's counterpart of default, called on one of the server's worker threads
+        if not self._authorized(request.headers.get("Authorization")):
+            return 401, "Unauthorized"
+
+        if request.body:
+            content_type = request.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+            if content_type not in JSON_CONTENT_TYPES:
+                return 415, f"Expected an entity of content type {', '.join(JSON_CONTENT_TYPES)}"
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                return 400, "Invalid JSON document"
+
+            # Add additional data about the endpoint and headers, the URL as cherrypy.url() has it
+            host = request.headers.get("Host", f"{self.server.host}:{self.server.port}")  # type: ignore
+            metadata = {"endpoint": f"http://{host}{request.path}", "headers": dict(request.headers)}
+            if self.process(data, metadata):
+                return 200, ""
+        else:
+            self.log.error("Error processing webhook data: the request has no body")
+            self.counters.incr("failure_count")
 
-            cherrypy.response.status = 500
-            return "Error processing data"
+        return 500, "Error processing data"
 
+    @supervised
     def listen(
         self,
         endpoint: str = "*",
         port: int = 3000,
         username: Optional[str] = None,
         password: Optional[str] = None,
+        workers: int = 1,
+        engine: str = "cherrypy",
+        max_concurrency: int = 64,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        keepalive_timeout: float = 75.0,
+        request_timeout: float = 30.0,
     ):
         """
         📖 Start listening for data from the webhook.
@@ -130,10 +160,47 @@ class Webhook(Spout):
             port (int): The port to listen on. Defaults to 3000.
             username (Optional[str]): The username for basic authentication. Defaults to None.
             password (Optional[str]): The password for basic authentication. Defaults to None.
+            workers (int): Number of worker processes, all bound to the port with SO_REUSEPORT so that the kernel
+                spreads the connections over them. Defaults to 1.
+            engine (str): The HTTP server. Defaults to "cherrypy".
+                "cherrypy" for CherryPy, which serves every connection on a thread of its pool.
+                "asyncio" for an asyncio HTTP/1.1 server, on uvloop if it is installed, that serves the connections
+                on its event loop, keeps them alive and answers pipelined requests in order, and processes the
+                requests on `max_concurrency` threads. Many or slow clients then cannot take up all the threads.
+            max_concurrency (int): Maximum number of requests the asyncio engine processes at once, further
+                requests wait for a slot once their body is read. Defaults to 64.
+            max_body_bytes (int): Larger requests are refused with 413 by the asyncio engine. Defaults to 10 MiB.
+            keepalive_timeout (float): Number of seconds the asyncio engine keeps idle connections open.
+                Defaults to 75.
+            request_timeout (float): Number of seconds the asyncio engine gives clients to send a request body,
+                or answers with 408, and to take a response. Requests still running when the listener stops get as
+                long to finish. Defaults to 30.
 
         Raises:
-            Exception: If unable to start the CherryPy server.
+            ValueError: If the engine is unknown.
+            Exception: If unable to start the server.
         """
+        if engine not in ("cherrypy", "asyncio"):
+            raise ValueError(f"Unknown engine: {engine}, expected cherrypy or asyncio")
+
+        self.username = username
+        self.password = password
+        if engine == "asyncio":
+            # Every path is accepted, as by default
+            self.server = AsyncHTTPServer(
+                self._handle,
+                host="0.0.0.0",
+                port=port,
+                max_concurrency=max_concurrency,
+                max_body_bytes=max_body_bytes,
+                keepalive_timeout=keepalive_timeout,
+                request_timeout=request_timeout,
+                reuse_port=workers > 1,
+            )
+            with self.listening():
+                run_event_loop(self.server.serve())
+            return
+
         # Disable CherryPy's default loggers
         cherrypy.log.access_log.propagate = False
         cherrypy.log.error_log.propagate = False
@@ -149,6 +216,11 @@ class Webhook(Spout):
                 "log.screen": False,  # Disable logging to the console
             }
         )
+        if workers > 1:
+            # CherryPy has no setting for it, so create the server to set it on
+            cherrypy.server.httpserver, _ = cherrypy.server.httpserver_from_self()
+            cherrypy.server.httpserver.reuse_port = True
         cherrypy.tree.mount(self, "/")
         cherrypy.engine.start()
-        cherrypy.engine.block()
+        with self.listening():
+            cherrypy.engine.block()
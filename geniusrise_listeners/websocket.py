@@ -14,12 +14,16 @@
 # limitations under the License.
 
 import asyncio
+from typing import Optional
 
 import websockets
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.supervisor import supervised
 
-class Websocket(Spout):
+
+class Websocket(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the Websocket class.
@@ -57,14 +61,14 @@ class Websocket(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
-    async def __listen(self, host: str, port: int):
+    async def __listen(self, host: str, port: int, reuse_port: bool = False):
         """
         Start listening for data from the WebSocket server.
         """
-        async with websockets.serve(self.receive_message, host, port):  # type: ignore
+        options = {"reuse_port": True} if reuse_port else {}
+        async with websockets.serve(self.receive_message, host, port, **options):  # type: ignore
             await asyncio.Future()  # run forever
 
     async def receive_message(self, websocket, path):
@@ -77,44 +81,41 @@ class Websocket(Spout):
         """
         try:
             data = await websocket.recv()
-
-            # Add additional metadata
-            enriched_data = {
-                "data": data,
-                "path": path,
-                "client_address": websocket.remote_address,
-            }
-
-            # Use the output's save method
-            self.output.save(enriched_data)
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["success_count"] += 1
-            self.state.set_state(self.id, current_state)
         except Exception as e:
             self.log.error(f"Error processing WebSocket data: {e}")
 
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
-
-    def listen(self, host: str = "localhost", port: int = 8765):
+            self.counters.incr("failure_count")
+            return
+
+        # Add additional metadata
+        self.process(data, {"path": path, "client_address": websocket.remote_address})
+
+    @supervised
+    def listen(
+        self,
+        host: str = "localhost",
+        port: int = 8765,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        batch_bytes: Optional[int] = None,
+        workers: int = 1,
+    ):
         """
         📖 Start the WebSocket server.
 
         Args:
             host (str): The WebSocket server host. Defaults to "localhost".
             port (int): The WebSocket server port. Defaults to 8765.
+            batch_size (Optional[int]): Send records to the output in batches of at most this many records.
+                Defaults to None, which saves every record as it arrives.
+            linger_ms (Optional[int]): Maximum number of milliseconds a record waits for its batch to fill up.
+                Defaults to None.
+            batch_bytes (Optional[int]): Maximum size of a batch in bytes of JSON. Defaults to None.
+            workers (int): Number of worker processes, all bound to the port with SO_REUSEPORT so that the kernel
+                spreads the connections over them. Defaults to 1.
 
         Raises:
             Exception: If unable to start the WebSocket server.
         """
-        asyncio.run(self.__listen(host, port))
+        with self.listening(batch_size=batch_size, linger_ms=linger_ms, batch_bytes=batch_bytes):
+            asyncio.run(self.__listen(host, port, reuse_port=workers > 1))
@@ -13,13 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 import zmq
-from geniusrise import Spout, State, StreamingOutput
+from geniusrise import State, StreamingOutput
 from typing import Optional
 
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.decoders import get_codec
 
-class ZeroMQ(Spout):
+
+class ZeroMQ(Listener):
     def __init__(self, output: StreamingOutput, state: State, **kwargs):
         r"""
         Initialize the ZeroMQ class.
@@ -58,8 +60,7 @@ class ZeroMQ(Spout):
                         kafka_servers: "localhost:9094"
         ```
         """
-        super().__init__(output, state)
-        self.top_level_arguments = kwargs
+        super().__init__(output, state, **kwargs)
 
     def listen(
         self,
@@ -67,6 +68,10 @@ class ZeroMQ(Spout):
         topic: str,
         syntax: str,
         socket_type: Optional[str] = "SUB",
+        codec: str = "json",
+        queue_size: Optional[int] = None,
+        queue_policy: str = "block",
+        sink_workers: int = 1,
     ):
         """
         📖 Start listening for data from the ZeroMQ server.
@@ -76,10 +81,19 @@ class ZeroMQ(Spout):
             topic (str): The topic to subscribe to.
             syntax (str): The syntax to be used (e.g., "json").
             socket_type (Optional[str]): The type of ZeroMQ socket (default is "SUB").
+            codec (str): The codec to decode json messages with, one of "json", "orjson", "msgspec", "ujson" or
+                "auto". Defaults to "json".
+            queue_size (Optional[int]): Hand messages to sink worker threads through a queue of at most this many
+                messages, so that a slow output does not stall the reads. Defaults to None, which processes every
+                message on the receiving thread.
+            queue_policy (str): What to do when the queue is full, one of "block", "drop_oldest" or "drop_newest".
+                Defaults to "block".
+            sink_workers (int): Number of sink worker threads. Defaults to 1.
 
         Raises:
             Exception: If unable to connect to the ZeroMQ server or process messages.
         """
+        decode = get_codec(codec)
         context = zmq.Context()
 
         # Create a socket of the specified type
@@ -90,42 +104,24 @@ class ZeroMQ(Spout):
         else:
             raise ValueError(f"Unsupported socket type: {socket_type}")
 
-        try:
-            while True:
-                # Receive the message
-                message = socket.recv_string()
-
-                # Parse the message based on the syntax
-                if syntax == "json":
-                    data = json.loads(message.split(" ", 1)[1])
-                else:
-                    data = message
-
-                # Enrich the data with metadata about the topic and syntax
-                enriched_data = {
-                    "data": data,
-                    "topic": topic,
-                    "syntax": syntax,
-                }
-
-                # Use the output's save method
-                self.output.save(enriched_data)
-
-                # Update the state using the state
-                current_state = self.state.get_state(self.id) or {
-                    "success_count": 0,
-                    "failure_count": 0,
-                }
-                current_state["success_count"] += 1
-                self.state.set_state(self.id, current_state)
-
-        except Exception as e:
-            self.log.error(f"Error processing ZeroMQ message: {e}")
-
-            # Update the state using the state
-            current_state = self.state.get_state(self.id) or {
-                "success_count": 0,
-                "failure_count": 0,
-            }
-            current_state["failure_count"] += 1
-            self.state.set_state(self.id, current_state)
+        with self.listening(queue_size=queue_size, queue_policy=queue_policy, sink_workers=sink_workers):
+            try:
+                while True:
+                    # Receive the message
+                    message = socket.recv_string()
+
+                    # Parse the message based on the syntax
+                    if syntax == "json":
+                        data = message.split(" ", 1)[1]
+                        if decode:
+                            data = decode(data)
+                    else:
+                        data = message
+
+                    # Enrich the data with metadata about the topic and syntax
+                    self.process(data, {"topic": topic, "syntax": syntax})
+
+            except Exception as e:
+                self.log.error(f"Error processing ZeroMQ message: {e}")
+
+                self.counters.incr("failure_count")
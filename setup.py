@@ -9,7 +9,7 @@ with open("requirements.txt", "r", encoding="utf-8") as f:
 setup(
     name="geniusrise-listeners",
     version="0.1.7",
-    packages=find_packages(exclude=["tests", "tests.*"]),
+    packages=find_packages(exclude=["tests", "tests.*", "benchmarks", "benchmarks.*"]),
     install_requires=requirements,
     python_requires=">=3.10",
     author="ixaxaar",
@@ -38,5 +38,8 @@ setup(
     extras_require={
         "dev": ["check-manifest"],
         "test": ["coverage"],
+        "codecs": ["orjson", "msgspec", "ujson", "msgpack"],
+        "schemas": ["fastavro", "protobuf", "jsonschema"],
+        "uvloop": ["uvloop"],
     },
 )
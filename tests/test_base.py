@@ -0,0 +1,153 @@
+import json
+import threading
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock StreamingOutput."""
+    return mock.MagicMock(spec=StreamingOutput)
+
+
+@pytest.fixture
+def listener(mock_output):
+    """Fixture to create a listener with an in-memory state."""
+    return Listener(mock_output, InMemoryState(), arg1="value1")
+
+
+def test_listener_init(listener, mock_output):
+    """Test the initialization of the listener."""
+    assert listener.output == mock_output
+    assert listener.top_level_arguments == {"arg1": "value1"}
+    assert listener.decoder is None
+    assert listener.filters == []
+
+
+def test_process_saves_payload_as_is(listener, mock_output):
+    """Without stages the payload is saved along with its metadata."""
+    assert listener.process("hello", {"topic": "test"})
+    assert listener.process("world")
+
+    assert mock_output.save.call_args_list == [mock.call({"data": "hello", "topic": "test"}), mock.call("world")]
+    assert listener.counters.totals() == {"success_count": 2}
+
+
+def test_process_decodes_payload(listener, mock_output):
+    """The decoder runs before the record is built."""
+    listener.configure(decoder=json.loads)
+    listener.process('{"key": "value"}', {"topic": "test"})
+
+    mock_output.save.assert_called_once_with({"data": {"key": "value"}, "topic": "test"})
+
+
+def test_process_counts_failures(listener, mock_output):
+    """Messages that fail any stage are counted as failures and not saved."""
+    listener.configure(decoder=json.loads)
+
+    assert not listener.process("Not a JSON message")
+
+    mock_output.save.assert_not_called()
+    listener.counters.flush()
+    state = listener.state.get_state(listener.id)
+    assert state["success_count"] == 0
+    assert state["failure_count"] == 1
+
+
+def test_process_tells_rejects_from_failed_saves(listener, mock_output):
+    """Undecodable messages are rejected with None, messages that could not be saved return False."""
+    listener.configure(decoder=json.loads)
+    mock_output.save.side_effect = Exception("Output unavailable")
+
+    assert listener.process("Not a JSON message") is None
+    assert listener.process('{"key": "value"}') is False
+
+
+def test_process_filters_messages(listener, mock_output):
+    """Messages rejected by a filter are counted as filtered."""
+    listener.configure(filters=[lambda data: data["keep"]])
+
+    assert listener.process({"keep": True}) is True
+    assert listener.process({"keep": False}) is None
+
+    mock_output.save.assert_called_once_with({"keep": True})
+    assert listener.counters.totals() == {"success_count": 1, "filtered_count": 1}
+
+
+def test_process_uses_enricher_and_sink(listener, mock_output):
+    """A configured enricher builds the record and a configured sink saves it."""
+    sink = mock.MagicMock()
+    listener.configure(enricher=lambda data, metadata: {"value": data, **(metadata or {})}, sink=sink)
+
+    listener.process(1, {"topic": "test"})
+
+    sink.assert_called_once_with({"value": 1, "topic": "test"})
+    mock_output.save.assert_not_called()
+
+
+def test_configure_keeps_other_stages(listener):
+    """Stages that are not passed to configure are left as they are."""
+    listener.configure(decoder=json.loads)
+    listener.configure(filters=[bool])
+
+    assert listener.decoder is json.loads
+    assert listener.filters == [bool]
+
+
+def test_listening_flushes_counters(mock_output):
+    """Counters are flushed when the listening block exits, even on errors."""
+    state = InMemoryState()
+    listener = Listener(mock_output, state)
+    listener.counters.interval = 60
+    listener.process("first")
+
+    with pytest.raises(KeyboardInterrupt):
+        with listener.listening():
+            listener.process("second")
+            raise KeyboardInterrupt
+
+    assert state.get_state(listener.id)["success_count"] == 2
+
+
+def test_listening_batches_output(listener, mock_output):
+    """The output is batched inside the listening block when batching options are given."""
+    with listener.listening(batch_size=10):
+        listener.process("first")
+        listener.process("second")
+        mock_output.save_bulk.assert_not_called()
+
+    mock_output.save_bulk.assert_called_once_with(["first", "second"])
+    assert listener.output is mock_output
+
+
+def test_in_flight(listener, mock_output):
+    """Messages in the receive queue and records in the output batch are in flight."""
+    assert listener.in_flight == 0
+
+    with listener.listening(batch_size=10, linger_ms=60000):
+        listener.process("first")
+        listener.process("second")
+        assert listener.in_flight == 2
+
+    assert listener.in_flight == 0
+
+    saving, release = threading.Event(), threading.Event()
+
+    def save(data):
+        saving.set()
+        release.wait(5)
+
+    mock_output.save.side_effect = save
+    with listener.listening(queue_size=10):
+        listener.process("first")
+        saving.wait(5)
+        listener.process("second")
+        listener.process("third")
+        assert listener.in_flight == 2
+        release.set()
+
+    assert listener.queue is None
@@ -0,0 +1,165 @@
+import time
+from unittest import mock
+
+import pytest
+from geniusrise import State, StreamingOutput
+
+from geniusrise_listeners.batching import BatchingOutput, batching
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock StreamingOutput."""
+    return mock.MagicMock(spec=StreamingOutput)
+
+
+def test_batch_is_sent_when_full(mock_output):
+    """A batch is sent with save_bulk once it holds batch_size records."""
+    output = BatchingOutput(mock_output, batch_size=3, linger_ms=60000)
+    for i in range(7):
+        output.save({"i": i})
+
+    assert mock_output.save_bulk.call_args_list == [
+        mock.call([{"i": 0}, {"i": 1}, {"i": 2}]),
+        mock.call([{"i": 3}, {"i": 4}, {"i": 5}]),
+    ]
+    mock_output.save.assert_not_called()
+    output.close()
+
+
+def test_batch_is_sent_when_bytes_exceeded(mock_output):
+    """A batch is sent once it holds batch_bytes bytes of JSON."""
+    output = BatchingOutput(mock_output, batch_size=1000, linger_ms=60000, batch_bytes=30)
+    output.save({"data": "0123456789"})
+    mock_output.save_bulk.assert_not_called()
+
+    output.save({"data": "0123456789"})
+    mock_output.save_bulk.assert_called_once()
+    output.close()
+
+
+def test_lingering_batch_is_sent(mock_output):
+    """A batch that does not fill up is sent after linger_ms."""
+    output = BatchingOutput(mock_output, batch_size=1000, linger_ms=50)
+    output.save({"key": "value"})
+
+    time.sleep(0.3)
+
+    mock_output.save_bulk.assert_called_once_with([{"key": "value"}])
+    output.close()
+
+
+def test_close_sends_pending_records(mock_output):
+    """Closing sends whatever is buffered and flushes the output."""
+    output = BatchingOutput(mock_output, batch_size=1000, linger_ms=60000)
+    output.save({"key": "value"})
+    output.close()
+
+    mock_output.save_bulk.assert_called_once_with([{"key": "value"}])
+    mock_output.flush.assert_called_once()
+
+
+def test_output_without_save_bulk():
+    """Outputs without save_bulk get one save per record."""
+    plain_output = mock.MagicMock(spec=["save", "flush"])
+    output = BatchingOutput(plain_output, batch_size=2, linger_ms=60000)
+    output.save({"i": 0})
+    output.save({"i": 1})
+
+    assert plain_output.save.call_args_list == [mock.call({"i": 0}), mock.call({"i": 1})]
+    output.close()
+
+
+def test_failed_batch_is_counted(mock_output):
+    """Records of a batch that could not be sent are counted as dropped."""
+    counters = mock.MagicMock()
+    mock_output.save_bulk.side_effect = Exception("Broker not available")
+
+    output = BatchingOutput(mock_output, batch_size=2, linger_ms=60000, counters=counters)
+    output.save({"i": 0})
+    output.save({"i": 1})
+
+    counters.incr.assert_called_once_with("dropped_count", 2)
+    assert output.dropped == 2
+    output.close()
+
+
+def test_tracked_records_are_acknowledged_once_sent(mock_output):
+    """The tokens of the records of a batch are passed to on_sent once it is sent, and never if it fails."""
+    sent = []
+    output = BatchingOutput(mock_output, batch_size=2, linger_ms=60000, on_sent=sent.append)
+    with output.tracking("a"):
+        output.save({"i": 0})
+    output.save({"i": 1})
+    assert sent == [["a"]]
+
+    mock_output.save_bulk.side_effect = Exception("Broker not available")
+    with output.tracking("b"):
+        output.save({"i": 2})
+    with output.tracking("c"):
+        output.save({"i": 3})
+    assert sent == [["a"]]
+
+    mock_output.save_bulk.side_effect = None
+    with output.tracking("d"):
+        output.save({"i": 4})
+    output.close()
+    assert sent == [["a"], ["d"]]
+
+
+def test_batching_context_wraps_and_restores_output(mock_output):
+    """The batching context puts a BatchingOutput in front of the spout's output for its duration."""
+    spout = mock.MagicMock()
+    spout.output = mock_output
+
+    with batching(spout, batch_size=10):
+        assert isinstance(spout.output, BatchingOutput)
+        spout.output.save({"key": "value"})
+        mock_output.save_bulk.assert_not_called()
+
+    assert spout.output is mock_output
+    mock_output.save_bulk.assert_called_once_with([{"key": "value"}])
+
+
+def test_batching_context_is_a_no_op_by_default(mock_output):
+    """Without batching options the spout's output is left alone."""
+    spout = mock.MagicMock()
+    spout.output = mock_output
+
+    with batching(spout):
+        assert spout.output is mock_output
+
+
+def test_udp_listen_with_batching(mock_output):
+    """Udp saves datagrams in batches when batch_size is given."""
+    from threading import Thread
+
+    from geniusrise_listeners.udp import Udp
+
+    udp = Udp(mock_output, mock.MagicMock(spec=State))
+    mock_socket = mock.MagicMock()
+    datagrams = [(b"a", ("localhost", 1)), (b"b", ("localhost", 1))]
+
+    def side_effect(buffer, *args, **kwargs):
+        if datagrams:
+            data, addr = datagrams.pop(0)
+            buffer[: len(data)] = data
+            return len(data), addr
+        raise KeyboardInterrupt
+
+    mock_socket.recvfrom_into.side_effect = side_effect
+
+    with mock.patch("socket.socket") as mock_socket_constructor:
+        mock_socket_constructor.return_value.__enter__.return_value = mock_socket
+        t = Thread(target=udp.listen, kwargs={"batch_size": 10})
+        t.start()
+        t.join(timeout=2)
+
+    mock_output.save.assert_not_called()
+    mock_output.save_bulk.assert_called_once_with(
+        [
+            {"data": "a", "sender_address": "localhost", "sender_port": 1},
+            {"data": "b", "sender_address": "localhost", "sender_port": 1},
+        ]
+    )
+    assert udp.output is mock_output
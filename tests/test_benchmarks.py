@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.__main__ import parse_options
+from benchmarks.harness import make_payload, seq_of
+from benchmarks.formats import measure_format
+from benchmarks.imports import BUDGETS, measure_import
+from benchmarks.scenarios import run
+
+
+def test_payload_size_and_sequence_number():
+    """Payloads have the requested size and carry their sequence number through listener envelopes."""
+    payload = make_payload(42, 256)
+
+    assert len(payload) == 256
+    assert seq_of(payload) == 42
+    assert seq_of({"data": payload.decode(), "topic": "test"}) == 42
+    assert seq_of({"data": {"MessageId": "1", "Body": payload.decode()}}) == 42
+
+
+def test_parse_options():
+    """Listener options are parsed as JSON where possible."""
+    assert parse_options(["queue_size=100", "queue_policy=drop_oldest", "codec=raw"]) == {
+        "queue_size": 100,
+        "queue_policy": "drop_oldest",
+        "codec": "raw",
+    }
+
+
+@pytest.mark.parametrize("name", ["udp", "kafka", "sqs"])
+def test_benchmark_smoke(name):
+    """Every message sent by the load generator is measured at the output."""
+    result = run(name, rate=500, size=128, duration=0.3)
+
+    assert result.sent > 0
+    assert result.received == result.sent
+    assert result.send_errors == 0
+    assert result.p50_ms <= result.p99_ms
+
+
+@pytest.mark.parametrize("name", sorted(BUDGETS))
+def test_imports_no_transport_clients(name):
+    """The package and the Udp listener import without any transport's client library, see make benchmark-imports."""
+    result = measure_import(name, runs=1)
+
+    assert result.transports == []
+
+
+@pytest.mark.parametrize("name", ["statsd", "syslog", "influx"])
+def test_format_benchmark_smoke(name):
+    """Every parser accepts its samples, rejects the malformed datagrams and is timed."""
+    result = measure_format(name, count=100)
+
+    assert result.parsed_per_second > 0
+    assert result.rejected_per_second > 0
@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, State
+
+from geniusrise_listeners.counters import StateCounter
+
+
+@pytest.fixture
+def ims_state():
+    """Fixture to create an in-memory state for the tests."""
+    return InMemoryState()
+
+
+@pytest.fixture
+def mock_state():
+    """Fixture to mock State object."""
+    return mock.MagicMock(spec=State)
+
+
+def test_first_increment_is_written_immediately(ims_state):
+    """The first increment is flushed right away so that idle listeners show up in the state."""
+    counters = StateCounter(ims_state, "spout")
+    counters.incr("success_count")
+
+    state = ims_state.get_state("spout")
+    assert state["success_count"] == 1
+    assert state["failure_count"] == 0
+
+
+def test_increments_are_coalesced(mock_state):
+    """Increments within the flush interval only hit the state once flushed."""
+    state_data = {"success_count": 0, "failure_count": 0}
+    mock_state.get_state.return_value = state_data
+
+    counters = StateCounter(mock_state, "spout", interval=60)
+    for _ in range(1000):
+        counters.incr("success_count")
+    counters.incr("failure_count")
+
+    assert mock_state.set_state.call_count == 1
+    assert state_data["success_count"] == 1
+
+    counters.flush()
+
+    assert mock_state.set_state.call_count == 2
+    assert state_data == {"success_count": 1000, "failure_count": 1}
+
+
+def test_max_pending_forces_a_flush(mock_state):
+    """A flush is forced after max_pending increments even within the interval."""
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    counters = StateCounter(mock_state, "spout", interval=60, max_pending=10)
+    for _ in range(21):
+        counters.incr("success_count")
+
+    assert mock_state.set_state.call_count == 3
+
+
+def test_flush_without_changes_does_not_touch_state(mock_state):
+    """Flushing with nothing pending does not read or write the state."""
+    counters = StateCounter(mock_state, "spout")
+    counters.flush()
+
+    mock_state.get_state.assert_not_called()
+    mock_state.set_state.assert_not_called()
+
+
+def test_set_is_written_with_counters(ims_state):
+    """Values set on the counter are written as-is along with the counters."""
+    counters = StateCounter(ims_state, "spout", interval=60)
+    counters.set("last_id", "1-0")
+    counters.incr("success_count")
+
+    state = ims_state.get_state("spout")
+    assert state["success_count"] == 1
+    assert state["last_id"] == "1-0"
+
+
+def test_existing_state_is_preserved(ims_state):
+    """Counters are added on top of whatever is already in the state."""
+    ims_state.set_state("spout", {"success_count": 5, "failure_count": 2, "last_id": "0"})
+
+    counters = StateCounter(ims_state, "spout")
+    counters.incr("failure_count")
+
+    state = ims_state.get_state("spout")
+    assert state["success_count"] == 5
+    assert state["failure_count"] == 3
+    assert state["last_id"] == "0"
+
+
+def test_increments_from_many_threads(ims_state):
+    """Per thread shards are summed up on flush without losing increments."""
+    counters = StateCounter(ims_state, "spout", interval=60)
+
+    def work():
+        for _ in range(10000):
+            counters.incr("success_count")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counters.close()
+
+    assert counters.totals() == {"success_count": 40000}
+    assert ims_state.get_state("spout")["success_count"] == 40000
+
+
+def test_failed_flush_is_retried(mock_state):
+    """Counters that could not be written are carried over to the next flush."""
+    mock_state.get_state.side_effect = lambda key: {"success_count": 0, "failure_count": 0}
+    mock_state.set_state.side_effect = [Exception("Connection refused"), None]
+
+    counters = StateCounter(mock_state, "spout", interval=60)
+    counters.incr("success_count")
+    counters.flush()
+
+    assert mock_state.set_state.call_count == 2
+    assert mock_state.set_state.call_args[0][1]["success_count"] == 1
+
+
+def test_background_timer_flushes_idle_counters(ims_state):
+    """Counters left pending by a now idle listener are flushed by the timer."""
+    counters = StateCounter(ims_state, "spout", interval=0.1)
+    counters.incr("success_count")
+    counters.incr("success_count")
+
+    time.sleep(0.5)
+
+    assert ims_state.get_state("spout")["success_count"] == 2
+    counters.close()
@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.decoders import CODECS, get_codec, register_codec, wrap_bytes
+
+PAYLOADS = ['{"key": "value"}', b'{"key": "value"}', bytearray(b'{"key": "value"}'), memoryview(b'{"key": "value"}')]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("codec", ["json", "orjson", "msgspec", "ujson", "auto"])
+def test_json_codecs_accept_any_buffer(codec, payload):
+    """JSON codecs decode str, bytes, bytearray and memoryview payloads, falling back to json if not installed."""
+    assert get_codec(codec)(payload) == {"key": "value"}
+
+
+def test_msgpack_codec():
+    """The msgpack codec decodes MessagePack payloads."""
+    msgpack = pytest.importorskip("msgpack")
+    payload = msgpack.packb({"key": "value"})
+
+    assert get_codec("msgpack")(payload) == {"key": "value"}
+    assert get_codec("msgpack")(memoryview(payload)) == {"key": "value"}
+
+
+def test_raw_codec_has_no_decoder():
+    """The raw codec does not decode at all."""
+    assert get_codec("raw") is None
+
+
+def test_missing_codec_falls_back_to_json():
+    """A JSON codec whose package is not installed falls back to the standard library."""
+
+    def missing():
+        raise ImportError("No module named 'orjson'")
+
+    with mock.patch.dict(CODECS, {"orjson": missing}):
+        decode = get_codec("orjson")
+
+    with mock.patch("json.loads", return_value={"patched": True}):
+        assert decode("{}") == {"patched": True}
+
+
+def test_missing_codec_without_fallback_raises():
+    """Codecs without a fallback raise ImportError if their package is not installed."""
+
+    def missing():
+        raise ImportError("No module named 'msgpack'")
+
+    with mock.patch.dict(CODECS, {"msgpack": missing}):
+        with pytest.raises(ImportError):
+            get_codec("msgpack")
+
+
+def test_unknown_codec():
+    """Unknown codec names are rejected."""
+    with pytest.raises(ValueError, match="Unknown codec"):
+        get_codec("yaml")
+
+
+def test_register_codec():
+    """Registered codecs can be selected by name."""
+    with mock.patch.dict(CODECS):
+        register_codec("upper", lambda: lambda payload: payload.upper())
+        assert get_codec("upper")("abc") == "ABC"
+
+
+class JSONOutput:
+    """Saves records as JSON, like StreamingOutput."""
+
+    def __init__(self):
+        self.saved = []
+
+    def save(self, data, filename=None):
+        self.saved.append(json.dumps(data))
+
+
+def test_listener_use_codec():
+    """Listeners decode payloads with the selected codec, and pass them through with the raw codec."""
+    output = mock.MagicMock(spec=StreamingOutput)
+    output.accepts_bytes = True
+    listener = Listener(output, InMemoryState())
+
+    listener.use_codec("json")
+    listener.process(b'{"key": "value"}', {"topic": "test"})
+    listener.use_codec("raw")
+    listener.process(b'{"key": "value"}', {"topic": "test"})
+
+    assert output.save.call_args_list == [
+        mock.call({"data": {"key": "value"}, "topic": "test"}),
+        mock.call({"data": b'{"key": "value"}', "topic": "test"}),
+    ]
+    assert listener.decoder is None
+
+
+def test_raw_codec_wraps_bytes_for_json_outputs():
+    """The raw codec wraps bytes as base64 for outputs that save JSON, and passes other payloads through."""
+    output = JSONOutput()
+    listener = Listener(output, InMemoryState())
+
+    listener.use_codec("raw")
+    assert listener.process(b"\xff\x00", {"topic": "test"})
+    assert listener.process(memoryview(b"caf\xc3\xa9"), {"topic": "test"})
+    assert listener.process("text", {"topic": "test"})
+
+    assert [json.loads(record)["data"] for record in output.saved] == [
+        {"base64": "/wA="},
+        {"base64": "Y2Fmw6k="},
+        "text",
+    ]
+    assert listener.decoder is wrap_bytes
+
+
+def test_json_codec_matches_stdlib():
+    """The json codec is the standard library's json.loads."""
+    assert get_codec("json")('[1, 2.5, "a", null]') == json.loads('[1, 2.5, "a", null]')
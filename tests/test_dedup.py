@@ -0,0 +1,132 @@
+import json
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+from prometheus_client import REGISTRY
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.dedup import BloomFilter, DedupCache, payload_key
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock StreamingOutput."""
+    return mock.MagicMock(spec=StreamingOutput)
+
+
+def test_payload_key():
+    """Equal payloads have equal keys, whatever their type."""
+    assert payload_key(b"hello") == payload_key("hello") == payload_key(memoryview(b"hello"))
+    assert payload_key(b"hello") != payload_key(b"world")
+    assert payload_key({"a": 1, "b": 2}) == payload_key({"b": 2, "a": 1})
+    assert len(payload_key(b"hello")) == 16
+
+
+def test_bloom_filter():
+    """A Bloom filter never forgets a key, and rarely remembers one it never saw."""
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(i)
+
+    assert all(i in bloom for i in range(1000))
+    assert sum(i in bloom for i in range(1000, 11000)) < 300
+
+
+def test_cache_remembers_added_keys():
+    """Only added keys are seen."""
+    cache = DedupCache()
+
+    assert not cache.seen("a")
+    cache.add("a")
+    assert cache.seen("a")
+    assert not cache.seen("b")
+
+
+def test_cache_evicts_least_recently_seen():
+    """The LRU keeps at most max_size keys, the least recently seen go first."""
+    cache = DedupCache(max_size=2)
+    cache.add("a")
+    cache.add("b")
+    assert cache.seen("a")
+    cache.add("c")
+
+    assert len(cache) == 2
+    assert cache.seen("a")
+    assert not cache.seen("b")
+
+
+def test_cache_expires_keys():
+    """Keys are forgotten ttl seconds after they were added."""
+    cache = DedupCache(ttl=10)
+    with mock.patch("geniusrise_listeners.dedup.time.monotonic", return_value=100.0):
+        cache.add("a")
+    with mock.patch("geniusrise_listeners.dedup.time.monotonic", return_value=109.0):
+        assert cache.seen("a")
+    with mock.patch("geniusrise_listeners.dedup.time.monotonic", return_value=111.0):
+        assert not cache.seen("a")
+        cache.add("b")
+    assert len(cache) == 1
+
+
+def test_cache_bloom_remembers_evicted_keys():
+    """Keys evicted from the LRU are still seen through the Bloom filter, across one rotation."""
+    cache = DedupCache(max_size=1, bloom_capacity=10)
+    for i in range(15):
+        cache.add(i)
+
+    assert len(cache) == 1
+    assert all(cache.seen(i) for i in range(15))
+
+
+def test_listener_skips_duplicates(mock_output):
+    """Duplicates are skipped and counted, as hits, other messages as misses."""
+    listener = Listener(mock_output, InMemoryState())
+    listener.enable_dedup()
+
+    assert listener.process("hello")
+    assert listener.process("hello")
+    assert listener.process("other", {"id": "1"}, key="1")
+    assert listener.process("different payload, same key", {"id": "1"}, key="1")
+
+    assert mock_output.save.call_args_list == [mock.call("hello"), mock.call({"data": "other", "id": "1"})]
+    assert listener.counters.totals() == {"success_count": 2, "dedup_hit_count": 2, "dedup_miss_count": 2}
+
+
+def test_listener_retries_failed_messages(mock_output):
+    """A message that failed is not remembered, so its redelivery is processed."""
+    listener = Listener(mock_output, InMemoryState())
+    listener.enable_dedup()
+    listener.configure(decoder=json.loads)
+    mock_output.save.side_effect = [Exception("Output unavailable"), None]
+
+    assert not listener.process('{"key": "value"}')
+    assert listener.process('{"key": "value"}')
+
+    assert mock_output.save.call_count == 2
+    assert listener.counters.totals() == {"success_count": 1, "failure_count": 1, "dedup_miss_count": 2}
+
+
+def test_listener_dedup_from_kwargs(mock_output):
+    """Deduplication is enabled by the dedup keyword arguments."""
+    assert Listener(mock_output, InMemoryState()).dedup is None
+
+    listener = Listener(mock_output, InMemoryState(), dedup_size=10, dedup_ttl=60, dedup_bloom=1000)
+    assert listener.dedup.max_size == 10
+    assert listener.dedup.ttl == 60
+    assert listener.dedup.bloom_capacity == 1000
+
+
+def test_dedup_metrics(mock_output):
+    """Hits and misses are exported with the metrics."""
+    listener = Listener(mock_output, InMemoryState(), dedup=True)
+    listener.enable_metrics()
+    labels = {"listener": "Listener", "id": listener.id}
+
+    listener.process(b"hello")
+    listener.process(b"hello")
+    listener.process(b"world")
+
+    assert REGISTRY.get_sample_value("geniusrise_listener_dedup_lookups_total", {"result": "hit", **labels}) == 1
+    assert REGISTRY.get_sample_value("geniusrise_listener_dedup_lookups_total", {"result": "miss", **labels}) == 2
+    assert mock_output.save.call_count == 2
@@ -0,0 +1,108 @@
+import pytest
+
+from geniusrise_listeners.formats import get_format, parse_influx, parse_statsd, parse_syslog, parsed
+
+
+def test_parse_statsd():
+    """Every metric of a packet is parsed, with its sample rate and tags."""
+    assert parse_statsd(b"requests:1|c|@0.5|#region:eu,az:1\nusers:bob|s\nqueue:-3|g") == [
+        {"name": "requests", "value": 1.0, "type": "c", "sample_rate": 0.5, "tags": {"region": "eu", "az": "1"}},
+        {"name": "users", "value": "bob", "type": "s", "sample_rate": 1.0, "tags": None},
+        {"name": "queue", "value": -3.0, "type": "g", "sample_rate": 1.0, "tags": None, "delta": True},
+    ]
+
+
+@pytest.mark.parametrize("packet", [b"", b"requests", b"requests:1", b"requests:x|c", b"requests:1|x", b"\xff|c"])
+def test_parse_statsd_malformed(packet):
+    """Malformed statsd packets are rejected."""
+    assert parse_statsd(packet) is None
+
+
+def test_parse_syslog():
+    """RFC 5424 messages are parsed with their structured data."""
+    message = (
+        b'<165>1 2003-10-11T22:14:15.003Z host.example.com evntslog - ID47 [exampleSDID@32473 iut="3" '
+        b'eventSource="App\\"lication\\]"][examplePriority@32473 class="high"] \xef\xbb\xbfAn event'
+    )
+
+    assert parse_syslog(memoryview(message)) == {
+        "facility": 20,
+        "severity": 5,
+        "version": 1,
+        "timestamp": "2003-10-11T22:14:15.003Z",
+        "hostname": "host.example.com",
+        "app_name": "evntslog",
+        "procid": None,
+        "msgid": "ID47",
+        "structured_data": {
+            "exampleSDID@32473": {"iut": "3", "eventSource": 'App"lication]'},
+            "examplePriority@32473": {"class": "high"},
+        },
+        "message": "An event",
+    }
+
+
+def test_parse_syslog_without_structured_data_or_message():
+    """Nil structured data and a missing message are None."""
+    record = parse_syslog("<34>1 - - - - - -")
+
+    assert record["structured_data"] is None
+    assert record["message"] is None
+    assert parse_syslog("<34>1 - host su - - - failed")["message"] == "failed"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "",
+        "hello",
+        "<192>1 - - - - - -",
+        "<34>1 - - - - -",
+        "<34>x - - - - - -",
+        "<34>1 - - - - - [id",
+        "<34>1 - - - - - -x",
+    ],
+)
+def test_parse_syslog_malformed(message):
+    """Malformed syslog messages are rejected."""
+    assert parse_syslog(message) is None
+
+
+def test_parse_influx():
+    """Line protocol points are parsed with typed fields."""
+    lines = b'cpu,host=a usage=0.5,cores=4i,up=t,note="x y" 1700000000000000000\n# comment\nmem free=1u'
+
+    assert parse_influx(lines) == [
+        {
+            "measurement": "cpu",
+            "tags": {"host": "a"},
+            "fields": {"usage": 0.5, "cores": 4, "up": True, "note": "x y"},
+            "timestamp": 1700000000000000000,
+        },
+        {"measurement": "mem", "tags": {}, "fields": {"free": 1}, "timestamp": None},
+    ]
+
+
+def test_parse_influx_escapes():
+    """Escaped spaces, commas and equal signs, and quotes in strings, are unescaped."""
+    [point] = parse_influx(r'my\ cpu,tag\,k=v\ 1 field\=k="say \"hi\", x=1",f=1')
+
+    assert point["measurement"] == "my cpu"
+    assert point["tags"] == {"tag,k": "v 1"}
+    assert point["fields"] == {"field=k": 'say "hi", x=1', "f": 1.0}
+
+
+@pytest.mark.parametrize(
+    "line", ["", "cpu", "cpu usage", "cpu,host usage=1", "cpu usage=x", 'cpu note="x', "cpu a=1 ts"]
+)
+def test_parse_influx_malformed(line):
+    """Malformed lines are rejected."""
+    assert parse_influx(line) is None
+
+
+def test_get_format():
+    """Formats are looked up by name, and rejected packets are filtered out."""
+    assert get_format("statsd") is parse_statsd
+    with pytest.raises(ValueError, match="Unknown format"):
+        get_format("csv")
+    assert parsed([]) and not parsed(None)
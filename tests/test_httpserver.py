@@ -0,0 +1,214 @@
+import asyncio
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+from geniusrise_listeners.httpserver import AsyncHTTPServer, HTTPRequest
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def serve():
+    """Start servers on a background event loop, and stop them after the test."""
+    servers = []
+
+    def start(handler, **kwargs):
+        server = AsyncHTTPServer(handler, host="127.0.0.1", port=_free_port(), **kwargs)
+        thread = threading.Thread(target=asyncio.run, args=(server.serve(),))
+        thread.start()
+        servers.append((server, thread))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", server.port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.01)
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.stop()
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+def _exchange(port, data):
+    """Send raw bytes and read until the server closes the connection."""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as s:
+        s.sendall(data)
+        received = b""
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                return received
+            received += chunk
+
+
+def test_keep_alive(serve):
+    """Several requests are served on one connection."""
+    requests = []
+    server = serve(lambda request: (requests.append(request) or 200, "ok"))
+
+    connection = http.client.HTTPConnection("127.0.0.1", server.port)
+    for i in range(3):
+        connection.request("POST", f"/hook?i={i}", body=b'{"i": 1}', headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        assert (response.status, response.read()) == (200, b"ok")
+        assert response.getheader("Connection") == "keep-alive"
+    connection.close()
+
+    assert [request.path for request in requests] == ["/hook"] * 3
+    assert [request.query for request in requests] == ["i=0", "i=1", "i=2"]
+    assert requests[0].headers["Content-Type"] == "application/json"
+    assert requests[0].body == b'{"i": 1}'
+
+
+def test_pipelining_and_chunked_bodies(serve):
+    """Pipelined requests are answered in order, and chunked bodies are joined."""
+    bodies = []
+    server = serve(lambda request: (200, bodies.append(request.body) or request.path))
+
+    received = _exchange(
+        server.port,
+        b"POST /first HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello"
+        b"POST /second HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        b"3\r\nwor\r\n2;ext=1\r\nld\r\n0\r\n\r\n",
+    )
+
+    assert bodies == [b"hello", b"world"]
+    assert received.index(b"/first") < received.index(b"/second")
+    assert received.count(b"HTTP/1.1 200 OK") == 2
+    assert received.endswith(b"Connection: close\r\n\r\n/second")
+
+
+def test_http_1_0_closes(serve):
+    """HTTP/1.0 connections are closed after the response unless kept alive."""
+    server = serve(lambda request: (200, ""))
+
+    received = _exchange(server.port, b"GET / HTTP/1.0\r\n\r\n")
+
+    assert received.startswith(b"HTTP/1.1 200 OK")
+
+
+def test_malformed_requests(serve):
+    """Malformed and oversized requests are refused and the connection closed."""
+    server = serve(lambda request: (200, ""), max_body_bytes=10)
+
+    assert _exchange(server.port, b"nonsense\r\n\r\n").startswith(b"HTTP/1.1 400 Bad Request")
+    assert _exchange(server.port, b"GET / HTTP/2.0\r\n\r\n").startswith(b"HTTP/1.1 505")
+    assert _exchange(server.port, b"POST / HTTP/1.1\r\nContent-Length: 11\r\n\r\n").startswith(b"HTTP/1.1 413")
+    chunked = b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+    assert _exchange(server.port, chunked + b"-5\r\nhello\r\n0\r\n\r\n").startswith(b"HTTP/1.1 400")
+    assert _exchange(server.port, chunked + b"1" * 70000 + b"\r\n").startswith(b"HTTP/1.1 400")
+
+
+def test_slow_bodies_time_out(serve):
+    """A body that does not arrive in time is answered with 408, without taking a handler slot."""
+    handled = []
+    server = serve(lambda request: (handled.append(request) or 200, ""), max_concurrency=1, request_timeout=0.2)
+
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as slow:
+        slow.sendall(b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc")
+        # The slot is free for other requests while the slow body is read
+        connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+        connection.request("POST", "/", body=b"{}")
+        assert connection.getresponse().status == 200
+        connection.close()
+        assert slow.recv(65536).startswith(b"HTTP/1.1 408")
+    assert len(handled) == 1
+
+
+def test_stop_does_not_wait_for_stalled_bodies(serve):
+    """Stopping the server waits for the bodies being read no longer than the request timeout."""
+    server = serve(lambda request: (200, ""), request_timeout=0.5)
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as s:
+        s.sendall(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nab")
+        time.sleep(0.1)
+        start = time.monotonic()
+        server.stop()
+        s.recv(65536)
+        assert time.monotonic() - start < 2
+
+
+def test_handler_errors(serve):
+    """A failing handler is answered with 500 and the connection stays usable."""
+
+    def handler(request):
+        if request.path == "/fail":
+            raise RuntimeError("boom")
+        return 201, "created"
+
+    server = serve(handler)
+    connection = http.client.HTTPConnection("127.0.0.1", server.port)
+    connection.request("GET", "/fail")
+    assert connection.getresponse().read() == b"Internal Server Error"
+    connection.request("GET", "/")
+    response = connection.getresponse()
+    assert (response.status, response.read()) == (201, b"created")
+    connection.close()
+
+
+def test_max_concurrency(serve):
+    """No more than max_concurrency requests are handled at once."""
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def handler(request):
+        with lock:
+            active.append(request)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(request)
+        return 200, ""
+
+    server = serve(handler, max_concurrency=2)
+
+    def post():
+        connection = http.client.HTTPConnection("127.0.0.1", server.port)
+        connection.request("POST", "/", body=b"{}")
+        assert connection.getresponse().status == 200
+        connection.close()
+
+    threads = [threading.Thread(target=post) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(peak) == 6
+    assert max(peak) == 2
+
+
+def test_stop_closes_idle_connections(serve):
+    """Stopping the server closes the connections waiting for a request."""
+    server = serve(lambda request: (200, ""))
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as s:
+        s.sendall(b"GET / HTTP/1.1\r\nHost: x\r\n\r\n")
+        assert s.recv(65536).startswith(b"HTTP/1.1 200 OK")
+        server.stop()
+        assert s.recv(65536) == b""
+
+
+def test_request_keep_alive():
+    """Connections are kept alive by default from HTTP/1.1 on, and on request before."""
+    assert HTTPRequest("GET", "/", "HTTP/1.1", {}).keep_alive
+    assert not HTTPRequest("GET", "/", "HTTP/1.1", {"Connection": "close"}).keep_alive
+    assert not HTTPRequest("GET", "/", "HTTP/1.0", {}).keep_alive
+    assert HTTPRequest("GET", "/", "HTTP/1.0", {"Connection": "Keep-Alive"}).keep_alive
+
+
+def test_max_concurrency_must_be_positive():
+    """A server must handle at least one request at a time."""
+    with pytest.raises(ValueError, match="max_concurrency"):
+        AsyncHTTPServer(lambda request: (200, ""), max_concurrency=0)
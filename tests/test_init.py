@@ -0,0 +1,51 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import geniusrise_listeners
+
+
+def imported_after(statement):
+    """Run a statement in a fresh interpreter and list the geniusrise_listeners modules it imported."""
+    code = (
+        "import json, sys\n"
+        f"{statement}\n"
+        "print(json.dumps(sorted(m for m in sys.modules if m.startswith('geniusrise_listeners'))))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_package_import_is_lazy():
+    """Importing the package imports none of the listeners."""
+    assert imported_after("import geniusrise_listeners") == ["geniusrise_listeners"]
+
+
+def test_listener_imports_only_its_module():
+    """Importing a listener imports its own module and the shared ones, not the other listeners."""
+    modules = imported_after("from geniusrise_listeners import Udp")
+
+    assert "geniusrise_listeners.udp" in modules
+    assert "geniusrise_listeners.kafka" not in modules
+    assert "geniusrise_listeners.webhook" not in modules
+
+
+def test_listener_is_cached():
+    """Listeners are the classes of their modules, and are looked up only once."""
+    from geniusrise_listeners.udp import Udp
+
+    assert geniusrise_listeners.Udp is Udp
+    assert vars(geniusrise_listeners)["Udp"] is Udp
+
+
+def test_unknown_attribute():
+    """Anything else is still an AttributeError."""
+    with pytest.raises(AttributeError):
+        geniusrise_listeners.NotAListener
+
+
+def test_dir_lists_listeners():
+    """dir() lists the exported listeners before they are imported."""
+    assert set(geniusrise_listeners.__all__) <= set(dir(geniusrise_listeners))
@@ -1,10 +1,12 @@
 # Required imports for testing
 import pytest
+import io
 import json
 import time
 from threading import Thread
 from unittest import mock
-from confluent_kafka import KafkaError
+from confluent_kafka import TIMESTAMP_CREATE_TIME, KafkaError, TopicPartition
+from prometheus_client import REGISTRY
 from geniusrise import State, StreamingOutput
 from geniusrise_listeners.kafka import Kafka
 
@@ -76,9 +78,7 @@ def test_kafka_listen_successful_data_processing(mock_output, mock_state):
         t = Thread(target=kafka_spout.listen, args=("test_topic", "test_group"))
         t.start()
         time.sleep(1)  # Give some time for the thread to process data
-        t.join(
-            timeout=2
-        )  # Join the thread, but move on after 2 seconds if not finished
+        t.join(timeout=2)  # Join the thread, but move on after 2 seconds if not finished
 
         # Assert if the message data was saved correctly
         mock_output.save.assert_called_with({"data": "test_data"})
@@ -157,9 +157,7 @@ def test_kafka_listen_multiple_messages(mock_output, mock_state):
 
     def poll_side_effect(*args, **kwargs):
         if mock_consumer.poll.call_count <= len(mock_messages):
-            mock_message.value.return_value = json.dumps(
-                mock_messages[mock_consumer.poll.call_count - 1]
-            ).encode()
+            mock_message.value.return_value = json.dumps(mock_messages[mock_consumer.poll.call_count - 1]).encode()
             mock_message.error.return_value = None
             return mock_message
         raise KeyboardInterrupt
@@ -174,3 +172,445 @@ def test_kafka_listen_multiple_messages(mock_output, mock_state):
 
         assert mock_output.save.call_count == 3
         assert mock_state_data["success_count"] == 3
+
+
+def test_kafka_listen_consumes_batches(mock_output, mock_state):
+    """With num_messages, messages are consumed and sent to the output in batches."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+
+    mock_state_data = {"success_count": 0, "failure_count": 0}
+    mock_state.get_state.return_value = mock_state_data
+
+    messages = []
+    for i in range(3):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"data": i}).encode()
+        message.error.return_value = None
+        messages.append(message)
+    mock_consumer.consume.side_effect = [messages, KeyboardInterrupt]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", num_messages=100, timeout=0.5)
+
+    mock_consumer.consume.assert_called_with(num_messages=100, timeout=0.5)
+    mock_consumer.poll.assert_not_called()
+    mock_output.save_bulk.assert_called_once_with([{"data": 0}, {"data": 1}, {"data": 2}])
+    assert mock_state_data["success_count"] == 3
+
+
+def test_kafka_listen_at_least_once(mock_output, mock_state):
+    """With at_least_once, offsets are committed after their messages are handled and the output is flushed."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    messages = []
+    for offset in range(3):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"data": offset}).encode()
+        message.error.return_value = None
+        message.topic.return_value = "test_topic"
+        message.partition.return_value = 0
+        message.offset.return_value = offset
+        messages.append(message)
+    mock_consumer.poll.side_effect = [*messages, KeyboardInterrupt]
+
+    calls = mock.MagicMock()
+    calls.attach_mock(mock_output.flush, "flush")
+    calls.attach_mock(mock_consumer.commit, "commit")
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer) as consumer_class:
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", at_least_once=True, commit_every=2)
+
+    assert consumer_class.call_args[0][0]["enable.auto.commit"] is False
+    assert [c[0] for c in calls.mock_calls] == ["flush", "commit", "flush", "commit"]
+    first, last = mock_consumer.commit.call_args_list
+    assert [(tp.topic, tp.partition, tp.offset) for tp in first.kwargs["offsets"]] == [("test_topic", 0, 2)]
+    assert first.kwargs["asynchronous"] is True
+    assert [(tp.topic, tp.partition, tp.offset) for tp in last.kwargs["offsets"]] == [("test_topic", 0, 3)]
+    assert last.kwargs["asynchronous"] is False
+    assert mock_output.save.call_count == 3
+
+
+def at_least_once_messages(count):
+    messages = []
+    for offset in range(count):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"data": offset}).encode()
+        message.error.return_value = None
+        message.topic.return_value = "test_topic"
+        message.partition.return_value = 0
+        message.offset.return_value = offset
+        messages.append(message)
+    return messages
+
+
+def test_kafka_at_least_once_holds_back_unsaved_messages(mock_output, mock_state):
+    """A message that could not be saved is not done, its partition is not committed past it."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_consumer.poll.side_effect = [*at_least_once_messages(3), KeyboardInterrupt]
+    mock_output.save.side_effect = [None, Exception("Output unavailable"), None]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", at_least_once=True, commit_every=1)
+
+    committed = [tp.offset for call in mock_consumer.commit.call_args_list for tp in call.kwargs["offsets"]]
+    assert committed == [1]
+
+
+def test_kafka_at_least_once_stops_committing_after_dropped_batches(mock_output, mock_state):
+    """Once the batching output drops records, no offsets are committed anymore."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_consumer.poll.side_effect = [*at_least_once_messages(3), KeyboardInterrupt]
+    mock_output.save_bulk.side_effect = Exception("Output unavailable")
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen(
+                "test_topic", "test_group", at_least_once=True, commit_every=2, batch_size=10, linger_ms=60000
+            )
+
+    mock_consumer.commit.assert_not_called()
+
+
+def test_kafka_at_least_once_requires_blocking_queue(mock_output, mock_state):
+    """Dropping queue policies would leave offsets undone forever."""
+    kafka_spout = Kafka(mock_output, mock_state)
+
+    with pytest.raises(ValueError):
+        kafka_spout.listen("test_topic", "test_group", at_least_once=True, queue_size=10, queue_policy="drop_oldest")
+
+
+def test_kafka_listen_partition_workers(mock_output, mock_state):
+    """With partition_workers, messages are processed in order within each partition, and revoked partitions are
+    drained before their offsets are committed."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    messages = []
+    for offset in range(20):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"partition": offset % 2, "offset": offset}).encode()
+        message.error.return_value = None
+        message.topic.return_value = "test_topic"
+        message.partition.return_value = offset % 2
+        message.offset.return_value = offset
+        messages.append(message)
+
+    saved_when_revoked = []
+
+    def saved():
+        records = [call.args[0] for call in mock_output.save.call_args_list]
+        return records + [r for call in mock_output.save_bulk.call_args_list for r in call.args[0]]
+
+    def revoke():
+        on_revoke = mock_consumer.subscribe.call_args.kwargs["on_revoke"]
+        on_revoke(mock_consumer, [mock.MagicMock(topic="test_topic", partition=0)])
+        saved_when_revoked.extend(saved())
+        raise KeyboardInterrupt
+
+    batches = iter([messages])
+    mock_consumer.consume.side_effect = lambda **kwargs: next(batches, None) or revoke()
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", num_messages=20, at_least_once=True, partition_workers=2)
+
+    # Every message of the revoked partition was saved before its offset was committed
+    assert [d["offset"] for d in saved_when_revoked if d["partition"] == 0] == list(range(0, 20, 2))
+    assert [d["offset"] for d in saved() if d["partition"] == 1] == list(range(1, 20, 2))
+    revoked, last = mock_consumer.commit.call_args_list
+    assert [(tp.topic, tp.partition, tp.offset) for tp in revoked.kwargs["offsets"]] == [("test_topic", 0, 19)]
+    assert [(tp.topic, tp.partition, tp.offset) for tp in last.kwargs["offsets"]] == [("test_topic", 1, 20)]
+    assert kafka_spout.pool is None
+
+
+def test_kafka_partition_workers_exclude_queue(mock_output, mock_state):
+    """A shared queue would reorder the messages of a partition."""
+    kafka_spout = Kafka(mock_output, mock_state)
+
+    with pytest.raises(ValueError):
+        kafka_spout.listen("test_topic", "test_group", partition_workers=2, queue_size=10)
+
+
+def test_kafka_lag(mock_output, mock_state):
+    """Lag is computed from the cached high watermarks and the consumer's positions."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    assert kafka_spout.lag() == {}
+
+    kafka_spout.consumer = mock.MagicMock()
+    assignment = [TopicPartition("test_topic", 0), TopicPartition("test_topic", 1), TopicPartition("test_topic", 2)]
+    kafka_spout.consumer.assignment.return_value = assignment
+    kafka_spout.consumer.position.return_value = [
+        TopicPartition("test_topic", 0, 90),
+        TopicPartition("test_topic", 1, -1001),
+        TopicPartition("test_topic", 2, 5),
+    ]
+    watermarks = {0: (0, 100), 1: (10, 30), 2: (-1001, -1001)}
+    kafka_spout.consumer.get_watermark_offsets.side_effect = lambda tp, cached: watermarks[tp.partition]
+
+    assert kafka_spout.lag() == {("test_topic", 0): 10, ("test_topic", 1): 20}
+    assert all(call.kwargs["cached"] for call in kafka_spout.consumer.get_watermark_offsets.call_args_list)
+
+
+def test_kafka_listen_statistics(mock_output, mock_state):
+    """With stats_interval_ms, per partition lag and rates are exposed in the state and the metrics."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    kafka_spout.enable_metrics()
+    mock_consumer = mock.MagicMock()
+    mock_consumer.assignment.return_value = [TopicPartition("test_topic", 0)]
+    mock_consumer.position.return_value = [TopicPartition("test_topic", 0, 95)]
+    mock_consumer.get_watermark_offsets.return_value = (0, 100)
+    mock_state_data = {"success_count": 0, "failure_count": 0}
+    mock_state.get_state.return_value = mock_state_data
+
+    statistics = {
+        "ts": 1_000_000,
+        "brokers": {"localhost:9092/1": {"nodeid": 1, "rtt": {"avg": 1000, "cnt": 1}}},
+        "topics": {
+            "test_topic": {
+                "partitions": {
+                    "0": {"leader": 1, "fetch_state": "active", "consumer_lag": 7, "rxmsgs": 10, "rxbytes": 100}
+                }
+            }
+        },
+    }
+
+    labels = {"listener": "Kafka", "id": kafka_spout.id, "topic": "test_topic", "partition": "0"}
+    exported = {}
+
+    def poll(timeout):
+        mock_consumer_class.call_args[0][0]["stats_cb"](json.dumps(statistics))
+        for name in ["lag", "fetch_latency_seconds", "messages_per_second"]:
+            exported[name] = REGISTRY.get_sample_value(f"geniusrise_listener_partition_{name}", labels)
+        raise KeyboardInterrupt
+
+    mock_consumer.poll.side_effect = poll
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer) as mock_consumer_class:
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", stats_interval_ms=1000)
+
+        assert mock_consumer_class.call_args[0][0]["statistics.interval.ms"] == 1000
+
+    gauges = {"lag": 5, "messages_per_second": None, "bytes_per_second": None, "fetch_latency_seconds": 0.001}
+    assert mock_state_data["partitions"] == {"test_topic[0]": gauges}
+    # The watermark lag is fresher than the one in the statistics
+    assert exported == {"lag": 5, "fetch_latency_seconds": 0.001, "messages_per_second": None}
+    # The gauges are dropped when the listener stops
+    assert REGISTRY.get_sample_value("geniusrise_listener_partition_lag", labels) is None
+
+
+def test_kafka_listen_topics_with_metadata_and_routing(mock_output, mock_state):
+    """Several topics are consumed at once, with their metadata, and routed to their own output topics."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_output.producer = mock.MagicMock()
+    mock_consumer = mock.MagicMock()
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    messages = []
+    for offset, topic in enumerate(["orders", "logs-eu"]):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"n": offset}).encode()
+        message.error.return_value = None
+        message.topic.return_value = topic
+        message.partition.return_value = 0
+        message.offset.return_value = offset
+        message.timestamp.return_value = (TIMESTAMP_CREATE_TIME, 1700000000000)
+        message.headers.return_value = [("trace", b"abc")] if offset == 0 else None
+        messages.append(message)
+    mock_consumer.poll.side_effect = [*messages, KeyboardInterrupt]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("orders, ^logs-.*", "test_group", output_topics={"^logs-.*": "logs"})
+
+    mock_consumer.subscribe.assert_called_once_with(["orders", "^logs-.*"])
+    mock_output.save.assert_called_once_with(
+        {
+            "data": {"n": 0},
+            "topic": "orders",
+            "partition": 0,
+            "offset": 0,
+            "timestamp": 1700000000000,
+            "headers": {"trace": "abc"},
+        }
+    )
+    target, value = mock_output.producer.send.call_args.args
+    assert target == "logs"
+    assert json.loads(value) == {
+        "data": {"n": 1},
+        "topic": "logs-eu",
+        "partition": 0,
+        "offset": 1,
+        "timestamp": 1700000000000,
+        "headers": {},
+    }
+
+
+def test_kafka_listen_regex_topic(mock_output, mock_state):
+    """A regular expression is subscribed to as it is, commas included."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_consumer.poll.side_effect = KeyboardInterrupt
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("^events-[a-z]{2,3}$", "test_group")
+
+    mock_consumer.subscribe.assert_called_once_with(["^events-[a-z]{2,3}$"])
+
+
+def test_kafka_listen_bounded_replay(mock_output, mock_state):
+    """A bounded replay starts from its start point, and returns once every partition reached its stop point."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    def message(offset):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"offset": offset}).encode()
+        message.error.return_value = None
+        message.topic.return_value = "test_topic"
+        message.partition.return_value = 0
+        message.offset.return_value = offset
+        return message
+
+    def consume(num_messages, timeout):
+        if mock_consumer.consume.call_count == 1:
+            on_assign = mock_consumer.subscribe.call_args.kwargs["on_assign"]
+            on_assign(mock_consumer, [TopicPartition("test_topic", 0)])
+            return []
+        return [message(offset) for offset in range(10, 15)]
+
+    mock_consumer.consume.side_effect = consume
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer) as consumer_class:
+        kafka_spout.listen(
+            "test_topic", "replay_group", num_messages=10, start_from="test_topic:0=10", stop_at="test_topic:0=12"
+        )
+
+    assert consumer_class.call_args[0][0]["enable.partition.eof"] is True
+    (assigned,) = mock_consumer.assign.call_args.args
+    assert [(tp.topic, tp.partition, tp.offset) for tp in assigned] == [("test_topic", 0, 10)]
+    mock_output.save_bulk.assert_called_once_with([{"offset": 10}, {"offset": 11}])
+    assert kafka_spout.replay is None
+
+
+def test_kafka_throttle(mock_output, mock_state):
+    """Partitions are paused at the high watermark, stay paused above the low one, and are resumed below it."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    kafka_spout.consumer = mock.MagicMock()
+    assignment = [TopicPartition("test_topic", 0), TopicPartition("test_topic", 1)]
+    kafka_spout.consumer.assignment.return_value = assignment
+
+    with mock.patch.object(Kafka, "in_flight", new_callable=mock.PropertyMock) as in_flight:
+        for value in [9, 10, 6, 5, 6]:
+            in_flight.return_value = value
+            kafka_spout._throttle(10, 5)
+            if value == 10:
+                assert kafka_spout.paused
+
+    assert kafka_spout.consumer.pause.call_args_list == [mock.call(assignment), mock.call(assignment)]
+    kafka_spout.consumer.resume.assert_called_once_with(assignment)
+    assert not kafka_spout.paused
+    assert kafka_spout.counters.totals()["pause_count"] == 1
+
+
+def test_kafka_listen_pauses_on_backpressure(mock_output, mock_state):
+    """Unsaved records count as in flight, and pause consumption with the fetch buffers bounded."""
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_consumer.assignment.return_value = [TopicPartition("test_topic", 0)]
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+
+    messages = []
+    for offset in range(3):
+        message = mock.MagicMock()
+        message.value.return_value = json.dumps({"offset": offset}).encode()
+        message.error.return_value = None
+        messages.append(message)
+    mock_consumer.consume.side_effect = [messages, [], KeyboardInterrupt]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer) as consumer_class:
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen(
+                "test_topic",
+                "test_group",
+                num_messages=100,
+                linger_ms=60000,
+                max_in_flight=3,
+                queued_max_kbytes=1024,
+                fetch_max_bytes=1048576,
+            )
+
+    config = consumer_class.call_args[0][0]
+    assert config["queued.max.messages.kbytes"] == 1024
+    assert config["fetch.max.bytes"] == 1048576
+    assert "queued.min.messages" not in config
+    assert mock_consumer.pause.call_count == 2
+    mock_consumer.resume.assert_not_called()
+    mock_output.save_bulk.assert_called_once()
+
+
+def test_kafka_listen_confluent_codec(mock_output, mock_state, tmp_path):
+    """The confluent codec decodes wire format payloads with the schemas of the registry."""
+    fastavro = pytest.importorskip("fastavro")
+    schema = {"type": "record", "name": "Event", "fields": [{"name": "id", "type": "long"}]}
+    (tmp_path / "12.avsc").write_text(json.dumps(schema))
+    body = io.BytesIO()
+    fastavro.schemaless_writer(body, fastavro.parse_schema(schema), {"id": 42})
+
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    mock_state.get_state.return_value = {"success_count": 0, "failure_count": 0}
+    message = mock.MagicMock()
+    message.value.return_value = b"\x00\x00\x00\x00\x0c" + body.getvalue()
+    message.error.return_value = None
+    mock_consumer.poll.side_effect = [message, KeyboardInterrupt]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen("test_topic", "test_group", codec="confluent", schema_registry=str(tmp_path))
+
+    mock_output.save.assert_called_once_with({"id": 42})
+
+
+def test_kafka_confluent_codec_requires_registry(mock_output, mock_state):
+    """Wire format payloads cannot be decoded without their schemas."""
+    kafka_spout = Kafka(mock_output, mock_state)
+
+    with pytest.raises(ValueError):
+        kafka_spout.listen("test_topic", "test_group", codec="confluent")
+
+
+def test_kafka_listen_validates_json_schemas(mock_output, mock_state, tmp_path):
+    """With validate_schemas, JSON Schema payloads that do not match their schema are failed."""
+    pytest.importorskip("jsonschema")
+    schema = {"type": "object", "properties": {"id": {"type": "integer"}}, "required": ["id"]}
+    (tmp_path / "7.json").write_text(json.dumps(schema))
+
+    kafka_spout = Kafka(mock_output, mock_state)
+    mock_consumer = mock.MagicMock()
+    messages = []
+    for value in ({"id": 1}, {"id": "one"}):
+        message = mock.MagicMock()
+        message.value.return_value = b"\x00\x00\x00\x00\x07" + json.dumps(value).encode()
+        message.error.return_value = None
+        messages.append(message)
+    mock_consumer.poll.side_effect = [*messages, KeyboardInterrupt]
+
+    with mock.patch("geniusrise_listeners.kafka.Consumer", return_value=mock_consumer):
+        with pytest.raises(KeyboardInterrupt):
+            kafka_spout.listen(
+                "test_topic", "test_group", codec="confluent", schema_registry=str(tmp_path), validate_schemas=True
+            )
+
+    mock_output.save.assert_called_once_with({"id": 1})
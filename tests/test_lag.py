@@ -0,0 +1,68 @@
+from geniusrise_listeners.lag import ConsumerStats
+
+
+def statistics(ts, rxmsgs, rxbytes, fetch_state="active"):
+    """A trimmed down librdkafka statistics object, for one topic of two partitions."""
+    return {
+        "ts": ts,
+        "brokers": {
+            "localhost:9092/1": {"nodeid": 1, "rtt": {"avg": 2500, "cnt": 10}},
+            "localhost:9093/2": {"nodeid": 2, "rtt": {"avg": 0, "cnt": 0}},
+        },
+        "topics": {
+            "topic": {
+                "partitions": {
+                    "0": {
+                        "leader": 1,
+                        "fetch_state": fetch_state,
+                        "consumer_lag": 42,
+                        "rxmsgs": rxmsgs,
+                        "rxbytes": rxbytes,
+                    },
+                    "1": {"leader": 2, "fetch_state": "active", "consumer_lag": -1, "rxmsgs": 0, "rxbytes": 0},
+                    "-1": {"leader": -1, "fetch_state": "none", "consumer_lag": -1, "rxmsgs": 0, "rxbytes": 0},
+                }
+            }
+        },
+    }
+
+
+def test_lag_and_latency():
+    """Lag and latency are read from the statistics, unknown values are None."""
+    partitions = ConsumerStats().update(statistics(1_000_000, 100, 10_000))
+
+    assert partitions == {
+        ("topic", 0): {
+            "lag": 42,
+            "messages_per_second": None,
+            "bytes_per_second": None,
+            "fetch_latency_seconds": 0.0025,
+        },
+        ("topic", 1): {
+            "lag": None,
+            "messages_per_second": None,
+            "bytes_per_second": None,
+            "fetch_latency_seconds": None,
+        },
+    }
+
+
+def test_rates():
+    """Rates are computed from the previous statistics."""
+    stats = ConsumerStats()
+    stats.update(statistics(1_000_000, 100, 10_000))
+    partitions = stats.update(statistics(3_000_000, 1100, 60_000))
+
+    assert partitions[("topic", 0)]["messages_per_second"] == 500
+    assert partitions[("topic", 0)]["bytes_per_second"] == 25_000
+    assert partitions[("topic", 1)]["messages_per_second"] == 0
+
+
+def test_partitions_no_longer_fetched():
+    """Partitions that are no longer fetched, e.g. revoked, are dropped."""
+    stats = ConsumerStats()
+    stats.update(statistics(1_000_000, 100, 10_000))
+    partitions = stats.update(statistics(2_000_000, 100, 10_000, fetch_state="stopped"))
+
+    assert list(partitions) == [("topic", 1)]
+    assert stats.partitions is partitions
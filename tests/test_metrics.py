@@ -0,0 +1,99 @@
+import json
+import socket
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+from prometheus_client import REGISTRY, generate_latest
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.queueing import queueing
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock StreamingOutput."""
+    return mock.MagicMock(spec=StreamingOutput)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels)
+
+
+def test_metrics_are_off_by_default(mock_output):
+    """Listeners do not record metrics unless asked to."""
+    listener = Listener(mock_output, InMemoryState())
+    assert listener.metrics is None
+
+
+def test_messages_bytes_and_stage_latencies(mock_output):
+    """Messages are counted by outcome, and bytes and stage latencies are recorded."""
+    listener = Listener(mock_output, InMemoryState())
+    listener.enable_metrics()
+    listener.configure(decoder=json.loads, filters=[lambda data: data["keep"]])
+    labels = {"listener": "Listener", "id": listener.id}
+
+    listener.process('{"keep": true}')
+    listener.process('{"keep": false}')
+    listener.process("Not a JSON message")
+
+    assert sample("geniusrise_listener_messages_total", outcome="success", **labels) == 1
+    assert sample("geniusrise_listener_messages_total", outcome="filtered", **labels) == 1
+    assert sample("geniusrise_listener_messages_total", outcome="failure", **labels) == 1
+    assert sample("geniusrise_listener_received_bytes_total", **labels) == 47
+    assert sample("geniusrise_listener_stage_seconds_count", stage="decode", **labels) == 2
+    assert sample("geniusrise_listener_stage_seconds_count", stage="filter", **labels) == 2
+    assert sample("geniusrise_listener_stage_seconds_count", stage="save", **labels) == 1
+    mock_output.save.assert_called_once_with({"keep": True})
+
+
+def test_queue_depth_and_drops(mock_output):
+    """The queue depth is read from the receive queue, and drops are exported by reason."""
+    listener = Listener(mock_output, InMemoryState())
+    listener.enable_metrics()
+    labels = {"listener": "Listener", "id": listener.id}
+
+    with queueing(listener, queue_size=10):
+        assert sample("geniusrise_listener_queue_depth", **labels) == 0
+        listener.counters.incr("queue_dropped_count", 3)
+
+    assert sample("geniusrise_listener_queue_depth", **labels) is None
+    assert sample("geniusrise_listener_dropped_total", reason="queue", **labels) == 3
+    assert b"geniusrise_listener_messages_total" in generate_latest(REGISTRY)
+
+
+def test_metrics_from_keyword_arguments(mock_output, tmp_path):
+    """The metrics_* keyword arguments enable metrics, and the textfile is written when listening ends."""
+    path = tmp_path / "listener.prom"
+    listener = Listener(mock_output, InMemoryState(), metrics_textfile=str(path), metrics_interval=60)
+
+    with listener.listening():
+        listener.process("hello")
+
+    assert listener.metrics is not None
+    assert f'geniusrise_listener_messages_total{{id="{listener.id}",listener="Listener",outcome="success"}} 1.0' in (
+        path.read_text()
+    )
+
+
+def test_push_to_statsd(mock_output):
+    """Counters are sent to statsd as deltas, in name.label form."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(2)
+    address = f"127.0.0.1:{server.getsockname()[1]}"
+
+    listener = Listener(mock_output, InMemoryState())
+    metrics = listener.enable_metrics(statsd=address, interval=60)
+    listener.process("hello")
+    metrics.push()
+    first = server.recv(65536).decode().splitlines()
+
+    listener.process("hello")
+    metrics.push()
+    second = server.recv(65536).decode().splitlines()
+    metrics.close()
+    server.close()
+
+    assert f"geniusrise_listener_messages_total.Listener.{listener.id}.success:1|c" in first
+    assert f"geniusrise_listener_messages_total.Listener.{listener.id}.success:1|c" in second
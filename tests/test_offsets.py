@@ -0,0 +1,100 @@
+import threading
+
+from geniusrise_listeners.offsets import OffsetTracker
+
+
+def test_commits_contiguous_offsets():
+    """The offset to commit is the one after the highest offset below which everything is done."""
+    offsets = OffsetTracker()
+    for offset in range(5):
+        offsets.track("topic", 0, offset)
+
+    offsets.done("topic", 0, 1)
+    assert offsets.committable() == {}
+
+    offsets.done("topic", 0, 0)
+    offsets.done("topic", 0, 3)
+    assert offsets.committable() == {("topic", 0): 2}
+    assert offsets.in_flight == 2
+
+
+def test_partitions_are_independent():
+    """Every partition is committed up to its own contiguous offset."""
+    offsets = OffsetTracker()
+    offsets.track("topic", 0, 10)
+    offsets.track("topic", 1, 20)
+    offsets.track("other", 0, 30)
+
+    offsets.done("topic", 1, 20)
+    offsets.done("other", 0, 30)
+
+    assert offsets.committable() == {("topic", 1): 21, ("other", 0): 31}
+    assert offsets.committable([("topic", 1), ("topic", 5)]) == {("topic", 1): 21}
+
+
+def test_committed_offsets_are_not_committed_again():
+    """Only partitions that moved since their last commit are committable."""
+    offsets = OffsetTracker()
+    offsets.track("topic", 0, 0)
+    offsets.done("topic", 0, 0)
+    assert offsets.pending == 1
+
+    offsets.committed(offsets.committable())
+
+    assert offsets.committable() == {}
+    assert offsets.pending == 0
+    offsets.track("topic", 0, 1)
+    offsets.done("topic", 0, 1)
+    assert offsets.committable() == {("topic", 0): 2}
+
+
+def test_revoked_partitions_are_forgotten():
+    """Revoked partitions are no longer tracked, and late completions are ignored."""
+    offsets = OffsetTracker()
+    offsets.track("topic", 0, 0)
+    offsets.revoke([("topic", 0)])
+
+    offsets.done("topic", 0, 0)
+
+    assert offsets.committable() == {}
+    assert offsets.in_flight == 0
+
+
+def test_done_from_many_threads():
+    """Offsets marked done concurrently are all accounted for."""
+    offsets = OffsetTracker()
+    for offset in range(1000):
+        offsets.track("topic", 0, offset)
+
+    threads = [
+        threading.Thread(target=lambda i=i: [offsets.done("topic", 0, o) for o in range(i, 1000, 4)]) for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert offsets.committable() == {("topic", 0): 1000}
+
+
+def test_committed_offsets():
+    """Only partitions committed since they were tracked have a committed offset."""
+    offsets = OffsetTracker()
+    offsets.track("topic", 0, 10)
+    offsets.track("topic", 1, 20)
+    offsets.done("topic", 0, 10)
+    offsets.committed(offsets.committable())
+
+    assert offsets.committed_offsets() == {("topic", 0): 11}
+
+
+def test_held_offsets_are_not_committed():
+    """Nothing is committable once the offsets are held."""
+    offsets = OffsetTracker()
+    offsets.track("topic", 0, 10)
+    offsets.done("topic", 0, 10)
+    offsets.hold()
+    offsets.track("topic", 0, 11)
+    offsets.done("topic", 0, 11)
+
+    assert offsets.committable() == {}
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.partitions import PartitionPool
+
+
+class Recorder:
+    """An output that records what it saves, in order."""
+
+    def __init__(self):
+        self.saved = []
+
+    def save(self, data, filename=None):
+        self.saved.append(data)
+
+    def flush(self):
+        pass
+
+
+def slow_enricher(data, metadata):
+    time.sleep(0.001 * (data["i"] % 3))
+    return data
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_pool_preserves_partition_order(mode):
+    """Messages of a partition are saved in the order they were submitted, across all partitions."""
+    output = Recorder()
+    listener = Listener(output, InMemoryState())
+    listener.configure(enricher=slow_enricher)
+    done = []
+
+    pool = PartitionPool(listener, workers=3, mode=mode, on_done=done.append)
+    for i in range(60):
+        pool.submit(i % 4, {"partition": i % 4, "i": i}, None, (i % 4, i))
+    pool.close()
+
+    assert len(output.saved) == 60
+    for partition in range(4):
+        assert [d["i"] for d in output.saved if d["partition"] == partition] == list(range(partition, 60, 4))
+        assert [key for key in done if key[0] == partition] == [(partition, i) for i in range(partition, 60, 4)]
+    assert listener.counters.totals()["success_count"] == 60
+
+
+def test_pool_drain_waits_for_partitions():
+    """drain() returns once the messages of the given partitions are done, whatever the others do."""
+    release = threading.Event()
+    output = mock.MagicMock(spec=StreamingOutput)
+
+    def save(data):
+        if data == "blocked":
+            release.wait()
+
+    output.save.side_effect = save
+    pool = PartitionPool(Listener(output, InMemoryState()), workers=2)
+    pool.submit("a", "blocked")
+    pool.submit("b", "free")
+
+    assert pool.drain(["b"], timeout=5)
+    assert not pool.drain(["a"], timeout=0.05)
+    assert not pool.drain(timeout=0.05)
+    release.set()
+    assert pool.drain(timeout=5)
+    pool.close()
+
+
+def test_pool_counts_failures():
+    """A message that could not be saved is counted, and not done."""
+    output = mock.MagicMock(spec=StreamingOutput)
+    output.save.side_effect = [Exception("Output unavailable"), None]
+    listener = Listener(output, InMemoryState())
+    done = []
+
+    pool = PartitionPool(listener, workers=1, on_done=done.append)
+    pool.submit(0, "first", None, 1)
+    pool.submit(0, "second", None, 2)
+    pool.close()
+
+    assert done == [2]
+    assert pool.in_flight == 0
+    assert listener.counters.totals() == {"success_count": 1, "failure_count": 1}
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_pool_rejected_messages_are_done(mode):
+    """Messages filtered out by the pipeline are done without being saved."""
+    output = Recorder()
+    listener = Listener(output, InMemoryState())
+    listener.configure(filters=[lambda data: data % 2])
+    done = []
+
+    pool = PartitionPool(listener, workers=2, mode=mode, on_done=done.append)
+    for i in range(10):
+        pool.submit(i % 2, i, None, i)
+    pool.close()
+
+    assert output.saved == [1, 3, 5, 7, 9]
+    assert sorted(done) == list(range(10))
+
+
+def test_pool_messages_with_unsaved_records_are_not_done():
+    """In process mode, a message is only done once the parent process saved its records."""
+
+    class Failing(Recorder):
+        def save(self, data, filename=None):
+            if data == "lost":
+                raise Exception("Output unavailable")
+            super().save(data)
+
+    listener = Listener(Failing(), InMemoryState())
+    done = []
+
+    pool = PartitionPool(listener, workers=1, mode="process", on_done=done.append)
+    pool.submit(0, "lost", None, 1)
+    pool.submit(0, "kept", None, 2)
+    pool.close()
+
+    assert done == [2]
+    assert listener.output.saved == ["kept"]
+    assert listener.counters.totals()["dropped_count"] == 1
+
+
+def test_pool_fails_messages_of_dead_workers():
+    """The messages held by a worker process that dies are failed, so that drain() returns."""
+
+    def enricher(data, metadata):
+        if data == "crash":
+            os._exit(1)
+        return data
+
+    output = Recorder()
+    listener = Listener(output, InMemoryState())
+    listener.configure(enricher=enricher)
+    done = []
+
+    pool = PartitionPool(listener, workers=1, mode="process", on_done=done.append)
+    pool.submit(0, "crash", None, 1)
+    pool.submit(0, "queued", None, 2)
+    assert pool.drain(timeout=10)
+    pool.submit(0, "after", None, 3)
+    pool.close()
+
+    assert done == [3]
+    assert output.saved == ["after"]
+    totals = listener.counters.totals()
+    assert totals["worker_restarts"] == 1
+    assert totals["failure_count"] == 2
+
+
+def test_pool_rejects_unknown_mode():
+    """Only threads and processes are supported."""
+    with pytest.raises(ValueError):
+        PartitionPool(Listener(mock.MagicMock(), InMemoryState()), mode="fiber")
@@ -0,0 +1,239 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.queueing import AsyncReceiveQueue, ReceiveQueue, queueing
+
+
+def test_queued_messages_are_handled():
+    """Messages put on the queue are handed to the handler by the sink workers."""
+    handler = mock.MagicMock()
+    queue = ReceiveQueue(handler, maxsize=10)
+    for i in range(5):
+        assert queue.put(i, {"i": i})
+    queue.close()
+
+    assert handler.call_args_list == [mock.call(i, {"i": i}) for i in range(5)]
+
+
+def test_unknown_policy():
+    """Unknown queue policies are rejected."""
+    with pytest.raises(ValueError, match="Unknown queue policy"):
+        ReceiveQueue(mock.MagicMock(), policy="drop_all")
+
+
+def _stalled_queue(policy, counters=None):
+    """A queue of two whose only sink worker is stuck handling the first message."""
+    release = threading.Event()
+    handled = []
+
+    def handler(i):
+        handled.append(i)
+        release.wait()
+
+    queue = ReceiveQueue(handler, maxsize=2, policy=policy, counters=counters)
+    queue.put(0)
+    while not handled:
+        time.sleep(0.01)
+    return queue, handled, release
+
+
+def test_drop_newest_policy():
+    """When full, the drop_newest policy drops the message being put."""
+    counters = mock.MagicMock()
+    queue, handled, release = _stalled_queue("drop_newest", counters)
+    assert queue.put(1)
+    assert queue.put(2)
+    assert not queue.put(3)
+    assert queue.depth == 2
+
+    release.set()
+    queue.close()
+
+    assert handled == [0, 1, 2]
+    assert queue.dropped == 1
+    counters.incr.assert_called_once_with("queue_dropped_count")
+
+
+def test_drop_oldest_policy():
+    """When full, the drop_oldest policy drops the oldest queued message."""
+    queue, handled, release = _stalled_queue("drop_oldest")
+    for i in range(1, 5):
+        assert queue.put(i)
+
+    release.set()
+    queue.close()
+
+    assert handled == [0, 3, 4]
+    assert queue.dropped == 2
+
+
+def test_block_policy():
+    """When full, the block policy makes put wait for a free slot."""
+    queue, handled, release = _stalled_queue("block")
+    queue.put(1)
+    queue.put(2)
+
+    blocked = threading.Thread(target=queue.put, args=(3,))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join(timeout=2)
+    queue.close()
+
+    assert handled == [0, 1, 2, 3]
+    assert queue.dropped == 0
+
+
+def test_queue_depth_is_reported():
+    """The queue depth is set on the counters by the sink workers."""
+    counters = mock.MagicMock()
+    queue = ReceiveQueue(mock.MagicMock(), counters=counters)
+    queue.put(0)
+    queue.close()
+
+    counters.set.assert_called_with("queue_depth", 0)
+
+
+def test_many_sink_workers():
+    """All messages are handled exactly once by many sink workers."""
+    handled = []
+    lock = threading.Lock()
+
+    def handler(i):
+        with lock:
+            handled.append(i)
+
+    queue = ReceiveQueue(handler, maxsize=100, sink_workers=4)
+    for i in range(1000):
+        queue.put(i)
+    queue.close()
+
+    assert sorted(handled) == list(range(1000))
+
+
+def test_queueing_context_runs_pipeline_on_sink_workers():
+    """Inside the queueing context process() only queues, and the pipeline runs on a sink worker."""
+    output = mock.MagicMock(spec=StreamingOutput)
+    threads = []
+    output.save.side_effect = lambda data: threads.append(threading.current_thread())
+    listener = Listener(output, InMemoryState())
+    process = listener.process
+
+    with queueing(listener, queue_size=10):
+        assert listener.process("hello", {"topic": "test"})
+
+    assert listener.process == process
+    output.save.assert_called_once_with({"data": "hello", "topic": "test"})
+    assert threads[0] is not threading.current_thread()
+
+
+def test_udp_listen_with_queue():
+    """Udp hands datagrams to sink workers when queue_size is given."""
+    from geniusrise_listeners.udp import Udp
+
+    output = mock.MagicMock(spec=StreamingOutput)
+    udp = Udp(output, InMemoryState())
+    mock_socket = mock.MagicMock()
+    datagrams = [(b"a", ("localhost", 1)), (b"b", ("localhost", 1))]
+
+    def side_effect(buffer, *args, **kwargs):
+        if datagrams:
+            data, addr = datagrams.pop(0)
+            buffer[: len(data)] = data
+            return len(data), addr
+        raise KeyboardInterrupt
+
+    mock_socket.recvfrom_into.side_effect = side_effect
+
+    with mock.patch("socket.socket") as mock_socket_constructor:
+        mock_socket_constructor.return_value.__enter__.return_value = mock_socket
+        with pytest.raises(KeyboardInterrupt):
+            udp.listen(queue_size=10, queue_policy="drop_oldest")
+
+    assert output.save.call_args_list == [
+        mock.call({"data": "a", "sender_address": "localhost", "sender_port": 1}),
+        mock.call({"data": "b", "sender_address": "localhost", "sender_port": 1}),
+    ]
+    assert udp.state.get_state(udp.id)["success_count"] == 2
+
+
+def test_async_queue_handles_messages_on_sink_workers():
+    """Messages put from the event loop are handled in order on a sink worker thread."""
+    handled = []
+
+    async def main():
+        queue = AsyncReceiveQueue(lambda i: handled.append((i, threading.current_thread())), maxsize=10)
+        queue.start()
+        for i in range(5):
+            assert queue.put(i)
+        await queue.close()
+
+    asyncio.run(main())
+
+    assert [i for i, _ in handled] == list(range(5))
+    assert all(thread is not threading.main_thread() for _, thread in handled)
+
+
+def test_async_queue_drop_newest_policy():
+    """When full, the drop_newest policy drops the message being put, without waiting."""
+    counters = mock.MagicMock()
+
+    async def main():
+        queue = AsyncReceiveQueue(mock.MagicMock(), maxsize=2, policy="drop_newest", counters=counters)
+        queue.start()
+        # Nothing is handled until the event loop runs the sink worker
+        results = [queue.put(i) for i in range(4)]
+        await queue.close()
+        return results, queue.dropped
+
+    assert asyncio.run(main()) == ([True, True, False, False], 2)
+    assert counters.incr.call_args_list == [mock.call("queue_dropped_count")] * 2
+
+
+def test_async_queue_block_policy_pauses_reading():
+    """Once full, the block policy pauses reading until the queue is down to half its size."""
+    release = threading.Event()
+    calls = []
+
+    async def main():
+        queue = AsyncReceiveQueue(
+            lambda i: release.wait(),
+            maxsize=4,
+            pause=lambda: calls.append("pause"),
+            resume=lambda: calls.append("resume"),
+        )
+        queue.start()
+        for i in range(4):
+            assert queue.put(i)
+        assert queue.paused and calls == ["pause"]
+
+        release.set()
+        await queue.close()
+        return queue.paused
+
+    assert not asyncio.run(main())
+    assert calls == ["pause", "resume"]
+
+
+def test_async_queue_block_policy_is_bounded():
+    """Messages put while the queue is full are dropped and counted, even if reading cannot be paused."""
+    counters = mock.MagicMock()
+
+    async def main():
+        queue = AsyncReceiveQueue(mock.MagicMock(), maxsize=2, counters=counters)
+        queue.start()
+        results = [queue.put(i) for i in range(5)]
+        depth = queue.depth
+        await queue.close()
+        return results, depth, queue.dropped
+
+    assert asyncio.run(main()) == ([True, True, False, False, False], 2, 3)
+    assert counters.incr.call_args_list == [mock.call("queue_dropped_count")] * 3
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+import pytest
+from confluent_kafka import OFFSET_BEGINNING, OFFSET_END, OFFSET_INVALID, TopicPartition
+
+from geniusrise_listeners.replay import ReplayWindow, parse_offsets, parse_timestamp
+
+
+@pytest.fixture
+def consumer():
+    """A consumer whose topic has two partitions of offsets 0 to 99, one message per second from the epoch."""
+    consumer = mock.MagicMock()
+    consumer.offsets_for_times.side_effect = lambda query, timeout: [
+        TopicPartition(tp.topic, tp.partition, tp.offset // 1000 if tp.offset < 100000 else -1) for tp in query
+    ]
+    consumer.get_watermark_offsets.return_value = (0, 100)
+    return consumer
+
+
+def test_parse_timestamp():
+    """Timestamps are milliseconds since the epoch, given as numbers, datetimes or ISO 8601 strings."""
+    assert parse_timestamp(1700000000000) == 1700000000000
+    assert parse_timestamp("1700000000000") == 1700000000000
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1700000000000
+    assert parse_timestamp("2023-11-14T22:13:20") == 1700000000000
+    assert parse_timestamp(datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)) == 1700000000000
+    assert parse_timestamp("latest") is None
+    assert parse_timestamp(True) is None
+
+
+def test_parse_offsets():
+    """Offsets are given by (topic, partition), "topic:partition", or as a string."""
+    expected = {("orders", 0): 1200, ("my:topic", 1): 900}
+    assert parse_offsets({("orders", 0): 1200, ("my:topic", 1): 900}) == expected
+    assert parse_offsets({"orders:0": 1200, "my:topic:1": "900"}) == expected
+    assert parse_offsets("orders:0=1200, my:topic:1=900") == expected
+    assert parse_offsets("2023-11-14T22:13:20Z") is None
+
+
+def test_invalid_positions():
+    """Anything else is rejected up front."""
+    with pytest.raises(ValueError):
+        ReplayWindow(start_from="yesterday")
+    with pytest.raises(ValueError):
+        ReplayWindow(stop_at="earliest")
+
+
+@pytest.mark.parametrize(
+    "start_from, offsets",
+    [
+        ("earliest", [OFFSET_BEGINNING, OFFSET_BEGINNING]),
+        ("latest", [OFFSET_END, OFFSET_END]),
+        (30000, [30, 30]),
+        (200000, [OFFSET_END, OFFSET_END]),
+        ({("topic", 1): 12}, [OFFSET_INVALID, 12]),
+    ],
+)
+def test_start_from(consumer, start_from, offsets):
+    """Newly assigned partitions start from the given point."""
+    replay = ReplayWindow(start_from=start_from)
+    partitions = [TopicPartition("topic", 0), TopicPartition("topic", 1)]
+
+    assert replay.assign(consumer, partitions)
+    assert [tp.offset for tp in partitions] == offsets
+    assert not replay.bounded
+
+
+def test_start_from_applies_once(consumer):
+    """A partition that comes back after a rebalance resumes from its committed offset."""
+    replay = ReplayWindow(start_from="earliest")
+    replay.assign(consumer, [TopicPartition("topic", 0)])
+    replay.revoke([TopicPartition("topic", 0)])
+
+    partitions = [TopicPartition("topic", 0)]
+    assert not replay.assign(consumer, partitions)
+    assert partitions[0].offset == OFFSET_INVALID
+
+
+def test_stop_at(consumer):
+    """Partitions finish at their stop point, excluded, and are paused."""
+    replay = ReplayWindow(start_from=10000, stop_at=20000)
+    replay.assign(consumer, [TopicPartition("topic", 0), TopicPartition("topic", 1)])
+
+    assert replay.stops == {("topic", 0): 20, ("topic", 1): 20}
+    assert not replay.reached("topic", 0, 18)
+    assert not replay.reached("topic", 0, 19)
+    assert replay.reached("topic", 0, 20)
+    assert not replay.finished
+    consumer.pause.assert_called_once_with([TopicPartition("topic", 0)])
+
+    replay.eof("topic", 1)
+    assert replay.finished
+
+
+def test_stop_at_end(consumer):
+    """Partitions without a stop point stop at their end, and empty windows are finished at once."""
+    replay = ReplayWindow(start_from={("topic", 0): 100}, stop_at={("topic", 1): 50})
+    replay.assign(consumer, [TopicPartition("topic", 0), TopicPartition("topic", 1)])
+
+    assert replay.stops == {("topic", 0): 100, ("topic", 1): 50}
+    assert replay.done == {("topic", 0)}
+    consumer.get_watermark_offsets.assert_called_once_with(TopicPartition("topic", 0), 10.0, cached=False)
@@ -0,0 +1,65 @@
+import json
+from unittest import mock
+
+import pytest
+from geniusrise import StreamingOutput
+
+from geniusrise_listeners.routing import TopicRouter, routing
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock a StreamingOutput and its producer."""
+    output = mock.MagicMock(spec=StreamingOutput)
+    output.producer = mock.MagicMock()
+    return output
+
+
+def test_route_by_name_then_pattern(mock_output):
+    """Exact names win over patterns, which are tried in order."""
+    router = TopicRouter(mock_output, {"^logs-.*": "logs", "logs-audit": "audit", "^.*-eu$": "eu"})
+
+    assert router.route("logs-audit") == "audit"
+    assert router.route("logs-eu") == "logs"
+    assert router.route("orders-eu") == "eu"
+    assert router.route("orders") is None
+    assert router.route(None) is None
+
+
+def test_save_routes_records(mock_output):
+    """Routed records are sent with the output's producer, the others are saved as usual."""
+    router = TopicRouter(mock_output, {"orders": "orders_raw"})
+
+    router.save({"data": 1, "topic": "orders"})
+    router.save({"data": 2, "topic": "other"})
+
+    mock_output.producer.send.assert_called_once_with("orders_raw", json.dumps({"data": 1, "topic": "orders"}).encode())
+    mock_output.save.assert_called_once_with({"data": 2, "topic": "other"})
+
+
+def test_save_bulk_routes_records(mock_output):
+    """Batches are split by route, unrouted records stay together."""
+    router = TopicRouter(mock_output, {"^a.*": "a_out"})
+
+    router.save_bulk([{"data": 1, "topic": "a1"}, {"data": 2, "topic": "b"}, {"data": 3, "topic": "c"}])
+
+    assert [call.args[0] for call in mock_output.producer.send.call_args_list] == ["a_out"]
+    mock_output.save_bulk.assert_called_once_with([{"data": 2, "topic": "b"}, {"data": 3, "topic": "c"}])
+
+
+def test_routing_requires_a_producer():
+    """Outputs without a producer cannot be routed."""
+    with pytest.raises(ValueError):
+        TopicRouter(mock.MagicMock(spec=StreamingOutput), {"orders": "orders_raw"})
+
+
+def test_routing_context(mock_output):
+    """The router is in front of the output only inside the block, and only with routes."""
+    spout = mock.MagicMock(output=mock_output)
+
+    with routing(spout):
+        assert spout.output is mock_output
+    with routing(spout, {"orders": "orders_raw"}):
+        assert isinstance(spout.output, TopicRouter)
+    assert spout.output is mock_output
+    mock_output.flush.assert_called_once()
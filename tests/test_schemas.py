@@ -0,0 +1,223 @@
+import datetime
+import decimal
+import io
+import json
+import struct
+import uuid
+from unittest import mock
+
+import pytest
+
+from geniusrise_listeners.schemas import (
+    ConfluentDecoder,
+    HttpSchemaRegistry,
+    LocalSchemaRegistry,
+    get_schema_registry,
+    json_safe,
+    proto_message_names,
+)
+
+USER = {
+    "type": "record",
+    "name": "User",
+    "namespace": "test",
+    "fields": [{"name": "name", "type": "string"}, {"name": "address", "type": "test.Address"}],
+}
+ADDRESS = {"type": "record", "name": "Address", "namespace": "test", "fields": [{"name": "city", "type": "string"}]}
+
+PROTO = """
+syntax = "proto3";
+package test.events;
+
+// A message { with braces in a comment }
+message Click {
+  string page = 1;
+  message Position {
+    int32 x = 1;
+    int32 y = 2;
+  }
+  Position position = 2;
+  oneof source { string button = 3; string key = 4; }
+}
+
+enum Kind { KIND_UNKNOWN = 0; }
+
+message View {
+  string page = 1;
+}
+"""
+
+
+def wire(schema_id, body):
+    """Frame a body in the Confluent wire format."""
+    return b"\x00" + struct.pack(">I", schema_id) + body
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """A local registry with an Avro schema referencing another, and a JSON schema."""
+    (tmp_path / "1.avsc").write_text(json.dumps(ADDRESS))
+    (tmp_path / "2.json").write_text(json.dumps({"type": "object", "required": ["id"]}))
+    (tmp_path / "3.proto").write_text(PROTO)
+    return LocalSchemaRegistry(str(tmp_path))
+
+
+def test_get_schema_registry(tmp_path):
+    """URLs are registry servers, anything else is a directory."""
+    assert isinstance(get_schema_registry("http://localhost:8081"), HttpSchemaRegistry)
+    assert get_schema_registry(f"file://{tmp_path}").path == str(tmp_path)
+    assert get_schema_registry(str(tmp_path)).path == str(tmp_path)
+
+
+def test_local_registry(registry):
+    """Schema types come from the file extensions, and missing schemas are errors."""
+    assert registry.schema(1) == {"schema": json.dumps(ADDRESS), "schemaType": "AVRO", "references": []}
+    assert registry.schema(2)["schemaType"] == "JSON"
+    assert registry.schema(3)["schemaType"] == "PROTOBUF"
+    with pytest.raises(KeyError):
+        registry.schema(4)
+
+
+def test_http_registry_caches_schemas():
+    """Schemas are fetched once per id, with the registry's missing Avro type filled in."""
+    registry = HttpSchemaRegistry("http://registry:8081/", auth="user:secret")
+    response = mock.MagicMock()
+    response.json.return_value = {"schema": json.dumps(ADDRESS)}
+
+    with mock.patch.object(registry.session, "get", return_value=response) as get:
+        assert registry.schema(7)["schemaType"] == "AVRO"
+        assert registry.schema(7)["schemaType"] == "AVRO"
+        registry.reference("my/subject", 2)
+
+    assert [call.args[0] for call in get.call_args_list] == [
+        "http://registry:8081/schemas/ids/7",
+        "http://registry:8081/subjects/my%2Fsubject/versions/2",
+    ]
+    assert registry.session.auth == ("user", "secret")
+
+
+def test_proto_message_names():
+    """Messages are listed in declaration order, with their nested messages and fully qualified names."""
+    assert proto_message_names(PROTO) == [
+        ("test.events.Click", [("test.events.Click.Position", [])]),
+        ("test.events.View", []),
+    ]
+
+
+def test_rejects_other_payloads(registry):
+    """Payloads without the magic byte are not decoded."""
+    decoder = ConfluentDecoder(registry)
+    with pytest.raises(ValueError):
+        decoder(b'{"id": 1}')
+    with pytest.raises(ValueError):
+        decoder(b"\x00\x00")
+
+
+def test_avro_with_references(registry):
+    """Avro payloads are decoded with their writer schema, whose reader is compiled once."""
+    fastavro = pytest.importorskip("fastavro")
+    registry._schemas[5] = {
+        "schema": json.dumps(USER),
+        "schemaType": "AVRO",
+        "references": [{"name": "test.Address", "subject": "address", "version": 1}],
+    }
+    registry._references[("address", 1)] = registry.schema(1)
+    parsed = fastavro.parse_schema(USER, named_schemas={"test.Address": fastavro.parse_schema(ADDRESS)})
+    body = io.BytesIO()
+    fastavro.schemaless_writer(body, parsed, {"name": "Ada", "address": {"city": "London"}})
+
+    decoder = ConfluentDecoder(registry)
+    with mock.patch.object(registry, "schema", wraps=registry.schema) as schema:
+        assert decoder(wire(5, body.getvalue())) == {"name": "Ada", "address": {"city": "London"}}
+        assert decoder(memoryview(wire(5, body.getvalue()))) == {"name": "Ada", "address": {"city": "London"}}
+    schema.assert_called_once_with(5)
+
+
+def test_avro_logical_types_are_json_safe(registry):
+    """Avro bytes, fixed and logical types are decoded into values that can be saved as JSON."""
+    fastavro = pytest.importorskip("fastavro")
+    schema = {
+        "type": "record",
+        "name": "Payment",
+        "fields": [
+            {"name": "id", "type": {"type": "string", "logicalType": "uuid"}},
+            {"name": "at", "type": {"type": "long", "logicalType": "timestamp-millis"}},
+            {"name": "day", "type": {"type": "int", "logicalType": "date"}},
+            {"name": "time", "type": {"type": "int", "logicalType": "time-millis"}},
+            {"name": "amount", "type": {"type": "bytes", "logicalType": "decimal", "precision": 10, "scale": 2}},
+            {"name": "signature", "type": "bytes"},
+            {"name": "hash", "type": {"type": "fixed", "name": "Hash", "size": 2}},
+            {"name": "tags", "type": {"type": "map", "values": {"type": "array", "items": "bytes"}}},
+        ],
+    }
+    registry._schemas[6] = {"schema": json.dumps(schema), "schemaType": "AVRO", "references": []}
+    body = io.BytesIO()
+    fastavro.schemaless_writer(
+        body,
+        fastavro.parse_schema(schema),
+        {
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "at": datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            "day": datetime.date(2024, 1, 2),
+            "time": datetime.time(3, 4, 5),
+            "amount": decimal.Decimal("12.34"),
+            "signature": b"\xff\x00",
+            "hash": b"ab",
+            "tags": {"raw": [b"\x01"]},
+        },
+    )
+
+    value = ConfluentDecoder(registry)(wire(6, body.getvalue()))
+
+    assert json.loads(json.dumps(value)) == {
+        "id": "12345678-1234-5678-1234-567812345678",
+        "at": "2024-01-02T03:04:05+00:00",
+        "day": "2024-01-02",
+        "time": "03:04:05",
+        "amount": "12.34",
+        "signature": "/wA=",
+        "hash": "YWI=",
+        "tags": {"raw": ["AQ=="]},
+    }
+
+
+def test_json_safe_passes_json_values_through():
+    """JSON values are left as they are."""
+    value = {"a": [1, 2.5, "x", None, True], "b": {"c": False}}
+    assert json_safe(value) == value
+
+
+def test_json_schema(registry):
+    """JSON Schema payloads are JSON, validated only if asked to."""
+    assert ConfluentDecoder(registry)(wire(2, b'{"name": "Ada"}')) == {"name": "Ada"}
+
+    jsonschema = pytest.importorskip("jsonschema")
+    decoder = ConfluentDecoder(registry, validate=True)
+    assert decoder(wire(2, b'{"id": 1}')) == {"id": 1}
+    with pytest.raises(jsonschema.ValidationError):
+        decoder(wire(2, b'{"name": "Ada"}'))
+
+
+def test_protobuf(registry):
+    """Protobuf payloads are decoded with the generated class named by their message indexes."""
+    pytest.importorskip("google.protobuf")
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    file = descriptor_pb2.FileDescriptorProto(name="test_events.proto", package="test.events", syntax="proto3")
+    click = file.message_type.add(name="Click")
+    click.field.add(name="page", number=1, type=9, label=1)
+    position = click.nested_type.add(name="Position")
+    position.field.add(name="x", number=1, type=5, label=1)
+    view = file.message_type.add(name="View")
+    view.field.add(name="page", number=1, type=9, label=1)
+    descriptor_pool.Default().Add(file)
+    classes = message_factory.GetMessages([file])
+
+    decoder = ConfluentDecoder(registry)
+    # A single 0 for the first message, zigzag varints otherwise
+    click_body = classes["test.events.Click"](page="/home").SerializeToString()
+    assert decoder(wire(3, b"\x00" + click_body)) == {"page": "/home"}
+    view_body = classes["test.events.View"](page="/about").SerializeToString()
+    assert decoder(wire(3, b"\x02\x02" + view_body)) == {"page": "/about"}
+    position_body = classes["test.events.Click"].Position(x=3).SerializeToString()
+    assert decoder(wire(3, b"\x04\x00\x00" + position_body)) == {"x": 3}
@@ -0,0 +1,182 @@
+import os
+import socket
+import time
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+from prometheus_client import REGISTRY
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners import sockets
+from geniusrise_listeners.sockets import (
+    DatagramReader,
+    SocketWatcher,
+    address_family,
+    join_multicast_group,
+    parse_addresses,
+    read_udp_table,
+    set_receive_buffer,
+    udp_socket_stats,
+)
+
+TABLE = """  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode ref pointer drops
+  481: 0100007F:3039 00000000:0000 07 00000000:00000A00 00:00000000 00000000     0        0 4242 2 0000000000000000 17
+  482: 00000000:0044 00000000:0000 07 00000000:00000000 00:00000000 00000000     0        0 1337 2 0000000000000000 0
+"""
+
+
+@pytest.fixture
+def mock_output():
+    """Fixture to mock StreamingOutput."""
+    return mock.MagicMock(spec=StreamingOutput)
+
+
+@pytest.fixture
+def udp_socket():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("localhost", 0))
+        yield s
+
+
+def test_read_udp_table(tmp_path):
+    """The receive queue and drops of every socket are read by inode."""
+    path = tmp_path / "udp"
+    path.write_text(TABLE)
+
+    assert read_udp_table([str(path), str(tmp_path / "missing")]) == {
+        4242: {"receive_queue_bytes": 2560, "drops": 17},
+        1337: {"receive_queue_bytes": 0, "drops": 0},
+    }
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/net/udp"), reason="Needs the Linux UDP socket table")
+def test_udp_socket_stats(udp_socket):
+    """The stats of a bound socket are found in the kernel's table."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        sender.sendto(b"x" * 100, udp_socket.getsockname())
+
+    stats = udp_socket_stats([udp_socket])
+    assert stats["drops"] == 0
+    assert stats["receive_queue_bytes"] > 0
+
+
+def test_udp_socket_stats_unknown_socket():
+    """Sockets that are not in the kernel's table have no stats."""
+    assert udp_socket_stats([mock.MagicMock()]) is None
+
+
+def test_set_receive_buffer(udp_socket, caplog):
+    """The granted buffer size is returned, with a warning when it is below the requested size."""
+    assert set_receive_buffer(udp_socket, 65536) >= 65536
+    set_receive_buffer(udp_socket, 2**31 - 1)
+    assert "net.core.rmem_max" in caplog.text
+
+
+def test_socket_watcher(mock_output):
+    """The stats are set as gauges of the state and as metrics."""
+    state = InMemoryState()
+    listener = Listener(mock_output, state)
+    listener.enable_metrics()
+    labels = {"listener": "Listener", "id": listener.id}
+
+    watcher = SocketWatcher(listener, [mock.MagicMock()])
+    with mock.patch(
+        "geniusrise_listeners.sockets.udp_socket_stats", return_value={"receive_queue_bytes": 2560, "drops": 17}
+    ):
+        watcher.update()
+
+    listener.counters.flush()
+    assert state.get_state(listener.id)["socket_drops"] == 17
+    assert state.get_state(listener.id)["socket_queue_bytes"] == 2560
+    assert REGISTRY.get_sample_value("geniusrise_listener_socket_drops_total", labels) == 17
+    assert REGISTRY.get_sample_value("geniusrise_listener_socket_queue_bytes", labels) == 2560
+
+    watcher.close()
+    assert REGISTRY.get_sample_value("geniusrise_listener_socket_drops_total", labels) is None
+
+
+@pytest.fixture(params=["recvmmsg", "recvfrom_into"])
+def recvmmsg(request):
+    """Run with recvmmsg where available, and with the recvfrom_into fallback."""
+    if request.param == "recvmmsg":
+        if sockets._recvmmsg is None:
+            pytest.skip("Needs recvmmsg")
+        yield
+    else:
+        with mock.patch("geniusrise_listeners.sockets._recvmmsg", None):
+            yield
+
+
+def test_datagram_reader_drains_queued_datagrams(udp_socket, recvmmsg):
+    """Queued datagrams are received together, up to the batch size, with their senders and full sizes."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        sender.bind(("localhost", 0))
+        for message in (b"a", b"bb", b"c" * 20, b"d"):
+            sender.sendto(message, udp_socket.getsockname())
+        time.sleep(0.1)
+
+        reader = DatagramReader(udp_socket, 10, batch=3)
+        # The datagrams are views of the reader's buffer, valid until the next read
+        first = [(bytes(data), addr, size) for data, addr, size in reader.read()]
+        second = [(bytes(data), addr, size) for data, addr, size in reader.read()]
+
+        sender_address = sender.getsockname()
+    assert first == [(b"a", sender_address, 1), (b"bb", sender_address, 2), (b"c" * 10, sender_address, 20)]
+    assert second == [(b"d", sender_address, 1)]
+
+
+def test_datagram_reader_ipv6(recvmmsg):
+    """IPv6 senders are decoded like recvfrom does."""
+    if not socket.has_ipv6:
+        pytest.skip("Needs IPv6")
+    with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as receiver, socket.socket(
+        socket.AF_INET6, socket.SOCK_DGRAM
+    ) as sender:
+        try:
+            receiver.bind(("::1", 0))
+        except OSError:
+            pytest.skip("Needs an IPv6 loopback")
+        sender.bind(("::1", 0))
+        sender.sendto(b"hello", receiver.getsockname())
+
+        [(data, addr, size)] = DatagramReader(receiver, 100, batch=4).read()
+
+        assert bytes(data) == b"hello"
+        assert addr == sender.getsockname()
+
+
+def test_datagram_reader_invalid_batch(udp_socket):
+    """The batch size must be positive."""
+    with pytest.raises(ValueError):
+        DatagramReader(udp_socket, 100, batch=0)
+
+
+def test_parse_addresses():
+    """Addresses are parsed from lists and comma separated strings, with IPv6 hosts in brackets."""
+    assert parse_addresses("0.0.0.0:8125, localhost", 514) == [("0.0.0.0", 8125), ("localhost", 514)]
+    assert parse_addresses(["[::1]:8125", "[::]", "::1"], 514) == [("::1", 8125), ("::", 514), ("::1", 514)]
+
+
+def test_address_family():
+    """IPv6 addresses bind IPv6 sockets, anything else IPv4 ones."""
+    assert address_family("::") == socket.AF_INET6
+    assert address_family("0.0.0.0") == socket.AF_INET
+    assert address_family("localhost") == socket.AF_INET
+
+
+def test_join_multicast_group():
+    """A socket that joined a group receives the datagrams sent to it."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver, socket.socket(
+        socket.AF_INET, socket.SOCK_DGRAM
+    ) as sender:
+        receiver.bind(("0.0.0.0", 0))
+        try:
+            join_multicast_group(receiver, "239.1.2.3")
+        except OSError:
+            pytest.skip("Needs a multicast route")
+        sender.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        sender.sendto(b"hello", ("239.1.2.3", receiver.getsockname()[1]))
+        receiver.settimeout(2)
+
+        assert receiver.recvfrom(100)[0] == b"hello"
@@ -141,3 +141,44 @@ def test_listen_exception_occurred(mock_sqs_client, mock_output, ims_state):
     mock_sqs.receive_message.assert_called()
     mock_output.save.assert_not_called()  # Save should not be called
     mock_sqs.delete_message.assert_not_called()  # Delete should not be called
+
+
+# Test that with linger_ms, messages are deleted in bulk once their batch is sent
+@patch('boto3.client')
+def test_listen_linger_deletes_sent_batches(mock_sqs_client, mock_output, ims_state):
+    mock_sqs = MagicMock()
+    mock_sqs.receive_message.side_effect = [
+        {"Messages": [{"ReceiptHandle": f"handle{i}", "MessageId": f"id{i}"} for i in range(12)]},
+        KeyboardInterrupt
+    ]
+    mock_sqs.delete_message_batch.return_value = {"Successful": [], "Failed": []}
+    mock_sqs_client.return_value = mock_sqs
+
+    sqs_spout = SQS(mock_output, ims_state)
+    with unittest.TestCase().assertRaises(KeyboardInterrupt):
+        sqs_spout.listen("dummy_queue_url", batch_size=12, linger_ms=60000)
+    mock_output.save_bulk.assert_called_once()
+    mock_sqs.delete_message.assert_not_called()
+    assert [call.kwargs["Entries"] for call in mock_sqs.delete_message_batch.call_args_list] == [
+        [{"Id": str(i), "ReceiptHandle": f"handle{i}"} for i in range(10)],
+        [{"Id": str(i), "ReceiptHandle": f"handle{i + 10}"} for i in range(2)],
+    ]
+
+
+# Test that with linger_ms, messages of a batch that cannot be sent are not deleted
+@patch('boto3.client')
+def test_listen_linger_keeps_failed_batches(mock_sqs_client, mock_output, ims_state):
+    mock_sqs = MagicMock()
+    mock_sqs.receive_message.side_effect = [
+        {"Messages": [{"ReceiptHandle": "handle1", "MessageId": "id1"}]},
+        KeyboardInterrupt
+    ]
+    mock_sqs_client.return_value = mock_sqs
+    mock_output.save_bulk.side_effect = Exception("Broker not available")
+
+    sqs_spout = SQS(mock_output, ims_state)
+    with unittest.TestCase().assertRaises(KeyboardInterrupt):
+        sqs_spout.listen("dummy_queue_url", linger_ms=60000)
+    mock_output.save_bulk.assert_called_once()
+    mock_sqs.delete_message.assert_not_called()
+    mock_sqs.delete_message_batch.assert_not_called()
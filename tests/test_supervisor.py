@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+from unittest import mock
+
+import pytest
+from geniusrise import InMemoryState, StreamingOutput
+from prometheus_client import REGISTRY
+
+from geniusrise_listeners.base import Listener
+from geniusrise_listeners.supervisor import ForwardingCounter, Supervisor, supervised
+
+
+class Counting(Listener):
+    @supervised
+    def listen(self, messages: int = 10, crash_marker: str = "", workers: int = 1):
+        # The first worker to create the marker crashes
+        if crash_marker:
+            try:
+                os.close(os.open(crash_marker, os.O_CREAT | os.O_EXCL))
+                os._exit(1)
+            except FileExistsError:
+                pass
+        for i in range(messages):
+            self.process(f"message {i:02d}")
+        self.output.flush()
+        return self.worker
+
+
+class ThreadedOutput:
+    """Sends records from a background thread, like a Kafka producer, whose thread does not survive a fork."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.saved = []
+        self._pending = queue.Queue()
+        threading.Thread(target=self._send, daemon=True).start()
+
+    def _send(self):
+        while True:
+            self.saved.append(self._pending.get())
+            self._pending.task_done()
+
+    def save(self, data, filename=None):
+        if self.fail:
+            raise ConnectionError("Broker unavailable")
+        self._pending.put(data)
+
+    def flush(self):
+        # Hangs in a forked process, where nothing sends the pending records
+        self._pending.join()
+
+
+@pytest.fixture
+def spout():
+    """Fixture to create a listener with an in-memory state."""
+    return Counting(mock.MagicMock(spec=StreamingOutput), InMemoryState())
+
+
+def test_forwarding_counter_sends_deltas():
+    """Flushes put the counter deltas and gauges on the queue, and nothing when there is nothing new."""
+    q: queue.Queue = queue.Queue()
+    counters = ForwardingCounter(q, "spout")
+
+    counters.set("last_id", "1-0")
+    counters.incr("success_count", 3)
+    counters.flush()
+
+    assert q.get_nowait() == ("counters", os.getpid(), {"success_count": 3}, {"last_id": "1-0"})
+    assert q.empty()
+
+
+def test_single_worker_runs_in_process(spout):
+    """Without workers, listen() runs as is."""
+    assert spout.listen(messages=3) is None
+
+    assert spout.counters.totals() == {"success_count": 3}
+
+
+def test_workers_counters_reach_the_state(spout):
+    """The counters of all workers are written to the supervisor's state."""
+    spout.listen(messages=5, workers=3)
+
+    state = spout.state.get_state(spout.id)
+    assert state["success_count"] == 15
+    assert state["failure_count"] == 0
+
+
+def test_workers_records_are_saved_by_the_supervisor():
+    """The workers send their records to the supervisor, which saves them with the listener's output."""
+    output = ThreadedOutput()
+    spout = Counting(output, InMemoryState())
+
+    spout.listen(messages=5, workers=3)
+
+    assert sorted(output.saved) == sorted([f"message {i:02d}" for i in range(5)] * 3)
+    assert spout.state.get_state(spout.id)["success_count"] == 15
+
+
+def test_workers_fail_when_the_supervisor_cannot_save():
+    """Records the supervisor cannot save fail in the workers."""
+    spout = Counting(ThreadedOutput(fail=True), InMemoryState())
+
+    spout.listen(messages=2, workers=2)
+
+    state = spout.state.get_state(spout.id)
+    assert state["failure_count"] == 4
+    assert state.get("success_count", 0) == 0
+
+
+def test_crashed_workers_are_restarted(spout, tmp_path):
+    """A worker exiting with an error is restarted and counted."""
+    Supervisor(spout, 2, restart_delay=0.01).run(
+        lambda: spout.listen(messages=4, crash_marker=str(tmp_path / "crashed"))
+    )
+
+    state = spout.state.get_state(spout.id)
+    assert state["worker_restarts"] == 1
+    assert state["success_count"] == 8
+
+
+def test_workers_metrics_are_merged(spout):
+    """The metrics of the workers are exported by the supervisor."""
+    spout.enable_metrics()
+    labels = {"listener": "Counting", "id": spout.id}
+
+    spout.listen(messages=3, workers=2)
+
+    assert REGISTRY.get_sample_value("geniusrise_listener_messages_total", {"outcome": "success", **labels}) == 6
+    assert REGISTRY.get_sample_value("geniusrise_listener_received_bytes_total", labels) == 60
+    assert REGISTRY.get_sample_value("geniusrise_listener_stage_seconds_count", {"stage": "save", **labels}) == 6
+
+
+def test_merge_replaces_snapshots_per_process(spout):
+    """A worker's snapshot replaces its previous one, snapshots of different workers add up."""
+    metrics = spout.enable_metrics()
+    labels = {"listener": "Counting", "id": spout.id}
+    sample = ("geniusrise_listener_reconnects", "geniusrise_listener_reconnects_total", tuple(sorted(labels.items())))
+
+    metrics.merge(1, [(*sample, 1.0)])
+    metrics.merge(1, [(*sample, 2.0)])
+    metrics.merge(2, [(*sample, 5.0)])
+
+    assert REGISTRY.get_sample_value("geniusrise_listener_reconnects_total", labels) == 7
@@ -1,10 +1,16 @@
+import asyncio
+import json
 import pytest
+import signal
 import socket
+import threading
 import time
 from unittest import mock
 from geniusrise import State, StreamingOutput, InMemoryState
+from geniusrise_listeners.queueing import AsyncReceiveQueue
 from geniusrise_listeners.udp import (
     Udp,
+    _DatagramReader,
 )
 
 
@@ -77,12 +83,13 @@ def test_udp_listen_successful_data_processing(mock_output):
     # Mock socket interactions
     mock_socket = mock.MagicMock()
 
-    def side_effect(*args, **kwargs):
-        if mock_socket.recvfrom.call_count == 1:  # Return data for one call
-            return (b"test_data", ("localhost", 8945))
+    def side_effect(buffer, *args, **kwargs):
+        if mock_socket.recvfrom_into.call_count == 1:  # Return data for one call
+            buffer[:9] = b"test_data"
+            return (9, ("localhost", 8945))
         time.sleep(10)  # Simulate a socket waiting for data
 
-    mock_socket.recvfrom.side_effect = side_effect
+    mock_socket.recvfrom_into.side_effect = side_effect
 
     with mock.patch("socket.socket") as mock_socket_constructor:
         mock_socket_constructor.return_value.__enter__.return_value = mock_socket
@@ -95,7 +102,7 @@ def test_udp_listen_successful_data_processing(mock_output):
         time.sleep(1)  # Wait for 1 second to ensure data is processed
 
         # stop the infinite loop by Keyboard Interrupt
-        mock_socket.recvfrom.side_effect = KeyboardInterrupt
+        mock_socket.recvfrom_into.side_effect = KeyboardInterrupt
 
         t.join(timeout=2)  # Try to join the thread, but move on after 2 seconds
 
@@ -122,7 +129,7 @@ def test_udp_listen_no_data_received(mock_output):
     def side_effect(*args, **kwargs):
         time.sleep(10)  # Simulate a socket waiting for data
 
-    mock_socket.recvfrom.side_effect = side_effect
+    mock_socket.recvfrom_into.side_effect = side_effect
 
     with mock.patch("socket.socket") as mock_socket_constructor:
         mock_socket_constructor.return_value.__enter__.return_value = mock_socket
@@ -134,8 +141,8 @@ def test_udp_listen_no_data_received(mock_output):
         t.start()
         time.sleep(1)  # Wait for 1 second to ensure data is processed
 
-        # Interrupt the socket's recvfrom method to stop the infinite loop
-        mock_socket.recvfrom.side_effect = KeyboardInterrupt
+        # Interrupt the socket's recvfrom_into method to stop the infinite loop
+        mock_socket.recvfrom_into.side_effect = KeyboardInterrupt
 
         t.join(timeout=2)  # Try to join the thread, but move on after 2 seconds
 
@@ -152,11 +159,11 @@ def test_udp_listen_exc_handling(mock_output):
     mock_socket = mock.MagicMock()
 
     def side_effect(*args, **kwargs):
-        if mock_socket.recvfrom.call_count == 1:  # Return derror for one call
+        if mock_socket.recvfrom_into.call_count == 1:  # Return derror for one call
             return RuntimeError("Simulated socket error")
         time.sleep(10)  # Simulate a socket waiting for data
 
-    mock_socket.recvfrom.side_effect = side_effect
+    mock_socket.recvfrom_into.side_effect = side_effect
 
     with mock.patch("socket.socket") as mock_socket_constructor:
         mock_socket_constructor.return_value.__enter__.return_value = mock_socket
@@ -169,9 +176,316 @@ def test_udp_listen_exc_handling(mock_output):
         time.sleep(1)  # Wait for 1 second to ensure data is processed
 
         # stop the infinite loop by Keyboard Interrupt
-        mock_socket.recvfrom.side_effect = KeyboardInterrupt
+        mock_socket.recvfrom_into.side_effect = KeyboardInterrupt
 
         t.join(timeout=2)  # Try to join the thread, but move on after 2 seconds
 
         # Check if the state was updated correctly for failure
         assert state.get_state(udp.id)["failure_count"] == 1
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def _listen_once(udp, message, **kwargs):
+    """Listen on a real socket until the first datagram is received."""
+    port = _free_port()
+
+    class OnceSocket(socket.socket):
+        received = False
+
+        def recvfrom_into(self, *args):
+            if self.received:
+                raise KeyboardInterrupt
+            self.received = True
+            return super().recvfrom_into(*args)
+
+    def send():
+        time.sleep(0.3)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(message, ("localhost", port))
+
+    from threading import Thread
+
+    Thread(target=send).start()
+    with mock.patch("geniusrise_listeners.udp.socket.socket", OnceSocket):
+        with pytest.raises(KeyboardInterrupt):
+            udp.listen(host="localhost", port=port, **kwargs)
+
+
+def test_udp_listen_large_datagram(mock_output):
+    """Test that datagrams up to 64 KiB are received whole."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+
+    message = b"x" * 60000
+    _listen_once(udp, message, rcvbuf_bytes=1 << 20)
+
+    mock_output.save.assert_called_once()
+    assert mock_output.save.call_args[0][0]["data"] == message.decode()
+
+
+def test_udp_listen_truncated_datagram(mock_output):
+    """Test that datagrams longer than max_datagram_size are truncated and counted."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+
+    _listen_once(udp, b"0123456789abcdef", max_datagram_size=10)
+
+    assert mock_output.save.call_args[0][0]["data"] == "0123456789"
+    udp.counters.flush()
+    assert state.get_state(udp.id)["truncated_count"] == 1
+
+
+def test_udp_listen_copies_queued_datagrams(mock_output):
+    """Test that datagrams handed to sink workers do not share the receive buffer."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+    udp.configure(decoder=lambda data: data)
+
+    _listen_once(udp, b"payload", queue_size=10)
+
+    assert mock_output.save.call_args[0][0]["data"] == b"payload"
+
+
+def test_udp_listen_invalid_max_datagram_size(mock_udp):
+    """Test that max_datagram_size must fit a UDP payload."""
+    with pytest.raises(ValueError):
+        mock_udp.listen(max_datagram_size=70000)
+
+
+def test_udp_listen_receive_batch(mock_output):
+    """Test that queued datagrams are received together and saved as one batch."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+    port = _free_port()
+
+    class BatchSocket(socket.socket):
+        reads = 0
+
+        def recvfrom_into(self, *args):
+            self.reads += 1
+            if self.reads == 1:
+                # Queue the datagrams before the first read
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                    for i in range(3):
+                        s.sendto(b"message %d" % i, ("localhost", port))
+                time.sleep(0.1)
+            elif self.reads > 3:
+                raise KeyboardInterrupt
+            return super().recvfrom_into(*args)
+
+    # The recvfrom_into fallback, which the socket can observe
+    with mock.patch("geniusrise_listeners.sockets._recvmmsg", None):
+        with mock.patch("geniusrise_listeners.udp.socket.socket", BatchSocket):
+            with pytest.raises(KeyboardInterrupt):
+                udp.listen(host="localhost", port=port, receive_batch=3)
+
+    mock_output.save_bulk.assert_called_once()
+    assert [record["data"] for record in mock_output.save_bulk.call_args[0][0]] == [
+        "message 0",
+        "message 1",
+        "message 2",
+    ]
+
+
+def test_udp_listen_asyncio_engine(mock_output):
+    """Test that the asyncio engine receives datagrams on several addresses."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+    ports = [_free_port(), _free_port()]
+
+    def send():
+        time.sleep(0.3)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            for port in ports:
+                s.sendto(b"to %d" % port, ("localhost", port))
+        deadline = time.monotonic() + 5
+        while mock_output.save.call_count < len(ports) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Stop listening as on Ctrl-C, with a real signal to wake the event loop up
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGINT)
+
+    threading.Thread(target=send).start()
+    with pytest.raises(KeyboardInterrupt):
+        udp.listen(addresses=[f"localhost:{port}" for port in ports], engine="asyncio")
+
+    saved = sorted(call[0][0]["data"] for call in mock_output.save.call_args_list)
+    assert saved == sorted(f"to {port}" for port in ports)
+    assert udp.queue is None
+
+
+def test_udp_asyncio_reader_pauses_without_dropping(mock_output):
+    """Test that the asyncio engine stops reading while the queue is full, leaving datagrams in the socket."""
+    udp = Udp(mock_output, InMemoryState())
+    release = threading.Event()
+    handled = []
+
+    def handle(data, metadata):
+        release.wait()
+        handled.append(data)
+
+    async def main():
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s, socket.socket(
+            socket.AF_INET, socket.SOCK_DGRAM
+        ) as sender:
+            s.bind(("localhost", 0))
+            s.setblocking(False)
+            readers = []
+            queue = AsyncReceiveQueue(
+                handle,
+                maxsize=2,
+                pause=lambda: [reader.pause() for reader in readers],
+                resume=lambda: [reader.resume() for reader in readers],
+            )
+            queue.start()
+            readers.append(_DatagramReader(udp, s, queue))
+            readers[0].resume()
+            for i in range(10):
+                sender.sendto(b"%d" % i, s.getsockname())
+            await asyncio.sleep(0.2)
+            assert queue.depth <= 2 and not readers[0].reading
+
+            release.set()
+            deadline = time.monotonic() + 5
+            while len(handled) < 10 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            readers[0].pause()
+            await queue.close()
+            return queue.dropped
+
+    assert asyncio.run(main()) == 0
+    assert handled == [b"%d" % i for i in range(10)]
+
+
+def test_udp_listen_several_addresses(mock_output):
+    """Test that the socket engine receives datagrams on IPv4 and IPv6 addresses with one selector."""
+    if not socket.has_ipv6:
+        pytest.skip("Needs IPv6")
+    udp = Udp(mock_output, InMemoryState())
+    ports = [_free_port(), _free_port()]
+
+    class CountingSocket(socket.socket):
+        reads = 0
+
+        def recvfrom_into(self, *args):
+            # Stop at the third datagram
+            CountingSocket.reads += 1
+            if CountingSocket.reads > 2:
+                raise KeyboardInterrupt
+            return super().recvfrom_into(*args)
+
+    def send():
+        time.sleep(0.3)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"ipv4", ("127.0.0.1", ports[0]))
+        with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as s:
+            s.sendto(b"ipv6", ("::1", ports[1]))
+        time.sleep(0.3)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(b"stop", ("127.0.0.1", ports[0]))
+
+    from threading import Thread
+
+    Thread(target=send).start()
+    with mock.patch("geniusrise_listeners.udp.socket.socket", CountingSocket):
+        with pytest.raises(KeyboardInterrupt):
+            udp.listen(addresses=f"127.0.0.1:{ports[0]},[::1]:{ports[1]}")
+
+    saved = {call[0][0]["data"]: call[0][0]["sender_address"] for call in mock_output.save.call_args_list}
+    assert saved == {"ipv4": "127.0.0.1", "ipv6": "::1"}
+
+
+def test_udp_listen_multicast_group_needs_its_family(mock_udp):
+    """Test that multicast groups are joined on sockets of their address family only."""
+    with pytest.raises(ValueError):
+        mock_udp.listen(host="0.0.0.0", multicast_groups="ff15::1234")
+
+
+def test_udp_listen_format(mock_output):
+    """Test that datagrams are parsed with the format's parser, and malformed ones skipped."""
+    state = InMemoryState()
+    udp = Udp(mock_output, state)
+
+    _listen_once(udp, b"requests:1|c", format="statsd")
+    _listen_once(udp, b"not statsd", format="statsd")
+
+    mock_output.save.assert_called_once()
+    assert mock_output.save.call_args[0][0]["data"] == [
+        {"name": "requests", "value": 1.0, "type": "c", "sample_rate": 1.0, "tags": None}
+    ]
+    udp.counters.flush()
+    assert state.get_state(udp.id)["filtered_count"] == 1
+
+
+@pytest.mark.parametrize(
+    "encoding, expected",
+    [("utf-8", "café"), ("base64", "Y2Fmw6k="), ("raw", b"caf\xc3\xa9")],
+)
+def test_udp_listen_encoding(mock_output, encoding, expected):
+    """Test that datagrams are saved as strings, base64 strings or raw bytes."""
+    mock_output.accepts_bytes = True
+    udp = Udp(mock_output, InMemoryState())
+
+    _listen_once(udp, "café".encode(), encoding=encoding)
+
+    assert mock_output.save.call_args[0][0]["data"] == expected
+
+
+def test_udp_listen_zero_copy(mock_output):
+    """Test that zero_copy hands the output a view of the receive buffer."""
+    mock_output.accepts_bytes = True
+    udp = Udp(mock_output, InMemoryState())
+    saved = []
+    mock_output.save.side_effect = lambda record: saved.append((type(record["data"]), bytes(record["data"])))
+
+    _listen_once(udp, b"\x00\x01binary", encoding="raw", zero_copy=True)
+
+    assert saved == [(memoryview, b"\x00\x01binary")]
+
+
+class JSONOutput:
+    """Saves records as JSON, like StreamingOutput."""
+
+    def __init__(self):
+        self.saved = []
+
+    def save(self, data, filename=None):
+        self.saved.append(json.dumps(data))
+
+
+def test_udp_listen_raw_requires_bytes_output():
+    """Test that the raw encoding is refused for outputs that save JSON."""
+    udp = Udp(JSONOutput(), InMemoryState())
+
+    with pytest.raises(ValueError, match="base64"):
+        udp.listen(encoding="raw")
+    with pytest.raises(ValueError, match="base64"):
+        udp.listen(encoding="raw", zero_copy=True)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "base64"])
+def test_udp_listen_zero_copy_json_output(encoding):
+    """Test that zero_copy decodes datagrams to strings that outputs saving JSON can save."""
+    output = JSONOutput()
+    udp = Udp(output, InMemoryState())
+
+    _listen_once(udp, "café".encode(), encoding=encoding, zero_copy=True)
+
+    assert [json.loads(record)["data"] for record in output.saved] == [{"utf-8": "café", "base64": "Y2Fmw6k="}[encoding]]
+
+
+def test_udp_listen_zero_copy_requires_no_queue(mock_udp):
+    """Test that zero_copy cannot be combined with a queue, whose records outlive the receive buffer."""
+    mock_udp.output.accepts_bytes = True
+    with pytest.raises(ValueError, match="zero_copy"):
+        mock_udp.listen(encoding="raw", zero_copy=True, queue_size=10)
+
+
+def test_udp_listen_unknown_encoding(mock_udp):
+    """Test that unknown encodings are rejected."""
+    with pytest.raises(ValueError):
+        mock_udp.listen(encoding="latin-1")
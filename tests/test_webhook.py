@@ -1,5 +1,9 @@
 import pytest
 import base64
+import http.client
+import socket
+import threading
+import time
 import cherrypy
 from unittest import mock
 from geniusrise import State, StreamingOutput, InMemoryState
@@ -57,8 +61,9 @@ def test_default_method_auth_success(mock_webhook, mock_request):
     valid_credentials = base64.b64encode(b"testuser:testpass").decode("utf-8")
     mock_request.headers = {"Authorization": f"Basic {valid_credentials}"}
     mock_request.json = {"test": "data"}
+    mock_webhook.username, mock_webhook.password = "testuser", "testpass"
 
-    mock_webhook.default(username="testuser", password="testpass")
+    mock_webhook.default()
 
     assert mock_webhook.output.save.call_count == 1
 
@@ -67,9 +72,24 @@ def test_default_method_auth_failure(mock_webhook, mock_request):
     invalid_credentials = base64.b64encode(b"wronguser:wrongpass").decode("utf-8")
     mock_request.headers = {"Authorization": f"Basic {invalid_credentials}"}
     mock_request.json = {"test": "data"}
+    mock_webhook.username, mock_webhook.password = "testuser", "testpass"
+
+    with pytest.raises(cherrypy.HTTPError):
+        mock_webhook.default()
+
+
+def test_default_method_ignores_query_string_credentials(mock_webhook, mock_request):
+    """Credentials in the query string neither authorize a request nor turn authentication on."""
+    mock_request.headers = {}
+    mock_request.json = {"test": "data"}
+
+    mock_webhook.default(username="testuser", password="testpass")
+    assert mock_webhook.output.save.call_count == 1
 
+    mock_webhook.username, mock_webhook.password = "testuser", "testpass"
     with pytest.raises(cherrypy.HTTPError):
         mock_webhook.default(username="testuser", password="testpass")
+    assert mock_webhook.output.save.call_count == 1
 
 
 def test_default_method_error_handling(mock_webhook, mock_request):
@@ -112,3 +132,81 @@ def test_webhook_listen_handles_exceptions(mock_output, mock_cherrypy_engine):
 
     # Check that the exception message is as expected
     assert str(exc_info.value) == "Server start failed"
+
+
+def _post_to_asyncio_engine(webhook, requests, **kwargs):
+    """Listen with the asyncio engine, post the requests and return the responses."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    responses = []
+
+    def post():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        for body, headers in requests:
+            # Retry until the server is up
+            for _ in range(500):
+                try:
+                    connection.request("POST", "/hooks/github?delivery=1", body=body, headers=headers)
+                    break
+                except ConnectionRefusedError:
+                    connection.close()
+                    time.sleep(0.01)
+            response = connection.getresponse()
+            responses.append((response.status, response.read().decode()))
+        connection.close()
+        webhook.server.stop()
+
+    thread = threading.Thread(target=post)
+    thread.start()
+    webhook.listen(port=port, engine="asyncio", **kwargs)
+    thread.join(5)
+    return port, responses
+
+
+def test_webhook_listen_asyncio_engine(mock_output):
+    """Test that the asyncio engine saves the JSON bodies of several requests on one connection."""
+    webhook = Webhook(mock_output, InMemoryState())
+    json_headers = {"Content-Type": "application/json", "X-Event": "push"}
+
+    port, responses = _post_to_asyncio_engine(
+        webhook,
+        [(b'{"i": 0}', json_headers), (b'{"i": 1}', json_headers)],
+    )
+
+    assert responses == [(200, ""), (200, "")]
+    saved = [call[0][0] for call in mock_output.save.call_args_list]
+    assert [record["data"] for record in saved] == [{"i": 0}, {"i": 1}]
+    assert saved[0]["endpoint"] == f"http://127.0.0.1:{port}/hooks/github"
+    assert saved[0]["headers"]["X-Event"] == "push"
+
+
+def test_webhook_listen_asyncio_engine_errors(mock_output):
+    """Test that the asyncio engine answers bad requests as the CherryPy engine does."""
+    webhook = Webhook(mock_output, InMemoryState())
+    credentials = base64.b64encode(b"testuser:testpass").decode("utf-8")
+    json_headers = {"Content-Type": "application/json", "Authorization": f"Basic {credentials}"}
+
+    _, responses = _post_to_asyncio_engine(
+        webhook,
+        [
+            (b'{"i": 0}', {"Content-Type": "application/json"}),
+            (b'{"i": 0}', {**json_headers, "Authorization": "Basic bm9wZQ=="}),
+            (b"i=0", {**json_headers, "Content-Type": "application/x-www-form-urlencoded"}),
+            (b"{not json", json_headers),
+            (b"", json_headers),
+            (b'{"i": 1}', json_headers),
+        ],
+        username="testuser",
+        password="testpass",
+    )
+
+    assert [status for status, _ in responses] == [401, 401, 415, 400, 500, 200]
+    assert responses[4][1] == "Error processing data"
+    assert [call[0][0]["data"] for call in mock_output.save.call_args_list] == [{"i": 1}]
+
+
+def test_webhook_listen_unknown_engine(mock_output, mock_state):
+    """Test that unknown engines are rejected."""
+    with pytest.raises(ValueError, match="Unknown engine"):
+        Webhook(mock_output, mock_state).listen(engine="twisted")